@@ -14,10 +14,24 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', 3306)),
     'raise_on_warnings': True,
     'connection_timeout': int(os.getenv('DB_TIMEOUT', 10)),
+    # Reads need no COMMIT round trip; writes that must be atomic use an explicit transaction
+    'autocommit': True,
     'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
     'pool_name': 'covid_analysis_pool'
 }
 
+# Schema that pooled sessions switch to when they check out a connection
+DB_NAME = os.getenv('DB_NAME', 'covid_data')
+
+# Seconds a session waits for a free pooled connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+
+# Partition Patients by month of death (see database/partitions.py)
+PATIENTS_PARTITIONING = os.getenv('PATIENTS_PARTITIONING', '').lower() in ('1', 'true', 'yes')
+
+# Seed for the differential privacy noise engine; unset draws fresh entropy on every start
+DP_NOISE_SEED = int(os.getenv('DP_NOISE_SEED')) if os.getenv('DP_NOISE_SEED') else None
+
 # Logging configuration
 LOGGING_CONFIG = {
     'version': 1,
@@ -0,0 +1,92 @@
+"""
+Checks with EXPLAIN that every built-in analysis query uses the workload indexes from
+database/schema.py, and compares its latency with and without them.
+
+The "without" run adds IGNORE INDEX for every workload index, so both numbers come from the
+same data. Run it once per scale of interest (e.g. with DB_NAME pointing at schemas loaded
+with 1M and 10M patients); the report prints the row count it ran against.
+
+Usage (from the project root, with the database configured in .env):
+    python -m benchmarks.index_report [repetitions]
+"""
+import re
+import sys
+import time
+
+from appconfig.settings import DB_NAME
+from database.connection import DatabaseConnection
+from database.queries import ANALYSIS_QUERIES, DYNAMIC_QUERIES
+from database.schema import INDEXES
+
+# Representative parameters for the dynamic analyses, which bind user input to the shared SQL.
+DYNAMIC_PARAMS = {
+    'age_patient_type': (30, 50, 2),
+    'disease_classification': (1, 1, 1),
+    'gender_tobacco': (1, 1),
+    'death_count': ('2020-04-01', '2020-06-30', '2020-04-01', '2020-06-30'),
+    'icu_comorbidity': (1, 2, 2),
+}
+
+_FROM_PATIENTS = re.compile(r"\bFROM\s+Patients\b", re.IGNORECASE)
+
+
+def without_indexes(query):
+    names = ", ".join(name for name, (table, _) in INDEXES.items() if table == 'Patients')
+    return _FROM_PATIENTS.sub(f"FROM Patients IGNORE INDEX ({names})", query, count=1)
+
+
+def explain(cursor, query, params=None):
+    cursor.execute(f"EXPLAIN {query.strip().rstrip(';')}", params)
+    rows = cursor.fetchall()
+    row = next((row for row in rows if (row.get('table') or '').lower() == 'patients'), rows[0])
+    extra = row.get('Extra') or ''
+    return {
+        'type': row.get('type'),
+        'key': row.get('key'),
+        'rows': row.get('rows'),
+        'covering': 'Using index' in extra,
+    }
+
+
+def latency_ms(cursor, query, repetitions, params=None):
+    started = time.perf_counter()
+    for _ in range(repetitions):
+        cursor.execute(query, params)
+        cursor.fetchall()
+    return 1000 * (time.perf_counter() - started) / repetitions
+
+
+def main(repetitions=5):
+    db = DatabaseConnection()
+    connection = db.pool.get_connection()
+    connection.database = DB_NAME
+    cursor = connection.cursor(buffered=True, dictionary=True)
+    try:
+        cursor.execute("SELECT COUNT(*) AS total FROM Patients")
+        total = cursor.fetchone()['total']
+        print(f"Patients: {total} rows, {repetitions} repetitions per query\n")
+        print(f"{'query':<26}{'access':<8}{'key':<30}{'covering':<10}{'est. rows':>10}{'ms no idx':>11}{'ms idx':>9}")
+
+        missing = []
+        workload = [(name, query, None) for name, query in ANALYSIS_QUERIES.items()]
+        workload += [(f"dynamic_{name}", query, DYNAMIC_PARAMS[name]) for name, query in DYNAMIC_QUERIES.items()]
+        for name, query, params in workload:
+            plan = explain(cursor, query, params)
+            before = latency_ms(cursor, without_indexes(query), repetitions, params)
+            after = latency_ms(cursor, query, repetitions, params)
+            if plan['key'] not in INDEXES:
+                missing.append(name)
+            print(f"{name:<26}{str(plan['type']):<8}{str(plan['key']):<30}{'yes' if plan['covering'] else 'no':<10}"
+                  f"{str(plan['rows']):>10}{before:>11.2f}{after:>9.2f}")
+
+        if missing:
+            print(f"\nNo workload index chosen for: {', '.join(missing)}")
+        else:
+            print("\nEvery query uses a workload index.")
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
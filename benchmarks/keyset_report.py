@@ -0,0 +1,73 @@
+"""
+Checks with EXPLAIN that the Data Viewer's keyset seek conditions are answered as index range
+scans on the (column, patient_id) sort indexes, and compares a deep page reached by seeking
+with the same page reached by OFFSET.
+
+For every sort column and direction the key of the row at DEPTH of the table is looked up,
+and a page of PAGE_SIZE rows after it is read both ways. A seek whose plan is not a range scan
+on the column's sort index is listed at the end. Run it once per scale of interest (e.g. with
+DB_NAME pointing at schemas loaded with 1M and 10M patients); the report prints the row count
+it ran against.
+
+Usage (from the project root, with the database configured in .env):
+    python -m benchmarks.keyset_report [repetitions]
+"""
+import sys
+
+from appconfig.settings import DB_NAME
+from benchmarks.index_report import explain, latency_ms
+from database.connection import DatabaseConnection
+from database.filters import seek_condition, sort_order
+from database.schema import SORT_INDEXES
+
+# Fraction of the table skipped before the measured page
+DEPTH = 0.9
+PAGE_SIZE = 200
+
+
+def main(repetitions=5):
+    db = DatabaseConnection()
+    connection = db.pool.get_connection()
+    connection.database = DB_NAME
+    cursor = connection.cursor(buffered=True, dictionary=True)
+    try:
+        cursor.execute("SELECT COUNT(*) AS total FROM Patients")
+        total = cursor.fetchone()['total']
+        depth = int(total * DEPTH)
+        print(f"Patients: {total} rows, page of {PAGE_SIZE} at row {depth}, {repetitions} repetitions per query\n")
+        print(f"{'sort':<28}{'access':<8}{'key':<34}{'est. rows':>10}{'ms offset':>11}{'ms seek':>9}")
+
+        not_seeking = []
+        for column, index in SORT_INDEXES.items():
+            for descending in (False, True):
+                order = sort_order(column, descending)
+                cursor.execute(f"SELECT {column} AS sort_value, patient_id FROM Patients "
+                               f"ORDER BY {order} LIMIT 1 OFFSET %s", (depth,))
+                row = cursor.fetchone()
+                if row is None:
+                    continue
+
+                condition, params = seek_condition(column, (row['sort_value'], row['patient_id']), descending)
+                seek = f"SELECT patient_id FROM Patients WHERE {condition} ORDER BY {order} LIMIT {PAGE_SIZE}"
+                offset = f"SELECT patient_id FROM Patients ORDER BY {order} LIMIT {PAGE_SIZE} OFFSET {depth}"
+
+                plan = explain(cursor, seek, params)
+                before = latency_ms(cursor, offset, repetitions)
+                after = latency_ms(cursor, seek, repetitions, params)
+                name = f"{column} {'desc' if descending else 'asc'}"
+                if plan['type'] != 'range' or plan['key'] != index:
+                    not_seeking.append(name)
+                print(f"{name:<28}{str(plan['type']):<8}{str(plan['key']):<34}"
+                      f"{str(plan['rows']):>10}{before:>11.2f}{after:>9.2f}")
+
+        if not_seeking:
+            print(f"\nNo range scan on the sort index for: {', '.join(not_seeking)}")
+        else:
+            print("\nEvery seek is a range scan on its sort index.")
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
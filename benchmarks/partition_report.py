@@ -0,0 +1,87 @@
+"""
+Compares the date-based analysis queries on the partitioned Patients table with an unpartitioned
+copy of the same rows, and lists the partitions EXPLAIN says each query reads.
+
+Run it after starting the app once with PATIENTS_PARTITIONING=1 so Patients is partitioned by
+death month. The copy is built in a scratch table and dropped afterwards. Run it once per scale
+of interest (e.g. with DB_NAME pointing at schemas loaded with 1M and 10M patients); the report
+prints the row count it ran against.
+
+Usage (from the project root, with the database configured in .env):
+    python -m benchmarks.partition_report [repetitions]
+"""
+import re
+import sys
+import time
+
+from appconfig.settings import DB_NAME
+from benchmarks.index_report import latency_ms
+from database.connection import DatabaseConnection
+from database.partitions import patient_partitions
+from database.patient_store import PATIENT_COLUMNS
+from database.queries import ANALYSIS_QUERIES
+
+SCRATCH_TABLE = "PatientsUnpartitioned"
+
+DATE_QUERIES = {
+    **{name: ANALYSIS_QUERIES[name] for name in (
+        'deaths_by_date', 'top_death_dates', 'deaths_by_age', 'high_risk_survivors', 'covid_trends'
+    )},
+    'dynamic_death_count': """
+        SELECT COUNT(*) AS Deaths FROM Patients
+        WHERE DATE_DIED BETWEEN '2020-04-01' AND '2020-06-30' AND death_month BETWEEN 202004 AND 202006
+    """,
+}
+
+_FROM_PATIENTS = re.compile(r"\bFROM\s+Patients\b", re.IGNORECASE)
+
+
+def on_scratch_table(query):
+    return _FROM_PATIENTS.sub(f"FROM {SCRATCH_TABLE}", query, count=1)
+
+
+def partitions_read(cursor, query):
+    cursor.execute(f"EXPLAIN {query.strip().rstrip(';')}")
+    row = next((row for row in cursor.fetchall() if (row.get('table') or '').lower() == 'patients'), None)
+    return (row or {}).get('partitions') or ''
+
+
+def main(repetitions=5):
+    db = DatabaseConnection()
+    partitions = patient_partitions(db)
+    if not partitions:
+        print("Patients is not partitioned; start the app with PATIENTS_PARTITIONING=1 first.")
+        return
+
+    connection = db.pool.get_connection()
+    connection.database = DB_NAME
+    cursor = connection.cursor(buffered=True, dictionary=True)
+    try:
+        cursor.execute("SELECT COUNT(*) AS total FROM Patients")
+        total = cursor.fetchone()['total']
+        print(f"Patients: {total} rows in {len(partitions)} partitions, {repetitions} repetitions per query")
+
+        started = time.perf_counter()
+        columns = ", ".join(PATIENT_COLUMNS)
+        cursor.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+        cursor.execute(f"CREATE TABLE {SCRATCH_TABLE} LIKE Patients")
+        cursor.execute(f"ALTER TABLE {SCRATCH_TABLE} REMOVE PARTITIONING")
+        cursor.execute(f"INSERT INTO {SCRATCH_TABLE} ({columns}) SELECT {columns} FROM Patients")
+        connection.commit()
+        print(f"Built the unpartitioned copy in {time.perf_counter() - started:.2f}s\n")
+
+        print(f"{'query':<22}{'ms unpartitioned':>18}{'ms partitioned':>16}{'speedup':>9}  partitions read")
+        for name, query in DATE_QUERIES.items():
+            before = latency_ms(cursor, on_scratch_table(query), repetitions)
+            after = latency_ms(cursor, query, repetitions)
+            read = partitions_read(cursor, query)
+            summary = f"{len(read.split(','))}/{len(partitions)}" if read else "-"
+            print(f"{name:<22}{before:>18.2f}{after:>16.2f}{before / max(after, 1e-9):>8.1f}x  {summary} {read[:40]}")
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
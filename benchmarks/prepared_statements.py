@@ -0,0 +1,75 @@
+"""
+Measures repeated what-if runs of the dynamic analysis queries, comparing text-protocol
+statements (parsed and planned by the server on every run, as the f-string queries were)
+with the prepared statements of DatabaseConnection.execute_prepared.
+
+Each repetition binds different inputs, as an analyst sweeping parameters would.
+
+Usage (from the project root, with the database configured in .env):
+    python -m benchmarks.prepared_statements [repetitions]
+"""
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from appconfig.settings import DB_NAME
+from database.connection import DatabaseConnection
+from database.queries import DYNAMIC_QUERIES
+
+
+def random_params(name, rng):
+    if name == 'age_patient_type':
+        low = rng.randint(0, 90)
+        return low, low + rng.randint(1, 20), rng.choice((1, 2))
+    if name == 'death_count':
+        start = date(2020, 1, 1) + timedelta(days=rng.randint(0, 300))
+        end = start + timedelta(days=rng.randint(1, 60))
+        return start, end, start, end
+    count = DYNAMIC_QUERIES[name].count('%s')
+    return tuple(rng.choice((1, 2)) for _ in range(count))
+
+
+def text_protocol_ms(connection, query, params_list):
+    cursor = connection.cursor(buffered=True)
+    started = time.perf_counter()
+    for params in params_list:
+        cursor.execute(query, params)
+        cursor.fetchall()
+    elapsed = time.perf_counter() - started
+    cursor.close()
+    return 1000 * elapsed / len(params_list)
+
+
+def prepared_ms(db, query, params_list):
+    started = time.perf_counter()
+    for params in params_list:
+        db.execute_prepared(query, params)
+    return 1000 * (time.perf_counter() - started) / len(params_list)
+
+
+def main(repetitions=50):
+    db = DatabaseConnection()
+    connection = db.pool.get_connection()
+    connection.database = DB_NAME
+    rng = random.Random(0)
+
+    print(f"{repetitions} runs per query with varying inputs\n")
+    print(f"{'query':<26}{'ms text':>10}{'ms prepared':>13}{'speedup':>9}")
+    try:
+        for name, query in DYNAMIC_QUERIES.items():
+            params_list = [random_params(name, rng) for _ in range(repetitions)]
+            text = text_protocol_ms(connection, query, params_list)
+            prepared = prepared_ms(db, query, params_list)
+            print(f"{name:<26}{text:>10.2f}{prepared:>13.2f}{text / max(prepared, 1e-9):>8.2f}x")
+    finally:
+        connection.close()
+
+    health = db.pool_health()
+    print(f"\nPrepared statements: {health['prepared_statements']} open, "
+          f"{health['prepared_hits']} hits, {health['prepared_misses']} misses")
+    db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,67 @@
+"""
+Measures the statements the server receives for one run of every built-in analysis, comparing
+a COMMIT after every read (the old execute_query behaviour) with the autocommit read path.
+
+Statements are counted by the server (SHOW SESSION STATUS LIKE 'Questions'), so the numbers
+include every round trip the connector makes. No results are recorded with the code; run it
+against the target server to measure the saving.
+
+Usage (from the project root, with the database configured in .env):
+    python -m benchmarks.round_trips [repetitions]
+"""
+import sys
+import time
+
+from appconfig.settings import DB_NAME
+from database.connection import DatabaseConnection
+from database.queries import ANALYSIS_QUERIES
+
+
+def _questions(cursor):
+    cursor.execute("SHOW SESSION STATUS LIKE 'Questions'")
+    return int(cursor.fetchone()[1])
+
+
+def measure(connection, query, commit_reads, repetitions):
+    """
+    Runs a query repeatedly and returns (statements per run, milliseconds per run).
+    """
+    cursor = connection.cursor(buffered=True)
+    before = _questions(cursor)
+    started = time.perf_counter()
+    for _ in range(repetitions):
+        cursor.execute(query)
+        cursor.fetchall()
+        if commit_reads:
+            connection.commit()
+    elapsed = time.perf_counter() - started
+    # The second SHOW STATUS is itself counted once.
+    statements = _questions(cursor) - before - 1
+    cursor.close()
+    return statements / repetitions, 1000 * elapsed / repetitions
+
+
+def main(repetitions=20):
+    db = DatabaseConnection()
+    connection = db.pool.get_connection()
+    connection.database = DB_NAME
+
+    print(f"{'analysis':<22}{'commit/read':>14}{'autocommit':>12}{'saved':>8}{'ms before':>11}{'ms after':>10}")
+    totals = [0.0, 0.0, 0.0, 0.0]
+    try:
+        for name, query in ANALYSIS_QUERIES.items():
+            before = measure(connection, query, True, repetitions)
+            after = measure(connection, query, False, repetitions)
+            totals = [total + value for total, value in zip(totals, before + after)]
+            print(f"{name:<22}{before[0]:>14.1f}{after[0]:>12.1f}{before[0] - after[0]:>8.1f}"
+                  f"{before[1]:>11.2f}{after[1]:>10.2f}")
+    finally:
+        connection.close()
+
+    print(f"{'all analyses':<22}{totals[0]:>14.1f}{totals[2]:>12.1f}{totals[0] - totals[2]:>8.1f}"
+          f"{totals[1]:>11.2f}{totals[3]:>10.2f}")
+    print(f"Connection stats: {db.pool_health()}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
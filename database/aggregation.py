@@ -0,0 +1,258 @@
+import threading
+from datetime import timedelta
+
+import numpy as np
+
+from database.patient_store import EPOCH
+
+ANALYSES = (
+    "age_distribution",
+    "icu_statistics",
+    "disease_correlation",
+    "gender_icu",
+    "usmer_distribution",
+    "deaths_by_date",
+    "covid_trends",
+    "disease_priority",
+    "top_death_dates",
+    "recovery_rate",
+    "mortality_by_age",
+    "deaths_by_age",
+    "high_risk_survivors",
+)
+
+
+def _python_value(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def _group_by(keys, measures):
+    """
+    Groups rows by one or more key arrays and sums per-row measures with bincount.
+
+    Keys are float arrays in which NaN marks NULL; the NULL group is ordered first, as MySQL does.
+
+    :param keys: Dictionary mapping output names to key arrays.
+    :param measures: Dictionary mapping output names to per-row weights (boolean masks count rows).
+    :return: A list of row dictionaries shaped like the rows of the equivalent GROUP BY query.
+    """
+    names = list(keys)
+    stacked = np.column_stack([keys[name] for name in names])
+    stacked = np.where(np.isnan(stacked), -np.inf, stacked)
+    groups, inverse = np.unique(stacked, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+
+    sums = {
+        name: np.bincount(inverse, weights=np.asarray(weights, dtype=np.float64), minlength=len(groups))
+        for name, weights in measures.items()
+    }
+
+    rows = []
+    for index, group in enumerate(groups):
+        row = {name: None if np.isinf(value) else _python_value(value) for name, value in zip(names, group)}
+        for name in measures:
+            row[name] = int(sums[name][index])
+        rows.append(row)
+    return rows
+
+
+def _day_to_date(day):
+    return EPOCH + timedelta(days=int(day))
+
+
+def _mysql_week_keys(days):
+    """
+    Vectorized DATE_FORMAT(date, '%Y-%u') (WEEK mode 1) as integer keys year * 100 + week.
+    """
+    dates = days.astype("datetime64[D]")
+    years = dates.astype("datetime64[Y]")
+    year_start = years.astype("datetime64[D]")
+    day_of_year = (dates - year_start).astype(np.int64)
+    # Weekday of January 1st with Monday as 0; 1970-01-01 was a Thursday.
+    first_weekday = (year_start.astype(np.int64) + 3) % 7
+
+    late_start = first_weekday >= 4
+    offset_days = np.where(late_start, day_of_year - (7 - first_weekday), day_of_year + first_weekday)
+    weeks = np.where(late_start & (day_of_year < 7 - first_weekday), 0, offset_days // 7 + 1)
+    return (years.astype(np.int64) + 1970) * 100 + weeks
+
+
+class _ScanContext:
+    """Per-scan intermediates shared by every analysis of one data version."""
+
+    def __init__(self, store):
+        self.store = store
+        self.ones = np.ones(store.row_count, dtype=np.float64)
+        self.died = store.valid("date_died")
+        self.age_valid = store.valid("age")
+        self.age = store.values("age").astype(np.float64)
+        self.age_group = np.where(self.age_valid, np.floor(self.age / 10) * 10, np.nan)
+        self._flags = {}
+
+    def equals(self, column, value):
+        key = (column, value)
+        if key not in self._flags:
+            self._flags[key] = self.store.valid(column) & (self.store.values(column) == value)
+        return self._flags[key]
+
+    def key(self, column):
+        return np.where(self.store.valid(column), self.store.values(column).astype(np.float64), np.nan)
+
+
+class AggregationEngine:
+    """
+    Answers the built-in analyses from a PatientStore with vectorized masks and bincounts.
+
+    Every analysis returns rows shaped like the result of its SQL query, so the views can use
+    either source. run_all computes all of them from one load of the store.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._context = None
+        self._results = {}
+        self._version = None
+        self._lock = threading.RLock()
+
+    @property
+    def ready(self):
+        return self.store.loaded and not self.store.stale
+
+    def _scan(self):
+        self.store.ensure_loaded()
+        if self._version != self.store.version:
+            self._context = _ScanContext(self.store)
+            self._results = {}
+            self._version = self.store.version
+        return self._context
+
+    def compute(self, analysis):
+        """
+        Returns the rows of one analysis, reusing results computed for the current data version.
+        """
+        if analysis not in ANALYSES:
+            raise ValueError(f"Unknown analysis: {analysis}")
+        with self._lock:
+            context = self._scan()
+            if analysis not in self._results:
+                self._results[analysis] = getattr(self, f"_{analysis}")(context)
+            return self._results[analysis]
+
+    def run_all(self):
+        """
+        Computes every analysis in one pass over the in-memory columns.
+
+        :return: Dictionary mapping analysis names to their result rows.
+        """
+        return {analysis: self.compute(analysis) for analysis in ANALYSES}
+
+    def _age_distribution(self, context):
+        mask = context.age_valid
+        return _group_by({"age_group": context.age_group[mask]}, {"count": context.ones[mask]})
+
+    def _icu_statistics(self, context):
+        icu = context.equals("icu", 1)
+        total = int(icu.sum())
+        if total == 0:
+            return [{
+                "total_icu_patients": 0, "avg_age": None, "male_count": None, "female_count": None,
+                "diabetes_count": None, "hipertension_count": None, "obesity_count": None
+            }]
+
+        ages = context.age[icu & context.age_valid]
+        return [{
+            "total_icu_patients": total,
+            "avg_age": float(ages.mean()) if ages.size else None,
+            "male_count": int((icu & context.equals("sex", 1)).sum()),
+            "female_count": int((icu & context.equals("sex", 2)).sum()),
+            "diabetes_count": int((icu & context.equals("diabetes", 1)).sum()),
+            "hipertension_count": int((icu & context.equals("hipertension", 1)).sum()),
+            "obesity_count": int((icu & context.equals("obesity", 1)).sum()),
+        }]
+
+    def _disease_correlation(self, context):
+        mask = (
+            (context.equals("diabetes", 1) | context.equals("diabetes", 2))
+            & (context.equals("hipertension", 1) | context.equals("hipertension", 2))
+        )
+        rows = _group_by(
+            {"diabetes": context.key("diabetes")[mask], "hipertension": context.key("hipertension")[mask]},
+            {"count": context.ones[mask]}
+        )
+        return [{"count": row["count"], "diabetes": row["diabetes"], "hipertension": row["hipertension"]}
+                for row in rows]
+
+    def _gender_icu(self, context):
+        mask = context.equals("sex", 1) | context.equals("sex", 2)
+        return _group_by(
+            {"gender": context.key("sex")[mask]},
+            {"total": context.ones[mask], "icu_count": context.equals("icu", 1)[mask]}
+        )
+
+    def _usmer_distribution(self, context):
+        return _group_by({"usmer": context.key("usmer")}, {"count": context.ones})
+
+    def _deaths_by_date(self, context):
+        mask = context.died
+        rows = _group_by(
+            {"date_died": self.store.values("date_died")[mask].astype(np.float64)},
+            {"deaths": context.ones[mask]}
+        )
+        for row in rows:
+            row["date_died"] = _day_to_date(row["date_died"])
+        return rows
+
+    def _covid_trends(self, context):
+        mask = context.equals("classification_final", 1)
+        days = self.store.values("date_died")[mask]
+        died = context.died[mask]
+        weeks = np.full(days.shape, np.nan)
+        weeks[died] = _mysql_week_keys(days[died])
+
+        rows = _group_by({"week": weeks}, {"weekly_cases": context.ones[mask]})
+        for row in rows:
+            if row["week"] is not None:
+                row["week"] = f"{row['week'] // 100}-{row['week'] % 100:02d}"
+        return rows
+
+    def _disease_priority(self, context):
+        columns = ("diabetes", "hipertension", "obesity", "tobacco")
+        if self.store.row_count == 0:
+            return [{f"{column}_count": None for column in columns}]
+        return [{f"{column}_count": int(context.equals(column, 1).sum()) for column in columns}]
+
+    def _top_death_dates(self, context):
+        rows = self._deaths_by_date(context)
+        rows = sorted(rows, key=lambda row: -row["deaths"])[:10]
+        return [{"date_died": row["date_died"], "died_count": row["deaths"]} for row in rows]
+
+    def _recovery_rate(self, context):
+        total = self.store.row_count
+        return [{
+            "total_cases": total,
+            "recovered_cases": int((~context.died).sum()) if total else None
+        }]
+
+    def _mortality_by_age(self, context):
+        return _group_by(
+            {"age_group": context.age_group},
+            {"total_cases": context.ones, "deaths": context.died}
+        )
+
+    def _deaths_by_age(self, context):
+        mask = context.died
+        return _group_by({"age_group": context.age_group[mask]}, {"total_cases": context.ones[mask]})
+
+    def _high_risk_survivors(self, context):
+        comorbidities = ("diabetes", "obesity", "hipertension")
+        valid = np.logical_and.reduce([self.store.valid(column) for column in comorbidities])
+        comorbidity_sum = sum(self.store.values(column).astype(np.float64) for column in comorbidities)
+        mask = (
+            valid
+            & (comorbidity_sum >= 2)
+            & (context.equals("intubed", 1) | context.equals("icu", 1))
+            & ~context.died
+        )
+
+        return _group_by({"age": context.key("age")[mask]}, {"survivors": context.ones[mask]})
@@ -1,15 +1,42 @@
 import mysql.connector
 from mysql.connector import Error
-from appconfig.settings import DB_CONFIG
+from appconfig.settings import DB_CONFIG, DB_NAME, DB_POOL_TIMEOUT
+from collections import OrderedDict
+from contextlib import contextmanager
 import logging
+import threading
+import time
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched per round trip by the streaming API
+STREAM_CHUNK_SIZE = 10000
+
+# Server-side prepared statements kept open on the shared connection
+PREPARED_CACHE_SIZE = 32
+
 class DatabaseConnection:
     def __init__(self):
         self.connection = None
         self.cursor = None
         self.pool = None
+        # Serializes use of the shared cursor. Hold it across an execute and its fetch when the
+        # connection may be used from more than one thread.
+        self.lock = threading.RLock()
+        # One pooled connection backs the shared cursor above; the rest are handed out by session().
+        self._session_slots = max(DB_CONFIG['pool_size'] - 1, 1)
+        self._slot_semaphore = threading.BoundedSemaphore(self._session_slots)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'checkouts': 0, 'in_use': 0, 'timeouts': 0, 'errors': 0, 'total_wait': 0.0, 'max_wait': 0.0,
+            'statements': 0, 'transactions': 0, 'commits': 0, 'rollbacks': 0,
+            'prepared_hits': 0, 'prepared_misses': 0
+        }
+        # SQL text -> prepared cursor on self.connection, least recently used first
+        self._prepared = OrderedDict()
+        self._prepared_connection = None
         self._setup_connection_pool()
 
     def _setup_connection_pool(self):
@@ -35,38 +62,285 @@ class DatabaseConnection:
             logger.error(f"Error connecting to database: {e}")
             return False
 
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _rollback(self, connection):
+        # In autocommit mode a failed statement is already rolled back by the server; only an
+        # open explicit transaction needs a ROLLBACK round trip.
+        if connection is not None and connection.in_transaction:
+            try:
+                connection.rollback()
+                self._count('rollbacks')
+            except Error:
+                pass
+
+    @contextmanager
+    def session(self, dictionary=True, buffered=True, transaction=False):
+        """
+        Checks a connection out of the pool for one task and yields a cursor on it.
+
+        Pooled connections run in autocommit mode, so a read-only session costs no COMMIT. With
+        transaction=True the block runs in one explicit transaction that is committed when it
+        exits normally and rolled back if it raises. Either way the connection goes back to the
+        pool. When every pooled connection is in use the caller waits up to DB_POOL_TIMEOUT
+        seconds for one to be returned.
+
+        :param dictionary: Return rows as dictionaries.
+        :param buffered: Fetch the whole result set when a statement is executed.
+        :param transaction: Group the block's statements into one transaction.
+        """
+        started = time.perf_counter()
+        if not self._slot_semaphore.acquire(timeout=DB_POOL_TIMEOUT):
+            with self._stats_lock:
+                self._stats['timeouts'] += 1
+            raise Error(msg=f"Timed out after {DB_POOL_TIMEOUT}s waiting for a pooled connection")
+
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self._stats['checkouts'] += 1
+            self._stats['in_use'] += 1
+            self._stats['total_wait'] += waited
+            self._stats['max_wait'] = max(self._stats['max_wait'], waited)
+        if waited > 0.1:
+            logger.debug(f"Waited {waited * 1000:.0f} ms for a pooled connection")
+
+        connection = None
+        cursor = None
+        try:
+            connection = self.pool.get_connection()
+            if connection.database != DB_NAME:
+                connection.database = DB_NAME
+            cursor = connection.cursor(buffered=buffered, dictionary=dictionary)
+            if transaction:
+                connection.start_transaction()
+                self._count('transactions')
+            yield cursor
+            if transaction:
+                connection.commit()
+                self._count('commits')
+        except Exception:
+            self._count('errors')
+            self._rollback(connection)
+            raise
+        finally:
+            if cursor is not None:
+                if not buffered:
+                    self._discard_unread(cursor)
+                cursor.close()
+            if connection is not None:
+                # Closing a pooled connection returns it to the pool.
+                connection.close()
+            with self._stats_lock:
+                self._stats['in_use'] -= 1
+            self._slot_semaphore.release()
+
+    @staticmethod
+    def _discard_unread(cursor):
+        # An unbuffered cursor cannot be closed while rows are still pending, e.g. when a
+        # consumer stopped iterating a stream early.
+        try:
+            while cursor.fetchmany(STREAM_CHUNK_SIZE):
+                pass
+        except Error:
+            pass
+
+    def stream(self, query, params=None, chunk_size=STREAM_CHUNK_SIZE, dictionary=False):
+        """
+        Yields the result of a query in lists of at most chunk_size rows.
+
+        Rows are read from an unbuffered cursor on a pooled session, so only one chunk is held
+        in memory however large the result is. Stopping early discards the remaining rows.
+
+        :param query: The SELECT statement.
+        :param params: Optional query parameters.
+        :param chunk_size: The number of rows per chunk.
+        :param dictionary: Yield rows as dictionaries instead of tuples.
+        """
+        with self.session(dictionary=dictionary, buffered=False) as cursor:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+
+    def stream_arrays(self, query, params=None, chunk_size=STREAM_CHUNK_SIZE, dtypes=None):
+        """
+        Yields the result of a query as column batches of at most chunk_size rows.
+
+        :param query: The SELECT statement.
+        :param params: Optional query parameters.
+        :param chunk_size: The number of rows per batch.
+        :param dtypes: Optional dictionary mapping column names to NumPy dtypes. NULLs in those
+                       columns become NaN, so integer columns that may be NULL need a float dtype;
+                       other columns are returned as object arrays.
+        :return: A generator of dictionaries mapping column names to arrays.
+        """
+        dtypes = dtypes or {}
+        with self.session(dictionary=False, buffered=False) as cursor:
+            cursor.execute(query, params)
+            names = cursor.column_names
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                batch = {}
+                for name, values in zip(names, zip(*rows)):
+                    if name in dtypes:
+                        batch[name] = np.array([np.nan if value is None else value for value in values],
+                                               dtype=dtypes[name])
+                    else:
+                        batch[name] = np.array(values, dtype=object)
+                yield batch
+
+    def fetch_arrays(self, query, params=None, chunk_size=STREAM_CHUNK_SIZE, dtypes=None):
+        """
+        Streams a query with stream_arrays and concatenates the batches into one array per column.
+        """
+        batches = list(self.stream_arrays(query, params, chunk_size, dtypes))
+        if not batches:
+            return {}
+        return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+    def transaction(self, dictionary=True, buffered=True):
+        """
+        Shorthand for a pooled session whose statements are committed together or not at all.
+        """
+        return self.session(dictionary=dictionary, buffered=buffered, transaction=True)
+
+    def pool_health(self):
+        """
+        Reports pool usage and how long sessions waited for a connection.
+
+        :return: Dictionary with the pool size, connections in use and available, checkout,
+                 timeout and error counts, the average and maximum wait in milliseconds, the
+                 statements, transactions, commits and rollbacks sent by this object, and the
+                 prepared statement cache size, hits and misses.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        checkouts = stats['checkouts']
+        return {
+            'pool_size': DB_CONFIG['pool_size'],
+            'session_slots': self._session_slots,
+            'in_use': stats['in_use'],
+            'available': self._session_slots - stats['in_use'],
+            'checkouts': checkouts,
+            'timeouts': stats['timeouts'],
+            'errors': stats['errors'],
+            'avg_wait_ms': 1000 * stats['total_wait'] / checkouts if checkouts else 0.0,
+            'max_wait_ms': 1000 * stats['max_wait'],
+            'statements': stats['statements'],
+            'transactions': stats['transactions'],
+            'commits': stats['commits'],
+            'rollbacks': stats['rollbacks'],
+            'prepared_statements': len(self._prepared),
+            'prepared_hits': stats['prepared_hits'],
+            'prepared_misses': stats['prepared_misses'],
+        }
+
     def execute_query(self, query, params=None):
+        with self.lock:
+            return self._execute_query(query, params)
+
+    def _execute_query(self, query, params=None):
+        # The connection is in autocommit mode: a read ends without a COMMIT round trip and a
+        # single write statement is committed by the server as it executes.
         try:
             self.connect()
             if params:
                 self.cursor.execute(query, params)
             else:
                 self.cursor.execute(query)
-            self.connection.commit()
+            self._count('statements')
             return True
         except Error as e:
             logger.error(f"Error executing query: {e}")
-            self.connection.rollback()
+            self._rollback(self.connection)
             return False
 
     def execute_many(self, query, params_list):
+        with self.lock:
+            return self._execute_many(query, params_list)
+
+    def _execute_many(self, query, params_list):
         try:
             self.connect()
+            self.connection.start_transaction()
+            self._count('transactions')
             self.cursor.executemany(query, params_list)
+            self._count('statements')
             self.connection.commit()
+            self._count('commits')
             return True
         except Error as e:
             logger.error(f"Error executing batch query: {e}")
-            self.connection.rollback()
+            self._rollback(self.connection)
             return False
 
+    def execute_prepared(self, query, params=()):
+        """
+        Runs a parameterized statement as a server-side prepared statement and returns its rows
+        as dictionaries.
+
+        Each distinct SQL text is prepared once on the shared connection and re-executed with new
+        bound values, so the server parses and plans it only once. The shared connection never
+        goes back to the pool, whose session reset would deallocate the statements. The least
+        recently used statement is closed when more than PREPARED_CACHE_SIZE are open.
+
+        :param query: SQL with %s placeholders.
+        :param params: The values bound to the placeholders.
+        """
+        with self.lock:
+            if not self.connect():
+                raise Error(msg="Not connected to the database")
+            if self._prepared_connection is not self.connection:
+                # Statements prepared on a previous connection died with it.
+                self._prepared.clear()
+                self._prepared_connection = self.connection
+
+            cursor = self._prepared.get(query)
+            if cursor is None:
+                self._count('prepared_misses')
+                cursor = self.connection.cursor(prepared=True)
+                self._prepared[query] = cursor
+                while len(self._prepared) > PREPARED_CACHE_SIZE:
+                    self._prepared.popitem(last=False)[1].close()
+            else:
+                self._count('prepared_hits')
+                self._prepared.move_to_end(query)
+
+            try:
+                cursor.execute(query, tuple(params))
+                rows = cursor.fetchall()
+            except Error:
+                self._count('errors')
+                self._prepared.pop(query, None)
+                try:
+                    cursor.close()
+                except Error:
+                    pass
+                raise
+            self._count('statements')
+            return [dict(zip(cursor.column_names, row)) for row in rows]
+
     def fetchone(self):
-        return self.cursor.fetchone() if self.cursor else None
+        with self.lock:
+            return self.cursor.fetchone() if self.cursor else None
 
     def fetchall(self):
-        return self.cursor.fetchall() if self.cursor else []
+        with self.lock:
+            return self.cursor.fetchall() if self.cursor else []
 
     def close(self):
+        for cursor in self._prepared.values():
+            try:
+                cursor.close()
+            except Error:
+                pass
+        self._prepared.clear()
         if self.cursor:
             self.cursor.close()
         if self.connection:
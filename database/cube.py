@@ -0,0 +1,154 @@
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Dimensions of PatientCube, in primary-key order. NULL is stored as NULL_CODE because primary
+# key columns cannot be NULL; the cube queries map it back with NULLIF.
+# The upserts name the inserted row (AS new) instead of using VALUES(), which MySQL 8.0.20+
+# deprecates with a warning that raise_on_warnings turns into an error.
+CUBE_DIMENSIONS = [
+    "age_group", "sex", "icu", "usmer", "classification_final", "diabetes",
+    "hipertension", "obesity", "tobacco", "intubed", "died"
+]
+CUBE_MEASURES = ["patient_count", "age_sum", "aged_count"]
+NULL_CODE = -1
+
+PATIENT_CUBE_UPSERT = f"""
+    INSERT INTO PatientCube ({", ".join(CUBE_DIMENSIONS + CUBE_MEASURES)})
+    VALUES ({", ".join(["%s"] * (len(CUBE_DIMENSIONS) + len(CUBE_MEASURES)))}) AS new
+    ON DUPLICATE KEY UPDATE
+        patient_count = patient_count + new.patient_count,
+        age_sum = age_sum + new.age_sum,
+        aged_count = aged_count + new.aged_count
+"""
+
+DEATH_CUBE_UPSERT = """
+    INSERT INTO DeathCube (date_died, classification_final, patient_count)
+    VALUES (%s, %s, %s) AS new
+    ON DUPLICATE KEY UPDATE patient_count = patient_count + new.patient_count
+"""
+
+PATIENT_CUBE_REBUILD = f"""
+    INSERT INTO PatientCube ({", ".join(CUBE_DIMENSIONS + CUBE_MEASURES)})
+    SELECT
+        COALESCE(FLOOR(age / 10) * 10, {NULL_CODE}),
+        {", ".join(f"COALESCE({column}, {NULL_CODE})" for column in CUBE_DIMENSIONS[1:-1])},
+        date_died IS NOT NULL,
+        COUNT(*),
+        COALESCE(SUM(age), 0),
+        COUNT(age)
+    FROM Patients
+    GROUP BY {", ".join(str(position) for position in range(1, len(CUBE_DIMENSIONS) + 1))}
+"""
+
+DEATH_CUBE_REBUILD = f"""
+    INSERT INTO DeathCube (date_died, classification_final, patient_count)
+    SELECT date_died, COALESCE(classification_final, {NULL_CODE}), COUNT(*)
+    FROM Patients
+    WHERE date_died IS NOT NULL
+    GROUP BY 1, 2
+"""
+
+
+def _codes(series):
+    return series.fillna(NULL_CODE).astype("int64")
+
+
+def cube_deltas(frame):
+    """
+    Aggregates a converted chunk of patients into the cube cells it adds to.
+
+    :param frame: DataFrame with the upper-case patient CSV columns, numeric codes already
+                  converted and DATE_DIED as 'YYYY-MM-DD' strings (missing for survivors).
+    :return: A tuple of (patient_cube_rows, death_cube_rows) of parameter tuples for the upserts.
+    """
+    ages = frame["AGE"]
+    cells = pd.DataFrame({
+        "age_group": _codes(ages // 10 * 10),
+        **{column: _codes(frame[column.upper()]) for column in CUBE_DIMENSIONS[1:-1]},
+        "died": frame["DATE_DIED"].notna().astype("int64"),
+        "patient_count": 1,
+        "age_sum": ages.fillna(0).astype("int64"),
+        "aged_count": ages.notna().astype("int64"),
+    })
+    patient_rows = cells.groupby(CUBE_DIMENSIONS, sort=False).sum().reset_index()
+
+    deaths = frame[frame["DATE_DIED"].notna()]
+    death_rows = pd.DataFrame({
+        "date_died": deaths["DATE_DIED"],
+        "classification_final": _codes(deaths["CLASSIFICATION_FINAL"]),
+    }).groupby(["date_died", "classification_final"], sort=False).size().reset_index()
+
+    return (
+        [tuple(row) for row in patient_rows[CUBE_DIMENSIONS + CUBE_MEASURES].astype("int64").values.tolist()],
+        [(date_died, int(classification), int(count)) for date_died, classification, count in death_rows.values.tolist()],
+    )
+
+
+def apply_cube_deltas(cursor, frame):
+    """
+    Adds a converted chunk of newly inserted patients to the cubes.
+
+    Call it with the cursor of the transaction that inserted the chunk, so the cubes and
+    Patients are committed together.
+    """
+    patient_rows, death_rows = cube_deltas(frame)
+    if patient_rows:
+        cursor.executemany(PATIENT_CUBE_UPSERT, patient_rows)
+    if death_rows:
+        cursor.executemany(DEATH_CUBE_UPSERT, death_rows)
+
+
+def clear_cubes(cursor):
+    cursor.execute("DELETE FROM PatientCube")
+    cursor.execute("DELETE FROM DeathCube")
+
+
+def rebuild_cubes(db_connection):
+    """
+    Recomputes both cubes from Patients in one transaction.
+    """
+    with db_connection.transaction() as cursor:
+        clear_cubes(cursor)
+        cursor.execute(PATIENT_CUBE_REBUILD)
+        cursor.execute(DEATH_CUBE_REBUILD)
+
+
+def ensure_cubes(db_connection, verify=False):
+    """
+    Builds the cubes when Patients holds rows but PatientCube is empty, e.g. for rows loaded
+    before the cubes existed.
+
+    :param verify: Also rebuild them when they do not count exactly the patients and deaths in
+                   Patients. This counts the whole table, so it is meant for after a failed load,
+                   not for every startup; loads that succeed keep the cubes in step chunk by chunk.
+    :return: True if the cubes were rebuilt.
+    """
+    if not verify:
+        with db_connection.session() as cursor:
+            cursor.execute("SELECT 1 FROM PatientCube LIMIT 1")
+            has_cells = cursor.fetchone() is not None
+            cursor.execute("SELECT 1 FROM Patients LIMIT 1")
+            has_patients = cursor.fetchone() is not None
+        if has_cells or not has_patients:
+            return False
+        logger.info("Building the aggregate cubes from Patients")
+        rebuild_cubes(db_connection)
+        return True
+
+    with db_connection.session() as cursor:
+        cursor.execute("SELECT COALESCE(SUM(patient_count), 0) AS total FROM PatientCube")
+        cube_patients = int(cursor.fetchone()["total"])
+        cursor.execute("SELECT COALESCE(SUM(patient_count), 0) AS total FROM DeathCube")
+        cube_deaths = int(cursor.fetchone()["total"])
+        cursor.execute("SELECT COUNT(*) AS patients, COUNT(date_died) AS deaths FROM Patients")
+        row = cursor.fetchone()
+
+    if (cube_patients, cube_deaths) == (int(row["patients"]), int(row["deaths"])):
+        return False
+    logger.info(f"Rebuilding the aggregate cubes from Patients ({cube_patients} patients and "
+                f"{cube_deaths} deaths in the cubes, {row['patients']} and {row['deaths']} in Patients)")
+    rebuild_cubes(db_connection)
+    return True
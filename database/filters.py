@@ -0,0 +1,211 @@
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+
+from database.patient_store import PATIENT_COLUMNS
+
+DATE_COLUMNS = {"date_died"}
+
+
+def coerce_value(column, value):
+    """
+    Converts a filter value to the type of its column: a date for date columns, an int otherwise.
+
+    :raises ValueError: If the column is unknown or the value does not convert.
+    """
+    if column not in PATIENT_COLUMNS:
+        raise ValueError(f"Unknown column: {column}")
+    if column in DATE_COLUMNS:
+        return value if isinstance(value, date) else date.fromisoformat(str(value).strip())
+    return int(str(value).strip()) if not isinstance(value, int) else value
+
+
+# Each predicate has a shape (operator, column and arity, but no values) that determines its
+# SQL text, and the params bound to that text. Date predicates on date_died restate their bounds
+# on death_month so a partitioned Patients table is pruned.
+
+class Equals(namedtuple("Equals", ["column", "value"])):
+    __slots__ = ()
+
+    def shape(self):
+        return "=", self.column
+
+    def params(self):
+        return [self.value, self.value] if self.column in DATE_COLUMNS else [self.value]
+
+    def describe(self):
+        return f"{self.column} = {self.value}"
+
+
+class Range(namedtuple("Range", ["column", "low", "high"])):
+    """Inclusive range; either bound may be None for an open end."""
+    __slots__ = ()
+
+    def shape(self):
+        return "range", self.column, self.low is not None, self.high is not None
+
+    def params(self):
+        bounds = [bound for bound in (self.low, self.high) if bound is not None]
+        return bounds * 2 if self.column in DATE_COLUMNS else bounds
+
+    def describe(self):
+        if self.low is None:
+            return f"{self.column} ≤ {self.high}"
+        if self.high is None:
+            return f"{self.column} ≥ {self.low}"
+        return f"{self.column} between {self.low} and {self.high}"
+
+
+class In(namedtuple("In", ["column", "values"])):
+    __slots__ = ()
+
+    def shape(self):
+        return "in", self.column, len(self.values)
+
+    def params(self):
+        return list(self.values)
+
+    def describe(self):
+        return f"{self.column} in ({', '.join(str(value) for value in self.values)})"
+
+
+class IsNull(namedtuple("IsNull", ["column", "null"])):
+    __slots__ = ()
+
+    def shape(self):
+        return "null", self.column, self.null
+
+    def params(self):
+        return []
+
+    def describe(self):
+        return f"{self.column} is {'empty' if self.null else 'not empty'}"
+
+
+def equals(column, value):
+    return Equals(column, coerce_value(column, value))
+
+
+def between(column, low=None, high=None):
+    if low is None and high is None:
+        raise ValueError("A range needs at least one bound")
+    low = None if low is None else coerce_value(column, low)
+    high = None if high is None else coerce_value(column, high)
+    if low is not None and high is not None and low > high:
+        low, high = high, low
+    return Range(column, low, high)
+
+
+def one_of(column, values):
+    values = tuple(sorted({coerce_value(column, value) for value in values}))
+    if not values:
+        raise ValueError("An IN list needs at least one value")
+    return Equals(column, values[0]) if len(values) == 1 else In(column, values)
+
+
+def is_null(column, null=True):
+    if column not in PATIENT_COLUMNS:
+        raise ValueError(f"Unknown column: {column}")
+    return IsNull(column, null)
+
+
+@lru_cache(maxsize=256)
+def _compile_predicate(shape):
+    operator, column = shape[0], shape[1]
+    dated = column in DATE_COLUMNS
+    month = "EXTRACT(YEAR_MONTH FROM %s)"
+    if operator == "=":
+        return f"{column} = %s AND death_month = {month}" if dated else f"{column} = %s"
+    if operator == "range":
+        has_low, has_high = shape[2], shape[3]
+        if has_low and has_high:
+            sql = f"{column} BETWEEN %s AND %s"
+            return f"{sql} AND death_month BETWEEN {month} AND {month}" if dated else sql
+        comparison = ">=" if has_low else "<="
+        sql = f"{column} {comparison} %s"
+        return f"{sql} AND death_month {comparison} {month} AND death_month > 0" if dated else sql
+    if operator == "in":
+        return f"{column} IN ({', '.join(['%s'] * shape[2])})"
+    if operator == "null":
+        sql = f"{column} IS NULL" if shape[2] else f"{column} IS NOT NULL"
+        if dated:
+            sql += " AND death_month = 0" if shape[2] else " AND death_month > 0"
+        return sql
+    raise ValueError(f"Unknown predicate: {operator}")
+
+
+@lru_cache(maxsize=256)
+def compile_shape(shape):
+    """
+    Returns the WHERE clause text of a filter shape, compiled once and reused for every filter
+    of the same shape whatever its values.
+    """
+    return " AND ".join(f"({_compile_predicate(predicate)})" for predicate in shape)
+
+
+def sort_order(column, descending=False):
+    """Returns the ORDER BY clause text of a sort column, with patient_id breaking ties."""
+    direction = "DESC" if descending else "ASC"
+    if column == "patient_id":
+        return f"patient_id {direction}"
+    return f"{column} {direction}, patient_id {direction}"
+
+
+def seek_condition(column, key, descending=False, inclusive=True):
+    """
+    Returns (condition, params) selecting the Patients rows at or after a (sort value, patient_id)
+    key in ORDER BY column, patient_id order, with NULLs first ascending and last descending.
+    With inclusive=False the key's own row is left out, for continuing after a row already read.
+
+    The condition only compares the bare column and patient_id, in the form MySQL's range
+    optimizer turns into index ranges on the (column, patient_id) sort indexes: the key's own
+    value from its patient_id on, then every larger value. Row constructors such as
+    (column, patient_id) >= (%s, %s) are not used for range access. NULL sort values get their
+    own disjunct, which is a separate range on the same index.
+    """
+    value, patient_id = key
+    # Comparisons of patient_id that keep, and that drop, rows sharing the key's sort value
+    if descending:
+        kept, dropped = ("<=", ">") if inclusive else ("<", ">=")
+    else:
+        kept, dropped = (">=", "<") if inclusive else (">", "<=")
+    if column == "patient_id":
+        return f"patient_id {kept} %s", [patient_id]
+    if descending:
+        if value is None:
+            return f"({column} IS NULL AND patient_id {kept} %s)", [patient_id]
+        return (f"(({column} <= %s AND NOT ({column} = %s AND patient_id {dropped} %s)) OR {column} IS NULL)",
+                [value, value, patient_id])
+    if value is None:
+        return f"(({column} IS NULL AND patient_id {kept} %s) OR {column} IS NOT NULL)", [patient_id]
+    return f"({column} >= %s AND NOT ({column} = %s AND patient_id {dropped} %s))", [value, value, patient_id]
+
+
+class PatientFilter(tuple):
+    """
+    A conjunction of typed predicates over Patients, compiled to parameterized SQL.
+
+    Predicates are sargable (plain comparisons, BETWEEN and IN on the bare column), so MySQL
+    can answer them with the workload indexes instead of scanning. Predicates are kept in a
+    canonical order, so filters that differ only in the order they were built share a shape,
+    and filters are hashable, so views can cache results per filter.
+    """
+
+    def __new__(cls, predicates=()):
+        return super().__new__(cls, sorted(predicates, key=lambda predicate: predicate.shape()))
+
+    def __add__(self, other):
+        return PatientFilter(tuple(self) + tuple(other))
+
+    @property
+    def shape(self):
+        return tuple(predicate.shape() for predicate in self)
+
+    def compile(self):
+        """
+        :return: A tuple of (sql, params) for use after WHERE.
+        """
+        return compile_shape(self.shape), [param for predicate in self for param in predicate.params()]
+
+    def describe(self):
+        return " AND ".join(predicate.describe() for predicate in self)
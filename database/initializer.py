@@ -1,16 +1,24 @@
 import csv
-from datetime import datetime
+import hashlib
+import os
+import time
 
-from database.schema import CREATE_TABLES_QUERIES
+import pandas as pd
+
+from appconfig.settings import DB_NAME
+from database.cube import apply_cube_deltas, clear_cubes, ensure_cubes
+from database.metadata import notify_rows_inserted, notify_table_changed, update_column_bounds
+from database.partitions import maintain_patient_partitions
+from database.schema import CREATE_TABLES_QUERIES, INDEXES
 
 def initialize_database(db_connection):
     """
     Initializes the database by creating necessary tables if they don't exist.
     :param db_connection: The database connection instance.
     """
-    create_db_query = """CREATE DATABASE IF NOT EXISTS covid_data;"""
+    create_db_query = f"""CREATE DATABASE IF NOT EXISTS {DB_NAME};"""
     db_connection.execute_query(create_db_query)
-    use_db_query = """USE covid_data;"""
+    use_db_query = f"""USE {DB_NAME};"""
     db_connection.execute_query(use_db_query)
     for table_name, query in CREATE_TABLES_QUERIES.items():
         try:
@@ -19,6 +27,346 @@ def initialize_database(db_connection):
         except Exception as e:
             print(f"Error creating table {table_name}: {e}")
 
+    create_missing_indexes(db_connection)
+    maintain_patient_partitions(db_connection)
+
+
+def create_missing_indexes(db_connection):
+    """
+    Creates the INDEXES that do not exist yet and rebuilds those whose columns changed.
+
+    :param db_connection: The database connection instance.
+    """
+    query = """
+        SELECT index_name AS index_name,
+               GROUP_CONCAT(column_name ORDER BY seq_in_index) AS index_columns
+        FROM information_schema.statistics
+        WHERE table_schema = %s AND LOWER(table_name) = LOWER(%s)
+        GROUP BY index_name
+    """
+    existing = {}
+    for table_name in {table for table, _ in INDEXES.values()}:
+        with db_connection.lock:
+            db_connection.execute_query(query, (DB_NAME, table_name))
+            rows = db_connection.fetchall()
+        existing[table_name] = {row['index_name']: row['index_columns'].lower().split(',') for row in rows}
+
+    for index_name, (table_name, columns) in INDEXES.items():
+        current = existing[table_name].get(index_name)
+        column_list = ", ".join(columns)
+        if current == columns:
+            continue
+        if current is None:
+            statement = f"CREATE INDEX {index_name} ON {table_name} ({column_list})"
+        else:
+            statement = f"ALTER TABLE {table_name} DROP INDEX {index_name}, ADD INDEX {index_name} ({column_list})"
+
+        started = time.perf_counter()
+        if db_connection.execute_query(statement):
+            print(f"Index {index_name} on {table_name}({column_list}) built in {time.perf_counter() - started:.2f}s.")
+        else:
+            print(f"Error creating index {index_name} on {table_name}.")
+
+
+PATIENT_CSV_COLUMNS = [
+    'USMER', 'MEDICAL_UNIT', 'SEX', 'PATIENT_TYPE', 'DATE_DIED', 'INTUBED',
+    'PNEUMONIA', 'AGE', 'PREGNANT', 'DIABETES', 'COPD', 'ASTHMA', 'INMSUPR',
+    'HIPERTENSION', 'OTHER_DISEASE', 'CARDIOVASCULAR', 'OBESITY', 'RENAL_CHRONIC',
+    'TOBACCO', 'CLASSIFICATION_FINAL', 'ICU'
+]
+
+PATIENT_INSERT_QUERY = f"""
+    INSERT INTO Patients ({", ".join(column.lower() for column in PATIENT_CSV_COLUMNS)})
+    VALUES ({", ".join(["%s"] * len(PATIENT_CSV_COLUMNS))})
+"""
+
+CSV_CHUNK_SIZE = 50000
+
+# DATE_DIED value the source dataset uses for patients who survived; it is stored as NULL.
+MISSING_DATE = '9999-99-99'
+
+FINGERPRINT_BLOCK_SIZE = 1 << 20
+
+# Manifest hash of a dataset whose rows were deleted for a reload that has not finished yet
+RELOADING_HASH = 'reloading'
+
+MANIFEST_REPLACE_QUERY = """
+    REPLACE INTO DatasetManifest (dataset_name, file_path, file_size, file_mtime, file_hash, row_count)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+
+def convert_patient_frame(frame, date_format='%d/%m/%Y'):
+    """
+    Converts a chunk of patient CSV data with vectorized column operations.
+
+    :param frame: DataFrame with the PATIENT_CSV_COLUMNS (upper-case headers).
+    :param date_format: The format of DATE_DIED; empty cells and MISSING_DATE become NULL.
+    :return: A DataFrame with numeric codes and DATE_DIED as 'YYYY-MM-DD' strings.
+    :raises ValueError: If any cell is not a valid date or integer code, naming the columns, the
+                        number of invalid cells and the first offending CSV line of each.
+    """
+    raw = frame[PATIENT_CSV_COLUMNS]
+    frame = raw.copy()
+    invalid = {}
+
+    raw_dates = frame['DATE_DIED'].astype(str).str.strip().where(frame['DATE_DIED'].notna())
+    present = raw_dates.notna() & (raw_dates != '') & (raw_dates != MISSING_DATE)
+    dates = pd.to_datetime(raw_dates.where(present), format=date_format, errors='coerce')
+    invalid['DATE_DIED'] = present & dates.isna()
+    frame['DATE_DIED'] = dates.dt.strftime('%Y-%m-%d')
+
+    numeric_columns = [column for column in PATIENT_CSV_COLUMNS if column != 'DATE_DIED']
+    numbers = frame[numeric_columns].apply(pd.to_numeric, errors='coerce')
+    for column in numeric_columns:
+        invalid[column] = (frame[column].notna() & numbers[column].isna()) | (numbers[column].notna() & (numbers[column] % 1 != 0))
+    frame[numeric_columns] = numbers
+
+    errors = []
+    for column, mask in invalid.items():
+        if mask.any():
+            first = mask.idxmax()
+            errors.append(f"{column} ({int(mask.sum())} cells, first on line {first + 2}: {raw.at[first, column]!r})")
+    if errors:
+        raise ValueError(f"Invalid values in {', '.join(errors)}")
+    return frame
+
+
+def patient_rows_from_frame(frame):
+    """
+    Converts a chunk from convert_patient_frame into INSERT parameter tuples.
+
+    :param frame: A converted DataFrame.
+    :return: A tuple of (rows, bounds) where rows are tuples in PATIENT_CSV_COLUMNS order and
+             bounds maps every numeric column to its (min, max) in the chunk.
+    """
+    numeric_columns = [column for column in PATIENT_CSV_COLUMNS if column != 'DATE_DIED']
+    minimums = frame[numeric_columns].min()
+    maximums = frame[numeric_columns].max()
+    bounds = {
+        column: (minimums[column], maximums[column])
+        for column in numeric_columns
+        if pd.notna(minimums[column])
+    }
+
+    columns = []
+    for column in PATIENT_CSV_COLUMNS:
+        series = frame[column]
+        missing = series.isna()
+        if not missing.any():
+            columns.append(series.tolist() if column == 'DATE_DIED' else series.astype('int64').tolist())
+        elif column == 'DATE_DIED':
+            columns.append(series.astype(object).where(~missing, None).tolist())
+        else:
+            columns.append([None if is_missing else int(value) for value, is_missing in zip(series, missing)])
+    return list(zip(*columns)), bounds
+
+
+def bulk_insert_patients(db_connection, chunks, date_format='%d/%m/%Y', progress_callback=None):
+    """
+    Inserts patient DataFrame chunks with one batched INSERT transaction per chunk. The same
+    transaction adds the chunk to the aggregate cubes, so they always match Patients.
+
+    :param db_connection: The database connection instance.
+    :param chunks: An iterable of DataFrames, e.g. from pd.read_csv(..., chunksize=...).
+    :param date_format: The format of the DATE_DIED column.
+    :param progress_callback: Optional callable receiving (rows_inserted, rows_per_second) after each chunk.
+    :return: The number of rows inserted.
+    :raises ValueError: If a chunk holds invalid values (see convert_patient_frame).
+    :raises RuntimeError: If a chunk fails to insert. In either case the chunks committed before it stay
+                          in Patients, and the column bounds, partitions and table change listeners are
+                          still updated for them. Each committed chunk is passed to notify_rows_inserted.
+    """
+    started = time.perf_counter()
+    inserted = 0
+    bounds = {}
+    completed = False
+    try:
+        for chunk in chunks:
+            frame = convert_patient_frame(chunk, date_format)
+            rows, chunk_bounds = patient_rows_from_frame(frame)
+            if not rows:
+                continue
+            try:
+                with db_connection.transaction() as cursor:
+                    cursor.executemany(PATIENT_INSERT_QUERY, rows)
+                    apply_cube_deltas(cursor, frame)
+            except Exception as e:
+                raise RuntimeError(f"Failed to insert a chunk of {len(rows)} patients after {inserted} rows: {e}") from e
+            inserted += len(rows)
+            notify_rows_inserted('Patients', frame)
+
+            for column, (low, high) in chunk_bounds.items():
+                old_low, old_high = bounds.get(column, (low, high))
+                bounds[column] = (min(old_low, low), max(old_high, high))
+
+            if progress_callback:
+                progress_callback(inserted, inserted / max(time.perf_counter() - started, 1e-9))
+        completed = True
+    finally:
+        if not completed:
+            # A failed chunk rolls back together with its cube deltas, but the cubes are checked
+            # against Patients rather than trusted after an error.
+            try:
+                ensure_cubes(db_connection, verify=True)
+            except Exception as e:
+                print(f"Error checking the aggregate cubes: {e}")
+        if inserted:
+            elapsed = time.perf_counter() - started
+            print(f"Inserted {inserted} patients in {elapsed:.2f}s ({inserted / max(elapsed, 1e-9):.0f} rows/s).")
+            try:
+                maintain_patient_partitions(db_connection)
+            finally:
+                # Also notifies the table change listeners; each chunk went to notify_rows_inserted.
+                update_column_bounds(db_connection, 'Patients', bounds, appended=True)
+    return inserted
+
+
+def scan_file(file_path, length=None):
+    """
+    Hashes a file (or its first ``length`` bytes) and counts its CSV data rows in one streaming pass.
+
+    :param file_path: Path to the file.
+    :param length: Only read this many bytes from the start of the file.
+    :return: A tuple of (sha256 hex digest, number of data rows below the header).
+    """
+    digest = hashlib.sha256()
+    newlines = 0
+    last_byte = b"\n"
+    remaining = length
+    with open(file_path, mode='rb') as datafile:
+        while remaining is None or remaining > 0:
+            block_size = FINGERPRINT_BLOCK_SIZE if remaining is None else min(FINGERPRINT_BLOCK_SIZE, remaining)
+            block = datafile.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+            newlines += block.count(b"\n")
+            last_byte = block[-1:]
+            if remaining is not None:
+                remaining -= len(block)
+    lines = newlines + (0 if last_byte == b"\n" else 1)
+    return digest.hexdigest(), max(lines - 1, 0)
+
+
+def get_dataset_manifest(db_connection, dataset_name):
+    query = "SELECT * FROM DatasetManifest WHERE dataset_name = %s"
+    db_connection.execute_query(query, (dataset_name,))
+    return db_connection.fetchone()
+
+
+def save_dataset_manifest(db_connection, dataset_name, file_path, file_hash, row_count):
+    """
+    Records the fingerprint of the file a dataset was last loaded from.
+    """
+    stat = os.stat(file_path)
+    db_connection.execute_query(
+        MANIFEST_REPLACE_QUERY,
+        (dataset_name, os.path.abspath(file_path), stat.st_size, stat.st_mtime, file_hash, row_count)
+    )
+
+
+def _read_appended_rows(file_path, offset, skip_rows):
+    """
+    Yields DataFrame chunks of the rows appended to a CSV after its first ``offset`` bytes.
+    """
+    with open(file_path, mode='rb') as csvfile:
+        header = csvfile.readline().decode('utf-8').strip().split(',')
+        csvfile.seek(offset - 1)
+        if csvfile.read(1) == b"\n":
+            chunks = pd.read_csv(csvfile, header=None, names=header, chunksize=CSV_CHUNK_SIZE,
+                                 dtype={'DATE_DIED': str})
+        else:
+            # The previous last row had no trailing newline, so the appended text continues it.
+            csvfile.seek(0)
+            chunks = pd.read_csv(csvfile, skiprows=range(1, skip_rows), chunksize=CSV_CHUNK_SIZE,
+                                 dtype={'DATE_DIED': str})
+        yield from chunks
+
+
+def _reload_patients(db_connection, csv_file_path, dataset_name, file_hash, row_count):
+    """
+    Replaces the rows of Patients with the rows of the CSV.
+
+    The delete commits together with a manifest entry marked RELOADING_HASH, and the fingerprint
+    of the file is saved only once every chunk is inserted. A reload cut short by an error or a
+    crash therefore leaves the dataset marked as reloading, and the next sync starts it over
+    instead of keeping a half-loaded table.
+    """
+    stat = os.stat(csv_file_path)
+    with db_connection.transaction() as cursor:
+        cursor.execute("DELETE FROM Patients")
+        cursor.execute("DELETE FROM ColumnBounds WHERE table_name = %s", ('patients',))
+        clear_cubes(cursor)
+        cursor.execute(
+            MANIFEST_REPLACE_QUERY,
+            (dataset_name, os.path.abspath(csv_file_path), stat.st_size, stat.st_mtime, RELOADING_HASH, 0)
+        )
+    notify_table_changed('Patients')
+    chunks = pd.read_csv(csv_file_path, chunksize=CSV_CHUNK_SIZE, dtype={'DATE_DIED': str})
+    inserted = bulk_insert_patients(db_connection, chunks)
+    save_dataset_manifest(db_connection, dataset_name, csv_file_path, file_hash, row_count)
+    return inserted
+
+
+def sync_patients_csv(db_connection, csv_file_path, dataset_name='patients'):
+    """
+    Loads the patient CSV only if it differs from the manifest of the last load.
+
+    An unchanged file is detected from its size and mtime without reading it. A file that only grew
+    (its old bytes hash to the stored fingerprint) has just the appended rows loaded. A rewritten
+    file is reloaded only if the table still holds exactly the previously loaded rows. A load or
+    reload that did not finish is started over.
+
+    :param db_connection: The database connection instance.
+    :param csv_file_path: Path to the patient CSV file.
+    :param dataset_name: The manifest key of the dataset.
+    :return: The number of rows inserted.
+    """
+    stat = os.stat(csv_file_path)
+    manifest = get_dataset_manifest(db_connection, dataset_name)
+
+    if manifest and manifest['file_hash'] == RELOADING_HASH:
+        print(f"The last load of dataset {dataset_name} did not finish; reloading it.")
+        file_hash, row_count = scan_file(csv_file_path)
+        return _reload_patients(db_connection, csv_file_path, dataset_name, file_hash, row_count)
+
+    if manifest and manifest['file_size'] == stat.st_size and manifest['file_mtime'] == stat.st_mtime:
+        print(f"Dataset {dataset_name} is unchanged; skipping load.")
+        return 0
+
+    if manifest is None:
+        db_connection.execute_query("SELECT 1 FROM Patients LIMIT 1")
+        already_loaded = db_connection.fetchone()
+        file_hash, row_count = scan_file(csv_file_path)
+        if not already_loaded:
+            return _reload_patients(db_connection, csv_file_path, dataset_name, file_hash, row_count)
+        save_dataset_manifest(db_connection, dataset_name, csv_file_path, file_hash, row_count)
+        return 0
+
+    old_size = int(manifest['file_size'])
+    old_rows = int(manifest['row_count'])
+    if stat.st_size > old_size and scan_file(csv_file_path, old_size)[0] == manifest['file_hash']:
+        print(f"Dataset {dataset_name} grew from {old_size} to {stat.st_size} bytes; loading appended rows.")
+        inserted = bulk_insert_patients(db_connection, _read_appended_rows(csv_file_path, old_size, old_rows + 1))
+        file_hash, row_count = scan_file(csv_file_path)
+        save_dataset_manifest(db_connection, dataset_name, csv_file_path, file_hash, row_count)
+        return inserted
+
+    file_hash, row_count = scan_file(csv_file_path)
+    if file_hash == manifest['file_hash']:
+        save_dataset_manifest(db_connection, dataset_name, csv_file_path, file_hash, row_count)
+        return 0
+
+    db_connection.execute_query("SELECT COUNT(*) AS total FROM Patients")
+    result = db_connection.fetchone()
+    if not result or int(result['total']) != old_rows:
+        print(f"Dataset {dataset_name} was rewritten, but Patients also holds uploaded rows; not reloading.")
+        return 0
+
+    print(f"Dataset {dataset_name} was rewritten; reloading it.")
+    return _reload_patients(db_connection, csv_file_path, dataset_name, file_hash, row_count)
+
 
 def insert_data_from_csv(db_connection, csv_file_path, table_name):
     """
@@ -28,38 +376,19 @@ def insert_data_from_csv(db_connection, csv_file_path, table_name):
     :param table_name: Name of the table to insert data into.
     """
     try:
-        with open(csv_file_path, mode='r', encoding='utf-8') as csvfile:
-            csv_reader = csv.DictReader(csvfile)
-
-            if table_name == 'users':
-                query = "SELECT * FROM Users"
-                db_connection.execute_query(query)
-                if not db_connection.fetchone():
-                    for row in csv_reader:
-                        columns = "username, password_hash, role, budget"
-                        placeholders = "%s, %s, %s, %s"
-                        values = (
-                            row['username'],
-                            row['hashed_password'],
-                            row['role'],
-                            row['budget'],
-                        )
-                        insert_query = f"INSERT INTO Users ({columns}) VALUES ({placeholders})"
-                        db_connection.execute_query(insert_query, values)
-            elif table_name == 'patients':
-                query = "SELECT * FROM Patients"
-                db_connection.execute_query(query)
-                if not db_connection.fetchone():
-                    for row in csv_reader:
-                        if row['DATE_DIED'] == '9999-99-99':
-                            row['DATE_DIED'] = None
-                        else:
-                            row['DATE_DIED'] = datetime.strptime(row['DATE_DIED'], '%d/%m/%Y').strftime('%Y-%m-%d')
-                        columns = ", ".join(row.keys())
-                        placeholders = ", ".join(["%s"] * len(row))
-                        values = list(row.values())
-                        insert_query = f"INSERT INTO Patients ({columns}) VALUES ({placeholders})"
-                        db_connection.execute_query(insert_query, values)
+        if table_name == 'users':
+            query = "SELECT 1 FROM Users LIMIT 1"
+            db_connection.execute_query(query)
+            if not db_connection.fetchone():
+                with open(csv_file_path, mode='r', encoding='utf-8') as csvfile:
+                    values = [
+                        (row['username'], row['hashed_password'], row['role'], row['budget'])
+                        for row in csv.DictReader(csvfile)
+                    ]
+                insert_query = "INSERT INTO Users (username, password_hash, role, budget) VALUES (%s, %s, %s, %s)"
+                db_connection.execute_many(insert_query, values)
+        elif table_name == 'patients':
+            sync_patients_csv(db_connection, csv_file_path)
     except Exception as e:
         print(f"Error processing CSV file {csv_file_path}: {e}")
 
@@ -73,3 +402,5 @@ def load_data(db_connection, accounts_csv_path, covid_data_csv_path):
     insert_data_from_csv(db_connection, accounts_csv_path, 'users')
 
     insert_data_from_csv(db_connection, covid_data_csv_path, 'patients')
+
+    ensure_cubes(db_connection)
@@ -0,0 +1,149 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+_table_change_listeners = []
+_rows_inserted_listeners = []
+
+
+def add_table_change_listener(listener, on_append=True):
+    """
+    Registers a callback that is invoked whenever rows are written to a table.
+
+    :param listener: A callable taking the name of the changed table.
+    :param on_append: Also invoke it when rows were only appended. Pass False for a listener that
+                      keeps itself current through add_rows_inserted_listener instead.
+    """
+    if listener not in [registered for registered, _ in _table_change_listeners]:
+        _table_change_listeners.append((listener, on_append))
+
+
+def notify_table_changed(table_name, appended=False):
+    """
+    Notifies every registered listener that the contents of a table changed.
+
+    :param table_name: The name of the changed table.
+    :param appended: True if rows were only inserted, each batch already passed to notify_rows_inserted.
+    """
+    for listener, on_append in list(_table_change_listeners):
+        if appended and not on_append:
+            continue
+        try:
+            listener(table_name)
+        except Exception as e:
+            logger.error(f"Error in table change listener for {table_name}: {e}")
+
+
+def add_rows_inserted_listener(listener):
+    """
+    Registers a callback that is invoked with every committed batch of inserted rows.
+
+    :param listener: A callable taking the table name and a DataFrame of the inserted rows.
+    """
+    if listener not in _rows_inserted_listeners:
+        _rows_inserted_listeners.append(listener)
+
+
+def notify_rows_inserted(table_name, frame):
+    """
+    Passes a committed batch of inserted rows to every registered listener.
+
+    :param table_name: The name of the table the rows were inserted into.
+    :param frame: The inserted rows.
+    """
+    for listener in list(_rows_inserted_listeners):
+        try:
+            listener(table_name, frame)
+        except Exception as e:
+            logger.error(f"Error in rows inserted listener for {table_name}: {e}")
+
+
+def update_column_bounds(db_connection, table_name, bounds, appended=False):
+    """
+    Widens the stored min/max bounds of the given columns with the bounds of newly inserted rows.
+
+    A column with no stored bounds yet, e.g. in a table loaded before bounds were maintained, is
+    seeded from a MIN/MAX of the whole table instead, so its bounds cover the older rows too.
+
+    :param db_connection: The database connection instance.
+    :param table_name: The table the rows were inserted into.
+    :param bounds: Dictionary mapping column names to (min_value, max_value) tuples.
+    :param appended: Passed on to notify_table_changed.
+    :raises RuntimeError: If the bounds could not be written. Listeners are notified either way,
+                          since the rows themselves are already committed.
+    """
+    query = """
+        INSERT INTO ColumnBounds (table_name, column_name, min_value, max_value)
+        VALUES (%s, %s, %s, %s) AS new
+        ON DUPLICATE KEY UPDATE
+            min_value = LEAST(COALESCE(min_value, new.min_value), new.min_value),
+            max_value = GREATEST(COALESCE(max_value, new.max_value), new.max_value)
+    """
+    table_key = table_name.lower()
+    bounds = dict(bounds)
+    try:
+        with db_connection.transaction() as cursor:
+            cursor.execute("SELECT column_name FROM ColumnBounds WHERE table_name = %s", (table_key,))
+            stored = {row["column_name"] for row in cursor.fetchall()}
+            missing = [column for column in bounds if column.lower() not in stored]
+            if missing:
+                scans = ", ".join(
+                    f"MIN({column}) AS min_{position}, MAX({column}) AS max_{position}"
+                    for position, column in enumerate(missing)
+                )
+                cursor.execute(f"SELECT {scans} FROM {table_name}")
+                row = cursor.fetchone()
+                for position, column in enumerate(missing):
+                    bounds[column] = (row[f"min_{position}"], row[f"max_{position}"])
+
+            params = [
+                (table_key, column.lower(), float(low), float(high))
+                for column, (low, high) in bounds.items()
+                if low is not None and high is not None
+            ]
+            if params:
+                cursor.executemany(query, params)
+    except Exception as e:
+        raise RuntimeError(f"Failed to update the column bounds of {table_name}: {e}") from e
+    finally:
+        notify_table_changed(table_name, appended)
+
+
+def get_column_bounds(db_connection, table_name, column_name):
+    """
+    Reads the maintained bounds of a column, falling back to a one-off scan if none are stored yet.
+
+    :param db_connection: The database connection instance.
+    :param table_name: The table containing the column.
+    :param column_name: The column to look up.
+    :return: A (min_value, max_value) tuple, or None if the column has no values.
+    :raises Exception: Database errors propagate, so an analysis whose sensitivity depends on the
+                       bounds fails instead of falling back to a default.
+    """
+    table_key = table_name.lower()
+    column_name = column_name.lower()
+
+    query = "SELECT min_value, max_value FROM ColumnBounds WHERE table_name = %s AND column_name = %s"
+    with db_connection.session() as cursor:
+        cursor.execute(query, (table_key, column_name))
+        row = cursor.fetchone()
+        if row and row["max_value"] is not None:
+            return row["min_value"], row["max_value"]
+
+        logger.info(f"No stored bounds for {table_name}.{column_name}, scanning the table once")
+        scan_query = f"SELECT MIN({column_name}) AS min_value, MAX({column_name}) AS max_value FROM {table_name}"
+        cursor.execute(scan_query)
+        row = cursor.fetchone()
+        if not row or row["max_value"] is None:
+            return None
+
+        bounds = (float(row["min_value"]), float(row["max_value"]))
+        if not column_name.isidentifier():
+            # Expressions such as CASE WHEN ... are not maintained; the caller caches the scanned result.
+            return bounds
+        cursor.execute(
+            "INSERT IGNORE INTO ColumnBounds (table_name, column_name, min_value, max_value) "
+            "VALUES (%s, %s, %s, %s)",
+            (table_key, column_name, bounds[0], bounds[1])
+        )
+        return bounds
@@ -0,0 +1,154 @@
+import logging
+import time
+
+from appconfig.settings import DB_NAME, PATIENTS_PARTITIONING
+from database.schema import DEATH_MONTH_COLUMN
+
+logger = logging.getLogger(__name__)
+
+SURVIVORS_PARTITION = "p_survivors"
+FUTURE_PARTITION = "p_future"
+# Months past the latest death that get their own partition before rows spill into p_future
+HEADROOM_MONTHS = 1
+
+
+def next_month(month):
+    year, month_of_year = divmod(month, 100)
+    return (year + 1) * 100 + 1 if month_of_year == 12 else month + 1
+
+
+def month_range(first, last):
+    """Yields the YYYYMM keys from first to last inclusive."""
+    month = first
+    while month <= last:
+        yield month
+        month = next_month(month)
+
+
+def month_partition(month):
+    return f"PARTITION p{month} VALUES LESS THAN ({next_month(month)})"
+
+
+def _query(db_connection, query, params=None):
+    with db_connection.session() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+
+def ensure_death_month_column(db_connection):
+    """
+    Adds the death_month column to a Patients table created before it existed.
+    """
+    rows = _query(db_connection, """
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = %s AND LOWER(table_name) = 'patients' AND column_name = 'death_month'
+    """, (DB_NAME,))
+    if not rows:
+        db_connection.execute_query(f"ALTER TABLE Patients ADD COLUMN {DEATH_MONTH_COLUMN}")
+
+
+def patient_partitions(db_connection):
+    """
+    Returns {partition name: upper bound} of the Patients table, empty when it is not partitioned.
+    The upper bound of p_future is None (MAXVALUE).
+    """
+    rows = _query(db_connection, """
+        SELECT partition_name AS name, partition_description AS bound
+        FROM information_schema.partitions
+        WHERE table_schema = %s AND LOWER(table_name) = 'patients' AND partition_name IS NOT NULL
+        ORDER BY partition_ordinal_position
+    """, (DB_NAME,))
+    return {row['name']: None if row['bound'] == 'MAXVALUE' else int(row['bound']) for row in rows}
+
+
+def _death_months(db_connection):
+    rows = _query(db_connection, "SELECT MIN(death_month) AS first, MAX(death_month) AS last "
+                                 "FROM Patients WHERE death_month > 0")
+    if not rows or rows[0]['first'] is None:
+        return None
+    return int(rows[0]['first']), int(rows[0]['last'])
+
+
+def _primary_key(db_connection):
+    rows = _query(db_connection, """
+        SELECT column_name AS column_name FROM information_schema.statistics
+        WHERE table_schema = %s AND LOWER(table_name) = 'patients' AND index_name = 'PRIMARY'
+        ORDER BY seq_in_index
+    """, (DB_NAME,))
+    return [row['column_name'].lower() for row in rows]
+
+
+def _duplicate_patient_id(db_connection):
+    rows = _query(db_connection, "SELECT patient_id FROM Patients GROUP BY patient_id HAVING COUNT(*) > 1 LIMIT 1")
+    return rows[0]['patient_id'] if rows else None
+
+
+def _partition_table(db_connection, first, last):
+    # The partitioned key (patient_id, death_month) no longer enforces that patient_id alone is
+    # unique, which keyset pagination relies on. Rows only get ids from AUTO_INCREMENT, the key's
+    # leading column, so they stay unique as long as they are unique when the key is switched.
+    duplicate = _duplicate_patient_id(db_connection)
+    if duplicate is not None:
+        logger.error(f"Not partitioning Patients: patient_id {duplicate} is not unique")
+        return False
+    if _primary_key(db_connection) != ['patient_id', 'death_month']:
+        if not db_connection.execute_query(
+            "ALTER TABLE Patients DROP PRIMARY KEY, ADD PRIMARY KEY (patient_id, death_month)"
+        ):
+            return False
+
+    partitions = [f"PARTITION {SURVIVORS_PARTITION} VALUES LESS THAN (1)"]
+    partitions += [month_partition(month) for month in month_range(first, last)]
+    partitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+    return db_connection.execute_query(
+        f"ALTER TABLE Patients PARTITION BY RANGE (death_month) ({', '.join(partitions)})"
+    )
+
+
+def maintain_patient_partitions(db_connection):
+    """
+    Partitions Patients by month of death when PATIENTS_PARTITIONING is set, and keeps a monthly
+    partition for every month up to the latest death plus HEADROOM_MONTHS.
+
+    Survivors (death_month = 0) live in p_survivors, so survivor and date-range queries that
+    filter on death_month only read their own partitions. New months are split out of p_future
+    with REORGANIZE PARTITION, which only copies the rows already in p_future.
+    """
+    ensure_death_month_column(db_connection)
+    if not PATIENTS_PARTITIONING:
+        if not patient_partitions(db_connection) and _primary_key(db_connection) != ['patient_id']:
+            # Tables created when the composite key was unconditional get patient_id back as the key.
+            db_connection.execute_query("ALTER TABLE Patients DROP PRIMARY KEY, ADD PRIMARY KEY (patient_id)")
+        return
+
+    months = _death_months(db_connection)
+    if months is None:
+        # Without deaths there is nothing to lay months out from; the first load partitions the table.
+        return
+    first, last = months
+    for _ in range(HEADROOM_MONTHS):
+        last = next_month(last)
+
+    started = time.perf_counter()
+    partitions = patient_partitions(db_connection)
+    if not partitions:
+        if _partition_table(db_connection, first, last):
+            logger.info(f"Partitioned Patients by death month in {time.perf_counter() - started:.2f}s")
+        else:
+            logger.error("Failed to partition Patients")
+        return
+
+    # Every month below the highest bound already has a partition; p_survivors alone covers none.
+    covered = max(bound for bound in partitions.values() if bound is not None)
+    missing = list(month_range(covered if covered > 1 else first, last))
+    if not missing:
+        return
+
+    new_partitions = [month_partition(month) for month in missing]
+    new_partitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+    statement = (f"ALTER TABLE Patients REORGANIZE PARTITION {FUTURE_PARTITION} "
+                 f"INTO ({', '.join(new_partitions)})")
+    if db_connection.execute_query(statement):
+        logger.info(f"Added partitions p{missing[0]}..p{missing[-1]} in {time.perf_counter() - started:.2f}s")
+    else:
+        logger.error("Failed to add death month partitions to Patients")
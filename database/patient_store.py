@@ -0,0 +1,197 @@
+import logging
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+
+from database.metadata import add_table_change_listener, get_column_bounds
+
+logger = logging.getLogger(__name__)
+
+PATIENT_COLUMNS = [
+    "patient_id", "usmer", "medical_unit", "sex", "patient_type", "date_died",
+    "intubed", "pneumonia", "age", "pregnant", "diabetes", "copd", "asthma",
+    "inmsupr", "hipertension", "other_disease", "cardiovascular", "obesity",
+    "renal_chronic", "tobacco", "classification_final", "icu"
+]
+
+# date_died is stored as days since 1970-01-01; this marks a NULL date (a survivor)
+NULL_DAY = np.iinfo(np.int32).min
+EPOCH = date(1970, 1, 1)
+
+FETCH_CHUNK_SIZE = 50000
+
+
+def _code_dtype(max_value):
+    """Smallest unsigned dtype that holds every code up to max_value plus a NULL sentinel."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+class PatientStore:
+    """
+    Column-oriented, in-memory copy of the Patients table held as compact NumPy arrays.
+
+    Categorical codes (the 1/2/97/98/99 flags), age and medical_unit are stored in the smallest
+    unsigned dtype that fits their maintained bounds, with the dtype's maximum marking NULL;
+    date_died is an int32 day number with NULL_DAY for survivors. The arrays are preallocated
+    from a row count and filled chunk by chunk. The store is marked stale whenever the
+    Patients table changes, so readers reload it lazily through ensure_loaded.
+    """
+
+    def __init__(self, db_connection):
+        self.db_connection = db_connection
+        self.columns = {}
+        self.row_count = 0
+        self.version = 0
+        self.stale = True
+        self._sentinels = {}
+        self._sort_orders = {}
+        add_table_change_listener(self._on_table_changed)
+
+    def _on_table_changed(self, table_name):
+        if table_name.lower() == "patients":
+            self.stale = True
+
+    @property
+    def loaded(self):
+        return self.version > 0
+
+    @property
+    def ready(self):
+        return self.loaded and not self.stale
+
+    def _allocate(self, capacity):
+        columns = {}
+        for column in PATIENT_COLUMNS:
+            if column == "date_died":
+                columns[column] = np.empty(capacity, dtype=np.int32)
+                continue
+            if column == "patient_id":
+                columns[column] = np.empty(capacity, dtype=np.uint32)
+                continue
+            bounds = get_column_bounds(self.db_connection, "Patients", column)
+            max_value = bounds[1] if bounds else 0
+            columns[column] = np.empty(capacity, dtype=_code_dtype(max_value))
+        return columns
+
+    def load(self):
+        """
+        Reads every patient row once into preallocated column arrays, on a pooled session of its own.
+        """
+        # Cleared up front so that a change committed while the rows stream in marks the store stale again.
+        self.stale = False
+        try:
+            with self.db_connection.session() as cursor:
+                cursor.execute("SELECT COUNT(*) AS total FROM Patients")
+                result = cursor.fetchone()
+            capacity = int(result["total"]) if result else 0
+            columns = self._allocate(capacity)
+            sentinels = {
+                column: NULL_DAY if column == "date_died" else np.iinfo(values.dtype).max
+                for column, values in columns.items()
+            }
+
+            self._fill(columns, sentinels, capacity)
+        except Exception:
+            self.stale = True
+            raise
+
+    def _fill(self, columns, sentinels, capacity):
+        query = f"SELECT {', '.join(PATIENT_COLUMNS)} FROM Patients ORDER BY patient_id"
+
+        filled = 0
+        dict_row_bytes = 0
+        # Rows stream from an unbuffered cursor, so only one chunk of tuples is alive at a time.
+        for rows in self.db_connection.stream(query, chunk_size=FETCH_CHUNK_SIZE):
+            if not dict_row_bytes:
+                first = dict(zip(PATIENT_COLUMNS, rows[0]))
+                dict_row_bytes = sys.getsizeof(first) + sum(sys.getsizeof(value) for value in first.values())
+            if filled + len(rows) > capacity:
+                capacity = max(2 * capacity, filled + len(rows))
+                for column in columns:
+                    columns[column] = np.resize(columns[column], capacity)
+
+            end = filled + len(rows)
+            for column, values in zip(PATIENT_COLUMNS, zip(*rows)):
+                if column == "date_died":
+                    chunk = [NULL_DAY if value is None else (value - EPOCH).days for value in values]
+                    columns[column][filled:end] = chunk
+                    continue
+
+                chunk = np.array([-1 if value is None else value for value in values], dtype=np.int64)
+                if chunk.max() >= sentinels[column]:
+                    # The stored bounds were out of date; widen the column instead of overflowing.
+                    widened = np.empty(capacity, dtype=_code_dtype(int(chunk.max())))
+                    old_values = columns[column][:filled]
+                    widened_sentinel = np.iinfo(widened.dtype).max
+                    widened[:filled] = np.where(old_values == sentinels[column], widened_sentinel, old_values)
+                    columns[column] = widened
+                    sentinels[column] = widened_sentinel
+                columns[column][filled:end] = np.where(chunk < 0, sentinels[column], chunk)
+            filled = end
+
+        self.columns = {column: values[:filled] for column, values in columns.items()}
+        self._sentinels = sentinels
+        self._sort_orders = {}
+        self.row_count = filled
+        self.version += 1
+
+        if filled:
+            ratio = dict_row_bytes * filled / max(self.memory_bytes(), 1)
+            logger.info(
+                f"Loaded {filled} patients into the column store: {self.memory_bytes() / 1e6:.2f} MB, "
+                f"{ratio:.0f}x smaller than dictionary rows"
+            )
+
+    def ensure_loaded(self):
+        if self.stale:
+            self.load()
+
+    def memory_bytes(self):
+        return sum(values.nbytes for values in self.columns.values())
+
+    def values(self, column):
+        return self.columns[column]
+
+    def valid(self, column):
+        """Returns a boolean mask of the rows where the column is not NULL."""
+        return self.columns[column] != self._sentinels[column]
+
+    def sort_order(self, column, descending=False):
+        """
+        Returns the row permutation that sorts by a column, matching ORDER BY column, patient_id in MySQL.
+
+        NULLs sort first, ties keep patient_id order, and descending is the exact reverse. The
+        ascending permutation is computed once per column and load.
+        """
+        if column not in self._sort_orders:
+            values = self.columns[column].astype(np.int64)
+            if column != "date_died":
+                # NULL is stored as the dtype's maximum; move it below every code.
+                values[values == self._sentinels[column]] = -1
+            self._sort_orders[column] = np.argsort(values, kind="stable")
+        order = self._sort_orders[column]
+        return order[::-1] if descending else order
+
+    def rows(self, start, stop, indices=None):
+        """
+        Materializes rows as tuples in PATIENT_COLUMNS order, with NULLs as None and dates as date objects.
+
+        :param start: Index of the first row.
+        :param stop: Index one past the last row.
+        :param indices: Optional row order (e.g. a sort permutation) to slice instead of storage order.
+        """
+        selection = slice(start, stop) if indices is None else indices[start:stop]
+        materialized = []
+        for column in PATIENT_COLUMNS:
+            values = self.columns[column][selection]
+            valid = values != self._sentinels[column]
+            if column == "date_died":
+                materialized.append([EPOCH + timedelta(days=int(day)) if ok else None
+                                     for day, ok in zip(values, valid)])
+            else:
+                materialized.append([int(value) if ok else None for value, ok in zip(values, valid)])
+        return list(zip(*materialized))
@@ -0,0 +1,297 @@
+# SQL of the built-in analyses, keyed by the names used by database.aggregation.ANALYSES. The
+# privacy layer also parses this text for per-output sensitivities, so the aliases must match
+# the output names the views noise. Filters on death_month (YYYYMM of date_died, 0 for
+# survivors) restate the date_died filter so a partitioned Patients table prunes to the
+# partitions that can match.
+ANALYSIS_QUERIES = {
+    'age_distribution': """
+        SELECT
+            FLOOR(age / 10) * 10 AS age_group,
+            COUNT(*) AS count
+        FROM Patients
+        WHERE age IS NOT NULL  -- Exclude missing age values
+        GROUP BY FLOOR(age / 10) * 10
+        ORDER BY age_group;
+    """,
+
+    'icu_statistics': """
+        SELECT
+            COUNT(*) AS total_icu_patients,
+            AVG(age) AS avg_age,
+            SUM(CASE WHEN sex = 1 THEN 1 ELSE 0 END) AS male_count,
+            SUM(CASE WHEN sex = 2 THEN 1 ELSE 0 END) AS female_count,
+            SUM(CASE WHEN diabetes = 1 THEN 1 ELSE 0 END) AS diabetes_count,
+            SUM(CASE WHEN hipertension = 1 THEN 1 ELSE 0 END) AS hipertension_count,
+            SUM(CASE WHEN obesity = 1 THEN 1 ELSE 0 END) AS obesity_count
+        FROM Patients
+        WHERE icu = 1;
+    """,
+
+    'disease_correlation': """
+        SELECT COUNT(*) AS count, diabetes, hipertension
+        FROM Patients
+        WHERE diabetes IN (1, 2) AND hipertension IN (1, 2)
+        GROUP BY diabetes, hipertension
+    """,
+
+    'gender_icu': """
+        SELECT
+            sex AS gender,
+            COUNT(*) AS total,
+            SUM(CASE WHEN icu = 1 THEN 1 ELSE 0 END) AS icu_count
+        FROM Patients
+        WHERE sex IN (1, 2)  -- Filter out missing values (e.g., 97, 99)
+        GROUP BY sex;
+    """,
+
+    'usmer_distribution': """
+        SELECT usmer, COUNT(*) AS count FROM Patients GROUP BY usmer
+    """,
+
+    'deaths_by_date': """
+        SELECT date_died, COUNT(*) AS deaths
+        FROM Patients
+        WHERE date_died IS NOT NULL AND death_month > 0
+        GROUP BY date_died
+        ORDER BY date_died
+    """,
+
+    'covid_trends': """
+        SELECT DATE_FORMAT(DATE_DIED, '%Y-%u') AS week, COUNT(*) AS weekly_cases
+        FROM Patients
+        WHERE classification_final = 1
+        GROUP BY week
+        ORDER BY week;
+    """,
+
+    'disease_priority': """
+        SELECT
+            SUM(CASE WHEN diabetes=1 THEN 1 ELSE 0 END) AS diabetes_count,
+            SUM(CASE WHEN hipertension=1 THEN 1 ELSE 0 END) AS hipertension_count,
+            SUM(CASE WHEN obesity=1 THEN 1 ELSE 0 END) AS obesity_count,
+            SUM(CASE WHEN tobacco=1 THEN 1 ELSE 0 END) AS tobacco_count
+        FROM Patients
+    """,
+
+    'top_death_dates': """
+        SELECT
+            date_died,
+            COUNT(*) AS died_count
+        FROM Patients
+        WHERE date_died IS NOT NULL AND death_month > 0
+        GROUP BY date_died
+        ORDER BY died_count DESC
+        LIMIT 10
+    """,
+
+    'recovery_rate': """
+        SELECT
+            COUNT(*) AS total_cases,
+            SUM(CASE WHEN date_died IS NULL THEN 1 ELSE 0 END) AS recovered_cases
+        FROM Patients;
+    """,
+
+    'mortality_by_age': """
+        SELECT FLOOR(age / 10) * 10 AS age_group,
+            COUNT(*) AS total_cases,
+            SUM(CASE WHEN date_died IS NOT NULL THEN 1 ELSE 0 END) AS deaths
+        FROM Patients
+        GROUP BY age_group
+        ORDER BY age_group;
+    """,
+
+    'deaths_by_age': """
+        SELECT FLOOR(age / 10) * 10 AS age_group,
+            COUNT(*) AS total_cases
+        FROM Patients
+        WHERE date_died IS NOT NULL AND death_month > 0
+        GROUP BY age_group
+        ORDER BY age_group
+    """,
+
+    'high_risk_survivors': """
+        SELECT age, COUNT(*) AS survivors
+        FROM Patients
+        WHERE (diabetes + obesity + hipertension) >= 2
+        AND (intubed = 1 OR icu = 1)
+        AND date_died IS NULL AND death_month = 0
+        GROUP BY age
+        ORDER BY age;
+    """,
+}
+
+# The same analyses answered from the PatientCube / DeathCube aggregate tables. They return
+# the rows of the matching ANALYSIS_QUERIES entry from the cube cells instead of a scan of
+# Patients: about 1,930 PatientCube and 381 DeathCube cells for the bundled 10k-row CSV. The
+# 11-dimension PatientCube grows with the data (up to one cell per distinct combination), so
+# the saving is largest when patients far outnumber combinations. Sensitivities are still
+# derived from ANALYSIS_QUERIES. NULL dimensions are stored as -1. Analyses that need
+# per-patient detail (exact ages) are not listed.
+CUBE_QUERIES = {
+    'age_distribution': """
+        SELECT age_group, CAST(SUM(patient_count) AS SIGNED) AS count
+        FROM PatientCube
+        WHERE age_group <> -1
+        GROUP BY age_group
+        ORDER BY age_group;
+    """,
+
+    'icu_statistics': """
+        SELECT
+            CAST(COALESCE(SUM(patient_count), 0) AS SIGNED) AS total_icu_patients,
+            SUM(age_sum) / NULLIF(SUM(aged_count), 0) AS avg_age,
+            CAST(SUM(CASE WHEN sex = 1 THEN patient_count ELSE 0 END) AS SIGNED) AS male_count,
+            CAST(SUM(CASE WHEN sex = 2 THEN patient_count ELSE 0 END) AS SIGNED) AS female_count,
+            CAST(SUM(CASE WHEN diabetes = 1 THEN patient_count ELSE 0 END) AS SIGNED) AS diabetes_count,
+            CAST(SUM(CASE WHEN hipertension = 1 THEN patient_count ELSE 0 END) AS SIGNED) AS hipertension_count,
+            CAST(SUM(CASE WHEN obesity = 1 THEN patient_count ELSE 0 END) AS SIGNED) AS obesity_count
+        FROM PatientCube
+        WHERE icu = 1;
+    """,
+
+    'disease_correlation': """
+        SELECT CAST(SUM(patient_count) AS SIGNED) AS count, diabetes, hipertension
+        FROM PatientCube
+        WHERE diabetes IN (1, 2) AND hipertension IN (1, 2)
+        GROUP BY diabetes, hipertension
+    """,
+
+    'gender_icu': """
+        SELECT
+            sex AS gender,
+            CAST(SUM(patient_count) AS SIGNED) AS total,
+            CAST(SUM(CASE WHEN icu = 1 THEN patient_count ELSE 0 END) AS SIGNED) AS icu_count
+        FROM PatientCube
+        WHERE sex IN (1, 2)
+        GROUP BY sex;
+    """,
+
+    'usmer_distribution': """
+        SELECT NULLIF(usmer, -1) AS usmer, CAST(SUM(patient_count) AS SIGNED) AS count
+        FROM PatientCube
+        GROUP BY usmer
+    """,
+
+    'deaths_by_date': """
+        SELECT date_died, CAST(SUM(patient_count) AS SIGNED) AS deaths
+        FROM DeathCube
+        GROUP BY date_died
+        ORDER BY date_died
+    """,
+
+    'covid_trends': """
+        SELECT week, CAST(SUM(cases) AS SIGNED) AS weekly_cases
+        FROM (
+            SELECT NULL AS week, patient_count AS cases
+            FROM PatientCube
+            WHERE classification_final = 1 AND died = 0
+            UNION ALL
+            SELECT DATE_FORMAT(date_died, '%Y-%u') AS week, patient_count AS cases
+            FROM DeathCube
+            WHERE classification_final = 1
+        ) AS weekly
+        GROUP BY week
+        ORDER BY week;
+    """,
+
+    'disease_priority': """
+        SELECT
+            CAST(SUM(CASE WHEN diabetes = 1 THEN patient_count ELSE 0 END) AS SIGNED) AS diabetes_count,
+            CAST(SUM(CASE WHEN hipertension = 1 THEN patient_count ELSE 0 END) AS SIGNED) AS hipertension_count,
+            CAST(SUM(CASE WHEN obesity = 1 THEN patient_count ELSE 0 END) AS SIGNED) AS obesity_count,
+            CAST(SUM(CASE WHEN tobacco = 1 THEN patient_count ELSE 0 END) AS SIGNED) AS tobacco_count
+        FROM PatientCube
+    """,
+
+    'top_death_dates': """
+        SELECT date_died, CAST(SUM(patient_count) AS SIGNED) AS died_count
+        FROM DeathCube
+        GROUP BY date_died
+        ORDER BY died_count DESC
+        LIMIT 10
+    """,
+
+    'recovery_rate': """
+        SELECT
+            CAST(COALESCE(SUM(patient_count), 0) AS SIGNED) AS total_cases,
+            CAST(SUM(CASE WHEN died = 0 THEN patient_count ELSE 0 END) AS SIGNED) AS recovered_cases
+        FROM PatientCube;
+    """,
+
+    'mortality_by_age': """
+        SELECT NULLIF(age_group, -1) AS age_group,
+            CAST(SUM(patient_count) AS SIGNED) AS total_cases,
+            CAST(SUM(CASE WHEN died = 1 THEN patient_count ELSE 0 END) AS SIGNED) AS deaths
+        FROM PatientCube
+        GROUP BY age_group
+        ORDER BY age_group;
+    """,
+
+    'deaths_by_age': """
+        SELECT NULLIF(age_group, -1) AS age_group,
+            CAST(SUM(patient_count) AS SIGNED) AS total_cases
+        FROM PatientCube
+        WHERE died = 1
+        GROUP BY age_group
+        ORDER BY age_group
+    """,
+}
+
+# Parameterized SQL of the dynamic analyses, run as server-side prepared statements with the
+# analyst's inputs bound to the %s placeholders. The privacy layer parses this text the same
+# way as ANALYSIS_QUERIES.
+DYNAMIC_QUERIES = {
+    'age_patient_type': """
+        SELECT
+            COUNT(*) AS Patient_Count
+        FROM Patients
+        WHERE AGE BETWEEN %s AND %s
+          AND PATIENT_TYPE = %s;
+    """,
+
+    'disease_classification': """
+        SELECT
+            CASE
+                WHEN classification_final BETWEEN 1 AND 3 THEN classification_final
+                ELSE 4  -- Group all classifications >= 4 as "Non-COVID"
+            END AS classification_group,
+            COUNT(*) AS Patient_Count
+        FROM Patients
+        WHERE (DIABETES = %s OR OBESITY = %s OR CARDIOVASCULAR = %s)
+        GROUP BY classification_group
+        ORDER BY classification_group;
+    """,
+
+    'gender_tobacco': """
+        SELECT
+            SEX,
+            COUNT(*) AS Total_Patients,
+            SUM(CASE WHEN ICU = 1 THEN 1 ELSE 0 END) AS ICU_Admissions,
+            (SUM(CASE WHEN ICU = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*)) AS ICU_Rate
+        FROM Patients
+        WHERE SEX = %s
+          AND TOBACCO = %s
+        GROUP BY SEX;
+    """,
+
+    # Takes (start, end, start, end): the range is restated on death_month for partition pruning.
+    'death_count': """
+        SELECT
+            COUNT(*) AS Deaths
+        FROM Patients
+        WHERE DATE_DIED BETWEEN %s AND %s
+        AND death_month BETWEEN EXTRACT(YEAR_MONTH FROM %s) AND EXTRACT(YEAR_MONTH FROM %s);
+    """,
+
+    'icu_comorbidity': """
+        SELECT
+            ICU,
+            COUNT(*) AS Patient_Count
+        FROM Patients
+        WHERE PNEUMONIA = %s
+          AND INMSUPR = %s
+          AND RENAL_CHRONIC = %s
+          AND ICU NOT IN (97, 99)
+        GROUP BY ICU;
+    """,
+}
@@ -0,0 +1,168 @@
+import logging
+import threading
+from datetime import date
+
+import numpy as np
+
+from database.metadata import add_rows_inserted_listener, add_table_change_listener
+
+logger = logging.getLogger(__name__)
+
+# Ordinal of 1970-01-01, the origin of NumPy's day-resolution datetime64
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class _PrefixCounts:
+    """Cumulative counts over consecutive integer keys, answering inclusive range counts in O(1)."""
+
+    def __init__(self, keys, counts):
+        keys = np.asarray(keys, dtype=np.int64)
+        self.first = int(keys.min()) if len(keys) else 0
+        per_key = np.bincount(keys - self.first, weights=counts) if len(keys) else np.zeros(0)
+        # prefix[i] is the number of rows whose key is below first + i
+        self.prefix = np.concatenate(([0], np.cumsum(per_key))).astype(np.int64)
+
+    def count(self, low, high):
+        size = len(self.prefix) - 1
+        start = min(max(low - self.first, 0), size)
+        stop = min(max(high - self.first + 1, 0), size)
+        return int(self.prefix[stop] - self.prefix[start]) if stop > start else 0
+
+    def add(self, keys, counts):
+        """Returns a copy with the counts added, widening the key range if needed."""
+        per_key = np.diff(self.prefix)
+        return _PrefixCounts(
+            np.concatenate((self.first + np.arange(len(per_key)), np.asarray(keys, dtype=np.int64))),
+            np.concatenate((per_key, np.asarray(counts, dtype=np.int64)))
+        )
+
+
+class RangeCountIndex:
+    """
+    Prefix sums of patient counts over age (per patient_type) and over date of death.
+
+    Answers ``AGE BETWEEN low AND high AND PATIENT_TYPE = t`` and ``DATE_DIED BETWEEN start AND end``
+    counts with two array lookups, so analysts can sweep ranges without a COUNT(*) per request.
+    The index is built once from two grouped queries that read only the (patient_type, age) and
+    (date_died, patient_id) indexes and return a few hundred rows. Each chunk an upload commits
+    is then added to the prefix arrays through the rows inserted listeners, the same point where
+    it is added to the cubes. Any other change to Patients, such as a reload, marks it stale, and
+    the next count rebuilds it.
+    """
+
+    def __init__(self, db_connection):
+        self.db_connection = db_connection
+        self.stale = True
+        self._ages = {}
+        self._deaths = _PrefixCounts([], [])
+        self._lock = threading.Lock()
+        add_table_change_listener(self._on_table_changed, on_append=False)
+        add_rows_inserted_listener(self._on_rows_inserted)
+
+    def _on_table_changed(self, table_name):
+        if table_name.lower() == "patients":
+            self.stale = True
+
+    def _on_rows_inserted(self, table_name, frame):
+        if table_name.lower() != "patients" or self.stale:
+            return
+        # A build in progress may or may not have read these rows, so it is redone instead.
+        if not self._lock.acquire(blocking=False):
+            self.stale = True
+            return
+        try:
+            self.add_rows(frame)
+        except Exception as e:
+            logger.error(f"Error adding rows to the range count index: {e}")
+            self.stale = True
+        finally:
+            self._lock.release()
+
+    def add_rows(self, frame):
+        """
+        Adds a converted chunk of newly inserted patients to the counts.
+
+        :param frame: DataFrame with the upper-case patient CSV columns, numeric codes already
+                      converted and DATE_DIED as 'YYYY-MM-DD' strings (missing for survivors).
+        """
+        aged = frame[frame["AGE"].notna() & frame["PATIENT_TYPE"].notna()]
+        groups = aged.groupby([aged["PATIENT_TYPE"].astype("int64"), aged["AGE"].astype("int64")]).size()
+        ages = dict(self._ages)
+        for patient_type, counts in groups.groupby(level=0):
+            keys = counts.index.get_level_values(1)
+            current = ages.get(int(patient_type))
+            ages[int(patient_type)] = current.add(keys, counts.values) if current else _PrefixCounts(keys, counts.values)
+
+        died = frame["DATE_DIED"].dropna().to_numpy(dtype="datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+        days, deaths = np.unique(died, return_counts=True)
+        self._ages = ages
+        self._deaths = self._deaths.add(days, deaths)
+
+    def build(self):
+        # Cleared up front so that a change committed while the counts are read marks it stale again.
+        self.stale = False
+        try:
+            with self.db_connection.session() as cursor:
+                cursor.execute("""
+                    SELECT patient_type, age, COUNT(*) AS patients
+                    FROM Patients
+                    WHERE age IS NOT NULL AND patient_type IS NOT NULL
+                    GROUP BY patient_type, age
+                """)
+                age_rows = cursor.fetchall()
+                cursor.execute("""
+                    SELECT date_died, COUNT(*) AS deaths
+                    FROM Patients
+                    WHERE date_died IS NOT NULL AND death_month > 0
+                    GROUP BY date_died
+                """)
+                death_rows = cursor.fetchall()
+        except Exception:
+            self.stale = True
+            raise
+
+        by_type = {}
+        for row in age_rows:
+            keys, counts = by_type.setdefault(int(row["patient_type"]), ([], []))
+            keys.append(int(row["age"]))
+            counts.append(int(row["patients"]))
+        self._ages = {patient_type: _PrefixCounts(keys, counts) for patient_type, (keys, counts) in by_type.items()}
+        self._deaths = _PrefixCounts(
+            [row["date_died"].toordinal() for row in death_rows],
+            [int(row["deaths"]) for row in death_rows]
+        )
+        logger.info(f"Built range count index over {len(age_rows)} age and {len(death_rows)} death date groups")
+
+    def ensure_built(self):
+        """
+        Rebuilds the index if Patients changed since it was built.
+
+        :return: True if the index is current, False if it could not be built.
+        """
+        with self._lock:
+            if self.stale:
+                try:
+                    self.build()
+                except Exception as e:
+                    logger.error(f"Error building the range count index: {e}")
+                    return False
+            return True
+
+    def count_ages(self, low, high, patient_type):
+        """
+        Returns the number of patients of a type aged low to high inclusive, or None if the index
+        is unavailable.
+        """
+        if not self.ensure_built():
+            return None
+        counts = self._ages.get(int(patient_type))
+        return counts.count(int(low), int(high)) if counts else 0
+
+    def count_deaths(self, start, end):
+        """
+        Returns the number of patients who died from start to end inclusive (dates), or None if
+        the index is unavailable.
+        """
+        if not self.ensure_built():
+            return None
+        return self._deaths.count(start.toordinal(), end.toordinal())
@@ -1,3 +1,9 @@
+# Patients.death_month is YYYYMM of date_died, or 0 for survivors. It is a stored generated
+# column so it can be the partitioning expression and, once database.partitions partitions the
+# table, part of the primary key (MySQL requires every unique key to contain the partitioning
+# columns, and key columns cannot be NULL). Unpartitioned, the key stays patient_id alone.
+DEATH_MONTH_COLUMN = "death_month INT AS (COALESCE(EXTRACT(YEAR_MONTH FROM date_died), 0)) STORED NOT NULL"
+
 CREATE_TABLES_QUERIES = {
     'users': """
         CREATE TABLE IF NOT EXISTS Users (
@@ -9,9 +15,9 @@ CREATE_TABLES_QUERIES = {
         ); 
     """,
 
-    'patients': """
+    'patients': f"""
         CREATE TABLE IF NOT EXISTS Patients (
-            patient_id INT AUTO_INCREMENT PRIMARY KEY,
+            patient_id INT AUTO_INCREMENT,
             usmer INT,
             medical_unit INT,
             sex INT,
@@ -32,7 +38,101 @@ CREATE_TABLES_QUERIES = {
             renal_chronic INT,
             tobacco INT,
             classification_final INT,
-            icu INT
+            icu INT,
+            {DEATH_MONTH_COLUMN},
+            PRIMARY KEY (patient_id)
+        );
+    """,
+
+    'column_bounds': """
+        CREATE TABLE IF NOT EXISTS ColumnBounds (
+            table_name VARCHAR(64) NOT NULL,
+            column_name VARCHAR(64) NOT NULL,
+            min_value DOUBLE,
+            max_value DOUBLE,
+            PRIMARY KEY (table_name, column_name)
+        );
+    """,
+
+    'dataset_manifest': """
+        CREATE TABLE IF NOT EXISTS DatasetManifest (
+            dataset_name VARCHAR(64) PRIMARY KEY,
+            file_path VARCHAR(512) NOT NULL,
+            file_size BIGINT NOT NULL,
+            file_mtime DOUBLE NOT NULL,
+            file_hash CHAR(64) NOT NULL,
+            row_count BIGINT NOT NULL,
+            loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        );
+    """,
+
+    'patient_cube': """
+        CREATE TABLE IF NOT EXISTS PatientCube (
+            age_group INT NOT NULL,
+            sex INT NOT NULL,
+            icu INT NOT NULL,
+            usmer INT NOT NULL,
+            classification_final INT NOT NULL,
+            diabetes INT NOT NULL,
+            hipertension INT NOT NULL,
+            obesity INT NOT NULL,
+            tobacco INT NOT NULL,
+            intubed INT NOT NULL,
+            died TINYINT NOT NULL,
+            patient_count BIGINT NOT NULL DEFAULT 0,
+            age_sum BIGINT NOT NULL DEFAULT 0,
+            aged_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (age_group, sex, icu, usmer, classification_final, diabetes, hipertension,
+                         obesity, tobacco, intubed, died)
+        );
+    """,
+
+    'death_cube': """
+        CREATE TABLE IF NOT EXISTS DeathCube (
+            date_died DATE NOT NULL,
+            classification_final INT NOT NULL,
+            patient_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (date_died, classification_final)
         );
     """,
-}
\ No newline at end of file
+}
+
+
+# Secondary indexes derived from the analysis workload: name -> (table, columns). Most are
+# covering, so the grouped counts are answered from the index without reading table rows.
+INDEXES = {
+    # ICU statistics: icu = 1, then sex / age / comorbidity sums
+    'idx_patients_icu': ('Patients', ['icu', 'sex', 'age', 'diabetes', 'hipertension', 'obesity']),
+    # Age distribution, mortality and deaths by age group
+    'idx_patients_age': ('Patients', ['age', 'date_died']),
+    # Deaths by date, top death dates, death-count ranges and high-risk survivors (date_died IS NULL)
+    'idx_patients_death': ('Patients', ['date_died', 'intubed', 'icu', 'diabetes', 'obesity', 'hipertension', 'age']),
+    # COVID trends: classification_final = 1 grouped by week of date_died
+    'idx_patients_classification': ('Patients', ['classification_final', 'date_died']),
+    # Gender-based ICU analysis and the gender / tobacco dynamic analysis
+    'idx_patients_sex': ('Patients', ['sex', 'tobacco', 'icu']),
+    # Disease correlation
+    'idx_patients_comorbidity': ('Patients', ['diabetes', 'hipertension']),
+    # Medical unit level distribution
+    'idx_patients_usmer': ('Patients', ['usmer']),
+    # Dynamic age range per patient type: equality column first, then the range
+    'idx_patients_type_age': ('Patients', ['patient_type', 'age']),
+    # Dynamic ICU and comorbidity analysis
+    'idx_patients_icu_risk': ('Patients', ['pneumonia', 'inmsupr', 'renal_chronic', 'icu']),
+    # Data Viewer sort orders (column, patient_id): the first page and every keyset continuation
+    # are index range reads in either direction. patient_id itself is served by the primary key.
+    'idx_patients_sort_age': ('Patients', ['age', 'patient_id']),
+    'idx_patients_sort_date_died': ('Patients', ['date_died', 'patient_id']),
+    'idx_patients_sort_medical_unit': ('Patients', ['medical_unit', 'patient_id']),
+    'idx_patients_sort_classification': ('Patients', ['classification_final', 'patient_id']),
+}
+
+# Columns the Data Viewer can sort by -> the index serving that order. Other columns would sort
+# the whole filtered table for every page and block, so their headers do not sort.
+SORT_INDEXES = {
+    'patient_id': 'PRIMARY',
+    **{
+        columns[0]: name for name, (table, columns) in INDEXES.items()
+        if table == 'Patients' and columns[1:] == ['patient_id']
+    },
+}
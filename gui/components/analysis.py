@@ -1,10 +1,21 @@
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from ttkbootstrap.scrolled import ScrolledText
-from privacy.differential_privacy import apply_differential_privacy
-import matplotlib.pyplot as plt
+from privacy.differential_privacy import apply_differential_privacy, apply_differential_privacy_batch
+from privacy.rng import get_noise_engine
+from database.aggregation import AggregationEngine
+from database.queries import ANALYSIS_QUERIES, CUBE_QUERIES
+from utils.jobs import JobRunner
+from matplotlib import cm, style
+from matplotlib.artist import setp
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
+import threading
+
+# Figures are built on worker threads with the object-oriented API, so the style is set once
+# here instead of through pyplot's global state on every analysis.
+style.use('ggplot')
 
 
 class AnalysisView(ttk.Frame):
@@ -13,7 +24,12 @@ class AnalysisView(ttk.Frame):
         self.mainWindow = mainWindow
         self.db_connection = db_connection
         self.current_canvas = None
+        self._job_state = threading.local()
         self.epsilon = 1.0
+        self.aggregation_engine = AggregationEngine(mainWindow.patient_store)
+        self.jobs = JobRunner(self)
+        self.jobs.add_listener(self._on_jobs_changed)
+        self.bind("<Destroy>", self._on_destroy, add="+")
 
         self.grid_columnconfigure(0, weight=1)
         self.grid_columnconfigure(1, weight=1)
@@ -104,6 +120,24 @@ class AnalysisView(ttk.Frame):
         )
         run_button.pack(pady=(0, 10))
 
+        run_all_button = ttk.Button(
+            control_frame,
+            text="Run All Analyses",
+            command=self.run_all_analyses,
+            bootstyle="secondary-outline",
+            width=20
+        )
+        run_all_button.pack(pady=(0, 10))
+
+        cancel_button = ttk.Button(
+            control_frame,
+            text="Cancel",
+            command=self.cancel_analyses,
+            bootstyle="danger-outline",
+            width=20
+        )
+        cancel_button.pack(pady=(0, 10))
+
         self.progress = ttk.Progressbar(
             control_frame,
             mode='indeterminate',
@@ -159,70 +193,205 @@ class AnalysisView(ttk.Frame):
         """Callback to update the epsilon label whenever the slider moves."""
         self.epsilon_value_label.config(text=str(self.epsilon_var.get()))
 
-    def run_analysis(self):
-        self.progress.pack()
-        self.progress.start()
-        self.status_label.configure(text="Running analysis...")
+    @property
+    def epsilon(self):
+        """The ε of the analysis running on the calling worker thread, or of the last one started."""
+        return getattr(self._job_state, "epsilon", self._epsilon)
+
+    @epsilon.setter
+    def epsilon(self, value):
+        self._epsilon = value
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self.jobs.shutdown()
 
+    def _on_jobs_changed(self, active_count):
+        if active_count:
+            self.progress.pack()
+            self.progress.start()
+            self.status_label.configure(text=f"Running {active_count} analysis job(s)...", bootstyle="secondary")
+        else:
+            self.progress.stop()
+            self.progress.pack_forget()
+
+    def _clear_results(self):
         self.result_text.delete(1.0, "end")
         for widget in self.graph_frame.winfo_children():
             widget.destroy()
+
+    def _analysis_job(self, analyses, epsilon):
+        """
+        Runs analyses on a worker thread. Figures are collected instead of rendered, since only
+        the Tk thread may create canvases.
+
+        :return: A list of (analysis, result, figures) tuples.
+        """
+        self._job_state.epsilon = epsilon
+        try:
+            outcomes = []
+            for analysis in analyses:
+                self._job_state.figures = []
+                try:
+                    result = self.perform_analysis(analysis)
+                except Exception as e:
+                    if len(analyses) == 1:
+                        raise
+                    result = f"Error: {str(e)}"
+                outcomes.append((analysis, result, self._job_state.figures))
+            return outcomes
+        finally:
+            self._job_state.__dict__.clear()
+
+    def run_analysis(self):
         self.epsilon = float(self.epsilon_var.get())
         if not self.mainWindow.update_privacy_budget(self.epsilon):
-            self.progress.stop()
-            self.progress.pack_forget()
+            return
+
+        epsilon = self.epsilon
+        selected_analysis = self.analysis_var.get()
+
+        def show(outcomes):
+            _, result, figures = outcomes[0]
+            self._clear_results()
+            self.result_text.insert("end", str(result))
+            for fig in figures:
+                self._render_figure(fig)
+            self.status_label.configure(
+                text=f"Analysis completed successfully (ε={epsilon:.2f})",
+                bootstyle="success"
+            )
+
+        self.jobs.submit(
+            selected_analysis, self._analysis_job, [selected_analysis], epsilon,
+            on_success=show, on_error=self._show_error
+        )
+
+    def run_all_analyses(self):
+        """
+        Runs every built-in analysis from one in-memory scan of the Patients table.
+        """
+        self.epsilon = float(self.epsilon_var.get())
+        if not self.mainWindow.update_privacy_budget(self.epsilon * len(self.analysis_options)):
+            return
+
+        epsilon = self.epsilon
+
+        def run_all():
+            self.aggregation_engine.run_all()
+            return self._analysis_job(self.analysis_options, epsilon)
+
+        def show(outcomes):
+            # Run All only reports the results; rendering thirteen canvases would stack them.
+            self._clear_results()
+            for analysis, result, _ in outcomes:
+                self.result_text.insert("end", f"=== {analysis} ===\n{result}\n\n")
+            self.status_label.configure(
+                text=f"All {len(self.analysis_options)} analyses completed (ε={epsilon:.2f} each)",
+                bootstyle="success"
+            )
+
+        self.jobs.submit("Run All Analyses", run_all, on_success=show, on_error=self._show_error)
+
+    def cancel_analyses(self):
+        """
+        Cancels every queued or running analysis; running ones finish in the background unseen.
+        """
+        self.jobs.cancel_all()
+        self.status_label.configure(text="Analysis cancelled", bootstyle="warning")
+
+    def _show_error(self, error):
+        self._clear_results()
+        self.result_text.insert("end", f"Error: {str(error)}")
+        self.status_label.configure(
+            text="Error occurred during analysis",
+            bootstyle="danger"
+        )
+
+    def perform_analysis(self, selected_analysis):
+        if selected_analysis == "Age Distribution":
+            return self.perform_age_group_distribution()
+        elif selected_analysis == "ICU Statistics":
+            return self.perform_icu_statistics()
+        elif selected_analysis == "Disease Correlation":
+            return self.perform_disease_correlation()
+        elif selected_analysis == "Gender-Based ICU Analysis":
+            return self.perform_gender_based_analysis()
+        elif selected_analysis == "Medical Unit Analysis":
+            return self.perform_regional_analysis()
+        elif selected_analysis == "Time Series Analysis":
+            return self.perform_time_series_analysis()
+        elif selected_analysis == "COVID Trends":
+            return self.perform_covid_trends()
+        elif selected_analysis == "Disease Priority Analysis":
+            return self.perform_disease_priority_analysis()
+        elif selected_analysis == "Disease Weighted Selection":
+            return self.perform_top_death_dates_exponential()
+        elif selected_analysis == "Recovery Rate Analysis":
+            return self.perform_recovery_rate_analysis()
+        elif selected_analysis == "Mortality Rate by Age Group":
+            return self.perform_mortality_rate_by_age_group()
+        elif selected_analysis == "Most Affected Age":
+            return self.perform_most_affected_age_group()
+        elif selected_analysis == "High Risk Survivor":
+            return self.perform_high_risk_survivors()
         else:
-            try:
-                selected_analysis = self.analysis_var.get()
-
-                if selected_analysis == "Age Distribution":
-                    result = self.perform_age_group_distribution()
-                elif selected_analysis == "ICU Statistics":
-                    result = self.perform_icu_statistics()
-                elif selected_analysis == "Disease Correlation":
-                    result = self.perform_disease_correlation()
-                elif selected_analysis == "Gender-Based ICU Analysis":
-                    result = self.perform_gender_based_analysis()
-                elif selected_analysis == "Medical Unit Analysis":
-                    result = self.perform_regional_analysis()
-                elif selected_analysis == "Time Series Analysis":
-                    result = self.perform_time_series_analysis()
-                elif selected_analysis == "COVID Trends":
-                    result = self.perform_covid_trends()
-                elif selected_analysis == "Disease Priority Analysis":
-                    result = self.perform_disease_priority_analysis()
-                elif selected_analysis == "Disease Weighted Selection":
-                    result = self.perform_top_death_dates_exponential()
-                elif selected_analysis == "Recovery Rate Analysis":
-                    result = self.perform_recovery_rate_analysis()
-                elif selected_analysis == "Mortality Rate by Age Group":
-                    result = self.perform_mortality_rate_by_age_group()
-                elif selected_analysis == "Most Affected Age":
-                    result = self.perform_most_affected_age_group()
-                elif selected_analysis == "High Risk Survivor":
-                    result = self.perform_high_risk_survivors()
-                else:
-                    result = "Invalid Analysis Selected"
-
-                self.result_text.insert("end", str(result))
-                self.status_label.configure(
-                    text=f"Analysis completed successfully (ε={self.epsilon:.2f})",
-                    bootstyle="success"
-                )
+            return "Invalid Analysis Selected"
 
-            except Exception as e:
-                self.result_text.insert("end", f"Error: {str(e)}")
-                self.status_label.configure(
-                    text="Error occurred during analysis",
-                    bootstyle="danger"
-                )
+    def _fetch_all(self, analysis, query):
+        """
+        Returns the rows of an analysis from the in-memory aggregation engine when it holds the
+        current data, and from the database otherwise: from the aggregate cubes when they can
+        answer it, else with the analysis query itself.
+        """
+        if self.aggregation_engine.ready:
+            return self.aggregation_engine.compute(analysis)
+        try:
+            with self.db_connection.session() as cursor:
+                cursor.execute(CUBE_QUERIES.get(analysis, query))
+                return cursor.fetchall()
+        except Exception as e:
+            print(f"Error fetching {analysis}: {e}")
+            return []
+
+    def _fetch_columns(self, analysis, query, dtypes=None):
+        """
+        Like _fetch_all, but returns one NumPy array per output column. The database fallback
+        streams the result in chunks from an unbuffered cursor instead of building a list of
+        dictionaries.
+
+        :param dtypes: Optional dictionary mapping columns to numeric dtypes (NULL becomes NaN).
+        :return: Dictionary mapping column names to arrays, empty when there are no rows.
+        """
+        dtypes = dtypes or {}
+        if self.aggregation_engine.ready:
+            rows = self.aggregation_engine.compute(analysis)
+            if not rows:
+                return {}
+            return {
+                name: np.array([np.nan if row[name] is None else row[name] for row in rows], dtype=dtypes[name])
+                if name in dtypes else np.array([row[name] for row in rows], dtype=object)
+                for name in rows[0]
+            }
+        try:
+            return self.db_connection.fetch_arrays(CUBE_QUERIES.get(analysis, query), dtypes=dtypes)
+        except Exception as e:
+            print(f"Error fetching {analysis}: {e}")
+            return {}
 
-            finally:
-                self.progress.stop()
-                self.progress.pack_forget()
+    def _fetch_one(self, analysis, query):
+        rows = self._fetch_all(analysis, query)
+        return rows[0] if rows else None
 
     def display_graph(self, fig):
-        plt.style.use('ggplot')
+        figures = getattr(self._job_state, "figures", None)
+        if figures is not None:
+            # Called from a worker thread; the figure is rendered once the job reports back.
+            figures.append(fig)
+            return
+        self._render_figure(fig)
+
+    def _render_figure(self, fig):
         fig.patch.set_facecolor(self.style.colors.bg)
 
         canvas = FigureCanvasTkAgg(fig, master=self.graph_frame)
@@ -239,17 +408,8 @@ class AnalysisView(ttk.Frame):
         Fetches age distribution data from the database, applies differential privacy,
         and visualizes the results.
         """
-        query = """
-        SELECT 
-            FLOOR(age / 10) * 10 AS age_group, 
-            COUNT(*) AS count
-        FROM Patients
-        WHERE age IS NOT NULL  -- Exclude missing age values
-        GROUP BY FLOOR(age / 10) * 10
-        ORDER BY age_group;
-        """
-        self.db_connection.execute_query(query)
-        results = self.db_connection.cursor.fetchall()
+        query = ANALYSIS_QUERIES["age_distribution"]
+        results = self._fetch_all("age_distribution", query)
 
         if not results:
             return "No age distribution data available."
@@ -257,21 +417,20 @@ class AnalysisView(ttk.Frame):
         age_groups = {f"{row['age_group']}-{row['age_group'] + 9}": float(row['count'])
                       for row in results}
 
-        dp_results = {
-            group: apply_differential_privacy(
-                self.db_connection,
-                [count],
-                mechanism="Gaussian",
-                epsilon=self.epsilon,
-                query=query
-            )[0]
-            for group, count in age_groups.items()
-        }
+        noisy_counts = apply_differential_privacy_batch(
+            self.db_connection,
+            list(age_groups.values()),
+            mechanism="Gaussian",
+            epsilon=self.epsilon,
+            query=query,
+            output="count"
+        )
+        dp_results = dict(zip(age_groups.keys(), noisy_counts))
 
-        fig, ax = plt.subplots(figsize=(8, 5))
-        plt.style.use('ggplot')
+        fig = Figure(figsize=(8, 5))
+        ax = fig.subplots()
 
-        colors = plt.cm.viridis(np.linspace(0, 1, len(dp_results)))
+        colors = cm.viridis(np.linspace(0, 1, len(dp_results)))
         ax.bar(dp_results.keys(), dp_results.values(), color=colors, edgecolor='black')
 
         ax.set_title(f"Age Distribution (ε={self.epsilon:.2f})", fontsize=14, pad=15, color='white')
@@ -280,7 +439,7 @@ class AnalysisView(ttk.Frame):
 
         ax.grid(axis='y', linestyle='--', alpha=0.7)
 
-        plt.xticks(rotation=45, ha='right', color='white')
+        setp(ax.get_xticklabels(), rotation=45, ha='right', color='white')
 
         ax.tick_params(axis='x', colors='white')
         ax.tick_params(axis='y', colors='white')
@@ -288,7 +447,7 @@ class AnalysisView(ttk.Frame):
         ax.set_facecolor('#2e2e2e')
         fig.patch.set_facecolor('#2e2e2e')
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         self.display_graph(fig)
 
@@ -298,53 +457,31 @@ class AnalysisView(ttk.Frame):
         return result_str
 
     def perform_icu_statistics(self):
-        query = """
-        SELECT 
-            COUNT(*) AS total_icu_patients,
-            AVG(age) AS avg_age,
-            SUM(CASE WHEN sex = 1 THEN 1 ELSE 0 END) AS male_count,
-            SUM(CASE WHEN sex = 2 THEN 1 ELSE 0 END) AS female_count,
-            SUM(CASE WHEN diabetes = 1 THEN 1 ELSE 0 END) AS diabetes_count,
-            SUM(CASE WHEN hipertension = 1 THEN 1 ELSE 0 END) AS hipertension_count,
-            SUM(CASE WHEN obesity = 1 THEN 1 ELSE 0 END) AS obesity_count
-        FROM Patients
-        WHERE icu = 1;
-        """
-        self.db_connection.execute_query(query)
-        result = self.db_connection.cursor.fetchone()
+        query = ANALYSIS_QUERIES["icu_statistics"]
+        result = self._fetch_one("icu_statistics", query)
 
         if not result:
             return "No ICU data available."
 
-        total_icu_patients = float(result['total_icu_patients'])
-        avg_age = float(result['avg_age'])
-        male_count = float(result['male_count'])
-        female_count = float(result['female_count'])
-        diabetes_count = float(result['diabetes_count'])
-        hipertension_count = float(result['hipertension_count'])
-        obesity_count = float(result['obesity_count'])
-
-        dp_total_icu_patients = \
-            apply_differential_privacy(self.db_connection, [total_icu_patients], mechanism="Laplace",
-                                       epsilon=self.epsilon, query=query)[0]
-        dp_avg_age = \
-        apply_differential_privacy(self.db_connection, [avg_age], mechanism="Laplace", epsilon=self.epsilon,
-                                   query=query)[0]
-        dp_male_count = \
-        apply_differential_privacy(self.db_connection, [male_count], mechanism="Laplace", epsilon=self.epsilon,
-                                   query=query)[0]
-        dp_female_count = \
-        apply_differential_privacy(self.db_connection, [female_count], mechanism="Laplace", epsilon=self.epsilon,
-                                   query=query)[0]
-        dp_diabetes_count = \
-        apply_differential_privacy(self.db_connection, [diabetes_count], mechanism="Laplace", epsilon=self.epsilon,
-                                   query=query)[0]
-        dp_hipertension_count = \
-            apply_differential_privacy(self.db_connection, [hipertension_count], mechanism="Laplace",
-                                       epsilon=self.epsilon, query=query)[0]
-        dp_obesity_count = \
-        apply_differential_privacy(self.db_connection, [obesity_count], mechanism="Laplace", epsilon=self.epsilon,
-                                   query=query)[0]
+        columns = [
+            'total_icu_patients', 'avg_age', 'male_count', 'female_count',
+            'diabetes_count', 'hipertension_count', 'obesity_count'
+        ]
+        dp_values = apply_differential_privacy_batch(
+            self.db_connection,
+            {column: float(result[column]) for column in columns},
+            mechanism="Laplace",
+            epsilon=self.epsilon,
+            query=query
+        )
+
+        dp_total_icu_patients = dp_values['total_icu_patients']
+        dp_avg_age = dp_values['avg_age']
+        dp_male_count = dp_values['male_count']
+        dp_female_count = dp_values['female_count']
+        dp_diabetes_count = dp_values['diabetes_count']
+        dp_hipertension_count = dp_values['hipertension_count']
+        dp_obesity_count = dp_values['obesity_count']
 
         gender_labels = ['Male', 'Female']
         gender_counts = [dp_male_count, dp_female_count]
@@ -352,15 +489,15 @@ class AnalysisView(ttk.Frame):
         disease_labels = ['Diabetes', 'Hypertension', 'Obesity']
         disease_counts = [dp_diabetes_count, dp_hipertension_count, dp_obesity_count]
 
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-        plt.style.use('ggplot')
+        fig = Figure(figsize=(12, 5))
+        ax1, ax2 = fig.subplots(1, 2)
 
-        colors_gender = plt.cm.viridis(np.linspace(0, 1, len(gender_labels)))
+        colors_gender = cm.viridis(np.linspace(0, 1, len(gender_labels)))
         ax1.pie(gender_counts, labels=gender_labels, autopct="%1.1f%%", startangle=90, colors=colors_gender,
                 textprops={'color': 'white'})
         ax1.set_title(f"Gender Distribution in ICU (ε={self.epsilon:.2f})", fontsize=14, pad=15, color='white')
 
-        colors_disease = plt.cm.viridis(np.linspace(0, 1, len(disease_labels)))
+        colors_disease = cm.viridis(np.linspace(0, 1, len(disease_labels)))
         ax2.bar(disease_labels, disease_counts, color=colors_disease, edgecolor='black')
         ax2.set_title(f"Disease Distribution in ICU (ε={self.epsilon:.2f})", fontsize=14, pad=15, color='white')
         ax2.set_ylabel("Noisy Count", fontsize=12, color='white')
@@ -372,7 +509,7 @@ class AnalysisView(ttk.Frame):
         ax2.set_facecolor('#2e2e2e')
         fig.patch.set_facecolor('#2e2e2e')
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         self.display_graph(fig)
 
@@ -389,34 +526,34 @@ class AnalysisView(ttk.Frame):
         return result_str
 
     def perform_disease_correlation(self):
-        query = """
-        SELECT COUNT(*) AS count, diabetes, hipertension 
-        FROM Patients 
-        WHERE diabetes IN (1, 2) AND hipertension IN (1, 2)  
-        GROUP BY diabetes, hipertension
-        """
-        self.db_connection.execute_query(query)
-        results = self.db_connection.cursor.fetchall()
+        query = ANALYSIS_QUERIES["disease_correlation"]
+        results = self._fetch_all("disease_correlation", query)
 
         if not results:
             return "No data available for disease correlation."
 
+        noisy_counts = apply_differential_privacy_batch(
+            self.db_connection,
+            [row['count'] for row in results],
+            mechanism="Laplace",
+            epsilon=self.epsilon,
+            query=query,
+            output="count"
+        )
         dp_results = {
-            f"Diabetes: {row['diabetes']}, Hypertension: {row['hipertension']}":
-                apply_differential_privacy(self.db_connection, [row['count']], mechanism="Laplace",
-                                           epsilon=self.epsilon, query=query)[0]
-            for row in results
+            f"Diabetes: {row['diabetes']}, Hypertension: {row['hipertension']}": noisy_count
+            for row, noisy_count in zip(results, noisy_counts)
         }
 
-        fig, ax = plt.subplots(figsize=(6, 5))
-        plt.style.use('ggplot')
+        fig = Figure(figsize=(6, 5))
+        ax = fig.subplots()
 
         wedges, texts, autotexts = ax.pie(
             dp_results.values(),
             labels=dp_results.keys(),
             autopct='%1.1f%%',
             startangle=90,
-            colors=plt.cm.viridis(np.linspace(0, 1, len(dp_results))),
+            colors=cm.viridis(np.linspace(0, 1, len(dp_results))),
             textprops={'fontsize': 10, 'color': 'white'}  # Smaller text size
         )
         ax.set_title(f"Disease Correlation (ε={self.epsilon:.2f})", fontsize=14, pad=15, color='white')
@@ -424,7 +561,7 @@ class AnalysisView(ttk.Frame):
         ax.set_facecolor('#2e2e2e')
         fig.patch.set_facecolor('#2e2e2e')
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         self.display_graph(fig)
 
@@ -438,17 +575,8 @@ class AnalysisView(ttk.Frame):
         Fetches gender-based patient and ICU statistics from the database,
         applies differential privacy, and visualizes the results.
         """
-        query = """
-        SELECT 
-            sex AS gender,
-            COUNT(*) AS total,
-            SUM(CASE WHEN icu = 1 THEN 1 ELSE 0 END) AS icu_count
-        FROM Patients
-        WHERE sex IN (1, 2)  -- Filter out missing values (e.g., 97, 99)
-        GROUP BY sex;
-        """
-        self.db_connection.execute_query(query)
-        results = self.db_connection.cursor.fetchall()
+        query = ANALYSIS_QUERIES["gender_icu"]
+        results = self._fetch_all("gender_icu", query)
 
         if not results:
             return "No gender-based data available."
@@ -461,34 +589,29 @@ class AnalysisView(ttk.Frame):
             for row in results
         }
 
+        noisy = apply_differential_privacy_batch(
+            self.db_connection,
+            {
+                "total": [v["total"] for v in genders.values()],
+                "icu_count": [v["icu_count"] for v in genders.values()]
+            },
+            mechanism="Gaussian",
+            epsilon=self.epsilon,
+            query=query
+        )
         dp_genders = {
-            k: {
-                "total": apply_differential_privacy(
-                    self.db_connection,
-                    [v["total"]],
-                    mechanism="Gaussian",
-                    epsilon=self.epsilon,
-                    query=query
-                )[0],
-                "icu_count": apply_differential_privacy(
-                    self.db_connection,
-                    [v["icu_count"]],
-                    mechanism="Gaussian",
-                    epsilon=self.epsilon,
-                    query=query
-                )[0]
-            }
-            for k, v in genders.items()
+            k: {"total": total, "icu_count": icu_count}
+            for k, total, icu_count in zip(genders.keys(), noisy["total"], noisy["icu_count"])
         }
 
         labels = [f"Gender {k}" for k in dp_genders.keys()]
         total_values = [v["total"] for v in dp_genders.values()]
         icu_values = [v["icu_count"] for v in dp_genders.values()]
 
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 5))
-        plt.style.use('ggplot')
+        fig = Figure(figsize=(10, 5))
+        ax1, ax2 = fig.subplots(1, 2)
 
-        colors = plt.cm.viridis(np.linspace(0, 1, len(dp_genders)))
+        colors = cm.viridis(np.linspace(0, 1, len(dp_genders)))
 
         ax1.pie(total_values, labels=labels, autopct="%1.1f%%", startangle=90, colors=colors,
                 textprops={'color': 'white'})
@@ -502,7 +625,7 @@ class AnalysisView(ttk.Frame):
         ax2.set_facecolor('#2e2e2e')
         fig.patch.set_facecolor('#2e2e2e')
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         self.display_graph(fig)
 
@@ -512,9 +635,8 @@ class AnalysisView(ttk.Frame):
         return result_str
 
     def perform_regional_analysis(self):
-        query = "SELECT usmer, COUNT(*) AS count FROM Patients GROUP BY usmer"
-        self.db_connection.execute_query(query)
-        results = self.db_connection.cursor.fetchall()
+        query = ANALYSIS_QUERIES["usmer_distribution"]
+        results = self._fetch_all("usmer_distribution", query)
 
         if not results:
             return "No data available for regional analysis."
@@ -525,19 +647,25 @@ class AnalysisView(ttk.Frame):
             3: "Third Level"
         }
 
+        noisy_counts = apply_differential_privacy_batch(
+            self.db_connection,
+            [row['count'] for row in results],
+            mechanism="Laplace",
+            epsilon=self.epsilon,
+            query=query,
+            output="count"
+        )
         dp_results = {
-            usmer_mapping[row['usmer']]:
-                apply_differential_privacy(self.db_connection, [row['count']], mechanism="Laplace",
-                                           epsilon=self.epsilon, query=query)[0]
-            for row in results
+            usmer_mapping[row['usmer']]: noisy_count
+            for row, noisy_count in zip(results, noisy_counts)
         }
 
-        fig, ax = plt.subplots(figsize=(6, 4))
-        plt.style.use('ggplot')
+        fig = Figure(figsize=(6, 4))
+        ax = fig.subplots()
 
         labels = list(dp_results.keys())
         sizes = list(dp_results.values())
-        colors = plt.cm.viridis(np.linspace(0, 1, len(labels)))
+        colors = cm.viridis(np.linspace(0, 1, len(labels)))
 
         wedges, texts, autotexts = ax.pie(
             sizes,
@@ -553,7 +681,7 @@ class AnalysisView(ttk.Frame):
         ax.set_facecolor('#2e2e2e')
         fig.patch.set_facecolor('#2e2e2e')
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         self.display_graph(fig)
 
@@ -563,31 +691,27 @@ class AnalysisView(ttk.Frame):
         return result_str
 
     def perform_time_series_analysis(self):
-        query = """
-        SELECT date_died, COUNT(*) AS deaths 
-        FROM Patients 
-        WHERE date_died IS NOT NULL 
-        GROUP BY date_died 
-        ORDER BY date_died
-        """
-        self.db_connection.execute_query(query)
-        results = self.db_connection.cursor.fetchall()
+        query = ANALYSIS_QUERIES["deaths_by_date"]
+        columns = self._fetch_columns("deaths_by_date", query, {"deaths": np.float64})
 
-        if not results:
+        if not columns:
             return "No data available for time series analysis."
 
-        dp_results = {
-            row['date_died']:
-                apply_differential_privacy(self.db_connection, [row['deaths']], mechanism="Gaussian",
-                                           epsilon=self.epsilon, query=query)[0]
-            for row in results
-        }
+        noisy_deaths = apply_differential_privacy_batch(
+            self.db_connection,
+            columns["deaths"],
+            mechanism="Gaussian",
+            epsilon=self.epsilon,
+            query=query,
+            output="deaths"
+        )
+        dp_results = dict(zip(columns["date_died"], noisy_deaths))
 
         dates = list(dp_results.keys())
         values = list(dp_results.values())
 
-        fig, ax = plt.subplots(figsize=(10, 5))
-        plt.style.use('ggplot')
+        fig = Figure(figsize=(10, 5))
+        ax = fig.subplots()
 
         ax.plot(dates, values, linestyle='-', color='#3498db', linewidth=2)
 
@@ -597,7 +721,7 @@ class AnalysisView(ttk.Frame):
 
         ax.grid(True, linestyle='--', alpha=0.7)
 
-        plt.xticks(rotation=45, ha='right', color='white')
+        setp(ax.get_xticklabels(), rotation=45, ha='right', color='white')
 
         ax.tick_params(axis='x', colors='white')
         ax.tick_params(axis='y', colors='white')
@@ -605,7 +729,7 @@ class AnalysisView(ttk.Frame):
         ax.set_facecolor('#2e2e2e')
         fig.patch.set_facecolor('#2e2e2e')
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         self.display_graph(fig)
 
@@ -616,35 +740,24 @@ class AnalysisView(ttk.Frame):
 
     def perform_covid_trends(self):
         try:
-            query = """
-
-
-        SELECT DATE_FORMAT(DATE_DIED, '%Y-%u') AS week, COUNT(*) AS weekly_cases 
-        FROM Patients 
-        WHERE classification_final = 1 
-        GROUP BY week
-        ORDER BY week;
-            """
-            if not self.db_connection.execute_query(query):
-                return "Error executing database query"
-
-            results = self.db_connection.cursor.fetchall()
+            query = ANALYSIS_QUERIES["covid_trends"]
+            results = self._fetch_all("covid_trends", query)
             if not results:
                 return "No COVID trend data available"
 
-            dp_results = {}
-            for row in results:
-                if row and 'week' in row and 'weekly_cases' in row:
-                    week = row['week']
-                    cases = row['weekly_cases']
-                    if week and cases is not None:
-                        dp_results[week] = apply_differential_privacy(
-                            self.db_connection,
-                            [cases],
-                            mechanism="Gaussian",
-                            epsilon=self.epsilon,
-                            query=query
-                        )[0]
+            valid_rows = [
+                row for row in results
+                if row and row.get('week') and row.get('weekly_cases') is not None
+            ]
+            noisy_cases = apply_differential_privacy_batch(
+                self.db_connection,
+                [row['weekly_cases'] for row in valid_rows],
+                mechanism="Gaussian",
+                epsilon=self.epsilon,
+                query=query,
+                output="weekly_cases"
+            )
+            dp_results = {row['week']: cases for row, cases in zip(valid_rows, noisy_cases)}
 
             if not dp_results:
                 return "No valid data points found for analysis"
@@ -652,8 +765,8 @@ class AnalysisView(ttk.Frame):
             weeks = list(dp_results.keys())
             cases = list(dp_results.values())
 
-            fig, ax = plt.subplots(figsize=(10, 5))
-            plt.style.use('ggplot')
+            fig = Figure(figsize=(10, 5))
+            ax = fig.subplots()
 
             if len(weeks) > 1:
                 ax.plot(
@@ -688,7 +801,7 @@ class AnalysisView(ttk.Frame):
 
             ax.grid(True, linestyle='--', alpha=0.7)
 
-            plt.xticks(rotation=45, ha='right', color='white')
+            setp(ax.get_xticklabels(), rotation=45, ha='right', color='white')
 
             ax.tick_params(axis='x', colors='white')
             ax.tick_params(axis='y', colors='white')
@@ -698,7 +811,7 @@ class AnalysisView(ttk.Frame):
 
             ax.legend(loc='upper left', fontsize=10, facecolor='#2e2e2e')
 
-            plt.tight_layout()
+            fig.tight_layout()
 
             self.display_graph(fig)
 
@@ -712,16 +825,8 @@ class AnalysisView(ttk.Frame):
 
     def perform_disease_priority_analysis(self):
 
-        query = """
-        SELECT
-            SUM(CASE WHEN diabetes=1 THEN 1 ELSE 0 END) AS diabetes_count,
-            SUM(CASE WHEN hipertension=1 THEN 1 ELSE 0 END) AS hipertension_count,
-            SUM(CASE WHEN obesity=1 THEN 1 ELSE 0 END) AS obesity_count,
-            SUM(CASE WHEN tobacco=1 THEN 1 ELSE 0 END) AS tobacco_count
-        FROM Patients
-        """
-        self.db_connection.execute_query(query)
-        row = self.db_connection.cursor.fetchone()
+        query = ANALYSIS_QUERIES["disease_priority"]
+        row = self._fetch_one("disease_priority", query)
         if not row:
             return "No data available."
 
@@ -744,10 +849,10 @@ class AnalysisView(ttk.Frame):
         chosen_label = labels[idx]
         chosen_count = data[idx]
 
-        fig, ax = plt.subplots(figsize=(6, 4))
-        plt.style.use('ggplot')
+        fig = Figure(figsize=(6, 4))
+        ax = fig.subplots()
 
-        colors = plt.cm.viridis(np.linspace(0, 1, len(data)))
+        colors = cm.viridis(np.linspace(0, 1, len(data)))
         bars = ax.bar(labels, data, color=colors, edgecolor='black')
 
         ax.set_title(f"Disease Priority Analysis (ε={self.epsilon:.2f})", fontsize=14, pad=15, color='white')
@@ -763,7 +868,7 @@ class AnalysisView(ttk.Frame):
 
         bars[idx].set_color('#e74c3c')
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         self.display_graph(fig)
 
@@ -771,18 +876,8 @@ class AnalysisView(ttk.Frame):
 
     def perform_top_death_dates_exponential(self):
 
-        query = """
-        SELECT 
-            date_died, 
-            COUNT(*) AS died_count
-        FROM Patients
-        WHERE date_died IS NOT NULL
-        GROUP BY date_died
-        ORDER BY died_count DESC
-        LIMIT 10
-        """
-        self.db_connection.execute_query(query)
-        rows = self.db_connection.cursor.fetchall()
+        query = ANALYSIS_QUERIES["top_death_dates"]
+        rows = self._fetch_all("top_death_dates", query)
 
         if not rows:
             return "No data available for top death dates."
@@ -800,26 +895,31 @@ class AnalysisView(ttk.Frame):
         if all(count == 0 for count in died_counts):
             return "All 10 dates have 0 deaths? No valid data to run Exponential."
 
-        chosen_date = apply_differential_privacy(
+        # Half of ε selects the date with Gumbel report-noisy-max, which samples exactly the
+        # exponential mechanism over the counts. The noisy score of the winner is not a private
+        # release, so the other half of ε releases its count with a fresh Laplace draw.
+        step_epsilon = self.epsilon / 2
+        chosen_index = apply_differential_privacy(
             self.db_connection,
-            data=date_labels,
-            mechanism="Exponential",
-            epsilon=self.epsilon,
-            utility=died_counts,
-            query=query
+            died_counts,
+            mechanism="ReportNoisyMax",
+            epsilon=step_epsilon,
+            query=query,
+            output="died_count"
         )
 
-        chosen_index = date_labels.index(chosen_date)
+        chosen_date = date_labels[chosen_index]
         noisy_count = apply_differential_privacy(
             self.db_connection,
             [died_counts[chosen_index]],
             mechanism="Laplace",
-            epsilon=self.epsilon,
-            query=query
+            epsilon=step_epsilon,
+            query=query,
+            output="died_count"
         )[0]
 
-        fig, ax = plt.subplots(figsize=(8, 2))
-        plt.style.use('ggplot')
+        fig = Figure(figsize=(8, 2))
+        ax = fig.subplots()
 
         ax.barh([chosen_date], [noisy_count], color='#e74c3c', edgecolor='black')
 
@@ -835,23 +935,18 @@ class AnalysisView(ttk.Frame):
         ax.set_facecolor('#2e2e2e')
         fig.patch.set_facecolor('#2e2e2e')
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         self.display_graph(fig)
 
         return (
             f"Exponential mechanism chose date '{chosen_date}' with a noisy death count of {noisy_count:.2f}.\n"
-            "Note: Only the selected date is displayed with differential privacy."
+            f"Note: Only the selected date is displayed with differential privacy; ε={step_epsilon:.2f} "
+            f"selected it and ε={step_epsilon:.2f} released its count."
         )
     def perform_recovery_rate_analysis(self):
-        query = """
-        SELECT 
-            COUNT(*) AS total_cases,
-            SUM(CASE WHEN date_died IS NULL THEN 1 ELSE 0 END) AS recovered_cases
-        FROM Patients;
-        """
-        self.db_connection.execute_query(query)
-        result = self.db_connection.cursor.fetchone()
+        query = ANALYSIS_QUERIES["recovery_rate"]
+        result = self._fetch_one("recovery_rate", query)
 
         if not result:
             return "No data available for recovery analysis."
@@ -864,15 +959,17 @@ class AnalysisView(ttk.Frame):
         if total_cases == 0:
             return "Total cases is zero, cannot calculate recovery rate."
 
-        noise_total = np.random.normal(0, 50)
-        noise_recovered = np.random.normal(0, 50)
+        noise_total, noise_recovered = get_noise_engine().normal(50, 2)
 
-        dp_total_cases = max(
-            apply_differential_privacy(self.db_connection, [total_cases], mechanism="Gaussian", epsilon=self.epsilon,
-                                       query=query)[0] + noise_total, 0)
-        dp_recovered_cases = max(apply_differential_privacy(self.db_connection, [recovered_cases], mechanism="Gaussian",
-                                                            epsilon=self.epsilon, query=query)[
-                                     0] + noise_recovered, 0)
+        dp_values = apply_differential_privacy_batch(
+            self.db_connection,
+            {"total_cases": total_cases, "recovered_cases": recovered_cases},
+            mechanism="Gaussian",
+            epsilon=self.epsilon,
+            query=query
+        )
+        dp_total_cases = max(dp_values["total_cases"] + noise_total, 0)
+        dp_recovered_cases = max(dp_values["recovered_cases"] + noise_recovered, 0)
 
         print(f"DP - Total Cases: {dp_total_cases}, Recovered Cases: {dp_recovered_cases}")
 
@@ -885,11 +982,10 @@ class AnalysisView(ttk.Frame):
         values = [dp_recovered_cases, dp_total_cases - dp_recovered_cases]
         labels = ['Recovered', 'Not Recovered']
 
-        plt.clf()
-        fig, ax = plt.subplots(figsize=(6, 4))
-        plt.style.use('ggplot')
+        fig = Figure(figsize=(6, 4))
+        ax = fig.subplots()
 
-        colors = plt.cm.viridis(np.linspace(0, 1, len(labels)))
+        colors = cm.viridis(np.linspace(0, 1, len(labels)))
         ax.pie(values, labels=labels, autopct="%1.1f%%", startangle=90, colors=colors, textprops={'color': 'white'})
 
         ax.set_title(f"Recovery Rate (ε={self.epsilon:.2f})", fontsize=14, pad=15, color='white')
@@ -897,23 +993,15 @@ class AnalysisView(ttk.Frame):
         ax.set_facecolor('#2e2e2e')
         fig.patch.set_facecolor('#2e2e2e')
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         self.display_graph(fig)
 
         return f"Recovery Rate (ε={self.epsilon:.2f}): {recovery_rate:.2f}%"
 
     def perform_mortality_rate_by_age_group(self):
-        query = """
-            SELECT FLOOR(age / 10) * 10 AS age_group, 
-                COUNT(*) AS total_cases,
-                SUM(CASE WHEN date_died IS NOT NULL THEN 1 ELSE 0 END) AS deaths
-            FROM Patients
-            GROUP BY age_group
-            ORDER BY age_group;
-        """
-        self.db_connection.execute_query(query)
-        results = self.db_connection.cursor.fetchall()
+        query = ANALYSIS_QUERIES["mortality_by_age"]
+        results = self._fetch_all("mortality_by_age", query)
 
         if not results:
             return "No data available for mortality rate analysis."
@@ -921,29 +1009,26 @@ class AnalysisView(ttk.Frame):
         age_groups = {f"{row['age_group']}-{row['age_group'] + 9}": float(row['total_cases']) for row in results}
         deaths = {f"{row['age_group']}-{row['age_group'] + 9}": float(row['deaths']) for row in results}
 
-        dp_total_cases = {
-            group: apply_differential_privacy(self.db_connection, [count], mechanism="Gaussian", epsilon=self.epsilon,
-                                              query=query)[0]
-            for group, count in age_groups.items()
-        }
-
-        dp_deaths = {
-            group: apply_differential_privacy(self.db_connection, [count], mechanism="Laplace", epsilon=self.epsilon,
-                                              query=query)[0]
-            for group, count in deaths.items()
-        }
+        noisy_totals = apply_differential_privacy_batch(
+            self.db_connection, list(age_groups.values()), mechanism="Gaussian", epsilon=self.epsilon,
+            query=query, output="total_cases"
+        )
+        noisy_deaths = apply_differential_privacy_batch(
+            self.db_connection, list(deaths.values()), mechanism="Laplace", epsilon=self.epsilon,
+            query=query, output="deaths"
+        )
+        dp_total_cases = dict(zip(age_groups.keys(), noisy_totals))
+        dp_deaths = dict(zip(deaths.keys(), noisy_deaths))
 
         mortality_rates = {
             group: (dp_deaths[group] / dp_total_cases[group] * 100) if dp_total_cases[group] > 0 else 0
             for group in age_groups
         }
 
-        plt.clf()
+        fig = Figure(figsize=(8, 5))
+        ax = fig.subplots()
 
-        fig, ax = plt.subplots(figsize=(8, 5))
-        plt.style.use('ggplot')
-
-        colors = plt.cm.viridis(np.linspace(0, 1, len(mortality_rates)))
+        colors = cm.viridis(np.linspace(0, 1, len(mortality_rates)))
         ax.bar(mortality_rates.keys(), mortality_rates.values(), color=colors, edgecolor='black')
 
         ax.set_title(f"Mortality Rate by Age Group (ε={self.epsilon:.2f})", fontsize=14, pad=15, color='white')
@@ -952,7 +1037,7 @@ class AnalysisView(ttk.Frame):
 
         ax.grid(axis='y', linestyle='--', alpha=0.7)
 
-        plt.xticks(rotation=45, ha='right', color='white')
+        setp(ax.get_xticklabels(), rotation=45, ha='right', color='white')
 
         ax.tick_params(axis='x', colors='white')
         ax.tick_params(axis='y', colors='white')
@@ -960,7 +1045,7 @@ class AnalysisView(ttk.Frame):
         ax.set_facecolor('#2e2e2e')
         fig.patch.set_facecolor('#2e2e2e')
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         self.display_graph(fig)
 
@@ -970,16 +1055,8 @@ class AnalysisView(ttk.Frame):
         return result_str
 
     def perform_most_affected_age_group(self):
-        query = """
-            SELECT FLOOR(age / 10) * 10 AS age_group, 
-                COUNT(*) AS total_cases
-            FROM Patients
-            WHERE date_died IS NOT NULL
-            GROUP BY age_group
-            ORDER BY age_group
-        """
-        self.db_connection.execute_query(query)
-        results = self.db_connection.cursor.fetchall()
+        query = ANALYSIS_QUERIES["deaths_by_age"]
+        results = self._fetch_all("deaths_by_age", query)
 
         if not results:
             return "No data available for mortality analysis."
@@ -1000,7 +1077,8 @@ class AnalysisView(ttk.Frame):
         age_labels = list(age_groups.keys())
         affected_counts = list(age_groups.values())
 
-        fig, ax = plt.subplots(figsize=(8, 5))
+        fig = Figure(figsize=(8, 5))
+        ax = fig.subplots()
         bars = ax.barh(age_labels, affected_counts, color='#3498db', edgecolor='black')
 
         ax.set_title(f"Most Affected Age Groups (ε={self.epsilon:.2f})", fontsize=14, pad=15, fontweight='bold')
@@ -1030,51 +1108,52 @@ class AnalysisView(ttk.Frame):
         return f"The most affected age group is {most_affected_group} years."
 
     def perform_high_risk_survivors(self):
-        query = """
-            SELECT patient_id, age, diabetes, obesity, hipertension, intubed, icu
-            FROM Patients
-            WHERE (diabetes + obesity + hipertension) >= 2
-            AND (intubed = 1 OR icu = 1)
-            AND date_died IS NULL;
-        """
+        query = ANALYSIS_QUERIES["high_risk_survivors"]
 
-        self.db_connection.execute_query(query)
-        results = self.db_connection.cursor.fetchall()
+        # One (age, survivors) row per distinct age, so the transfer does not grow with patients.
+        columns = self._fetch_columns(
+            "high_risk_survivors", query, {"age": np.float64, "survivors": np.int64}
+        )
 
-        if not results:
+        if not columns:
             return "No high-risk survivor data available."
 
-        ages = [row["age"] for row in results]
+        survivor_count = int(columns["survivors"].sum())
+        known_age = ~np.isnan(columns["age"])
+        distinct_ages = columns["age"][known_age].astype(np.int64)
+        age_counts = columns["survivors"][known_age]
+        if not distinct_ages.size:
+            return "No high-risk survivor data available."
 
         dp_survivors_count = apply_differential_privacy(
             self.db_connection,
-            [len(results)],
+            [survivor_count],
             mechanism="Laplace",
             epsilon=self.epsilon,
-            query=query
+            query=query,
+            output="survivors"
         )[0]
 
-        selected_age = apply_differential_privacy(
+        selected_age = int(apply_differential_privacy(
             self.db_connection,
-            data=ages,
+            data=distinct_ages,
             mechanism="Exponential",
             epsilon=self.epsilon,
-            utility=ages,
+            utility=distinct_ages,
+            counts=age_counts,
             query=query
-        )
+        ))
 
-        age_groups = {f"{age // 10 * 10}-{age // 10 * 10 + 9}": 0 for age in ages}
-        for age in ages:
-            age_group = f"{age // 10 * 10}-{age // 10 * 10 + 9}"
-            age_groups[age_group] += 1
+        decades, decade_index = np.unique(distinct_ages // 10 * 10, return_inverse=True)
+        decade_counts = np.bincount(decade_index, weights=age_counts, minlength=len(decades))
 
-        group_labels = list(age_groups.keys())
-        survivor_counts = list(age_groups.values())
+        group_labels = [f"{decade}-{decade + 9}" for decade in decades]
+        survivor_counts = [int(count) for count in decade_counts]
 
-        fig, ax = plt.subplots(figsize=(8, 5))
-        plt.style.use('ggplot')
+        fig = Figure(figsize=(8, 5))
+        ax = fig.subplots()
 
-        colors = plt.cm.viridis(np.linspace(0, 1, len(group_labels)))
+        colors = cm.viridis(np.linspace(0, 1, len(group_labels)))
         bars = ax.barh(group_labels, survivor_counts, color=colors, edgecolor='black')
 
         ax.set_title(f"High-Risk Survivors by Age Group (ε={self.epsilon:.2f})", fontsize=14, pad=15, color='white')
@@ -1106,7 +1185,7 @@ class AnalysisView(ttk.Frame):
         ax.set_facecolor('#2e2e2e')
         fig.patch.set_facecolor('#2e2e2e')
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         self.display_graph(fig)
 
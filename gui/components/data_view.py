@@ -1,13 +1,78 @@
+from collections import namedtuple
+
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 
+from database.filters import PatientFilter, between, equals, is_null, one_of, seek_condition, sort_order
+from database.metadata import add_table_change_listener
+from database.schema import SORT_INDEXES
+from gui.components.virtual_table import VirtualTable
+from utils.jobs import JobRunner
+
+# Search operators -> builders of a predicate from (column, entered text)
+SEARCH_OPERATORS = {
+    "=": lambda column, text: equals(column, text),
+    "in": lambda column, text: one_of(column, [value for value in text.split(",") if value.strip()]),
+    "between": lambda column, text: between(column, *_range_bounds(text)),
+    "≥": lambda column, text: between(column, low=text),
+    "≤": lambda column, text: between(column, high=text),
+    "is empty": lambda column, text: is_null(column, True),
+    "is not empty": lambda column, text: is_null(column, False),
+}
+
+
+def _range_bounds(text):
+    bounds = [bound.strip() for bound in text.replace("..", ",").split(",")]
+    if len(bounds) != 2 or not all(bounds):
+        raise ValueError("Enter a range as 'low, high'")
+    return bounds
+
+
+# The filter, sort order and page size a page is located for, captured on the Tk thread so the
+# queries can run on a worker while the view changes. Its first three fields key the anchors.
+PageOrder = namedtuple("PageOrder", ["filters", "sort_key", "descending", "rows_per_page"])
+
+# Every ANCHOR_STRIDE-th patient_id of a filter is cached, so any page is reached by seeking to
+# the nearest anchor and skipping fewer than ANCHOR_STRIDE rows.
+ANCHOR_STRIDE = 1000
+
+
 class DataView(ttk.Frame):
-    def __init__(self, parent, db_connection):
+    """
+    Pages through Patients with keyset (seek) pagination, ordered by the sort column and then patient_id.
+
+    A page starts at a known (sort value, patient_id) key instead of an OFFSET, so its cost
+    does not grow with the page number. Locating a page also finds the key of the next one,
+    which tells whether there is one without counting the table. The total row count and the
+    sparse anchors used for jumps are computed together, once per filter and sort order, only
+    when a jump or the last page needs them, and are dropped when Patients changes. Sorting
+    follows MySQL: NULLs first ascending and last descending.
+
+    Locating a page and counting run on the view's JobRunner, and the controls are updated when
+    they finish. Rows are shown through a VirtualTable, which fetches only the blocks being
+    looked at, so large page sizes cost neither Tk time nor memory up front.
+    """
+
+    def __init__(self, parent, db_connection, patient_store=None):
         super().__init__(parent)
         self.db_connection = db_connection
+        self.patient_store = patient_store
         self.current_page = 1
         self.rows_per_page = 10
-        self.total_rows = 0
+        self.total_rows = None
+        self.filters = PatientFilter()
+        self.has_next = False
+        self.sort_key = "patient_id"
+        self.sort_descending = False
+        # First (sort value, patient_id) of each visited page, for the current filter, order and page size
+        self._page_keys = {}
+        # (filters, sort key, descending) -> (anchor keys, total rows)
+        self._anchors = {}
+        # Bumped whenever the page or its source changes, so results located for an older one are dropped
+        self._generation = 0
+        self.jobs = JobRunner(self, max_workers=2)
+        self.bind("<Destroy>", self._on_destroy, add="+")
+        add_table_change_listener(self._on_table_changed)
         self.setup_ui()
 
     def setup_ui(self):
@@ -17,22 +82,41 @@ class DataView(ttk.Frame):
         search_frame = ttk.Frame(self)
         search_frame.pack(fill="x", padx=10, pady=5)
 
+        self.columns = [
+            "patient_id", "usmer", "medical_unit", "sex", "patient_type", "date_died",
+            "intubed", "pneumonia", "age", "pregnant", "diabetes", "copd", "asthma",
+            "inmsupr", "hipertension", "other_disease", "cardiovascular", "obesity",
+            "renal_chronic", "tobacco", "classification_final", "icu"
+        ]
+        self.search_columns = {col.replace("_", " ").title(): col for col in self.columns}
+
         ttk.Label(search_frame, text="Search:").pack(side="left", padx=5)
-        self.search_field = ttk.Combobox(search_frame,
-                                         values=["Age", "Sex", "Patient Type", "Medical Unit"],
-                                         width=15)
+        self.search_field = ttk.Combobox(search_frame, values=list(self.search_columns),
+                                         width=18, state="readonly")
         self.search_field.set("Age")
         self.search_field.pack(side="left", padx=5)
 
-        self.search_entry = ttk.Entry(search_frame, width=50)
+        self.search_operator = ttk.Combobox(search_frame, values=list(SEARCH_OPERATORS),
+                                            width=12, state="readonly")
+        self.search_operator.set("=")
+        self.search_operator.pack(side="left", padx=5)
+
+        self.search_entry = ttk.Entry(search_frame, width=30)
         self.search_entry.pack(side="left", padx=5)
+        self.search_entry.bind("<Return>", lambda event: self.perform_search())
 
         ttk.Button(search_frame, text="Search",
                    command=self.perform_search,
                    style="primary.TButton").pack(side="left", padx=5)
 
+        ttk.Button(search_frame, text="Add",
+                   command=lambda: self.perform_search(refine=True)).pack(side="left", padx=5)
+
         ttk.Button(search_frame, text="Reset",
-                   command=self.load_data).pack(side="left")
+                   command=self.reset_search).pack(side="left")
+
+        self.filter_label = ttk.Label(self, text="No filter", bootstyle="secondary")
+        self.filter_label.pack(fill="x", padx=15)
 
         rows_per_page_frame = ttk.Frame(self)
         rows_per_page_frame.pack(fill="x", padx=10, pady=5)
@@ -45,40 +129,24 @@ class DataView(ttk.Frame):
         ttk.Button(rows_per_page_frame, text="Apply",
                    command=self.update_rows_per_page).pack(side="left", padx=5)
 
-        self.columns = [
-            "patient_id", "usmer", "medical_unit", "sex", "patient_type", "date_died",
-            "intubed", "pneumonia", "age", "pregnant", "diabetes", "copd", "asthma",
-            "inmsupr", "hipertension", "other_disease", "cardiovascular", "obesity",
-            "renal_chronic", "tobacco", "classification_final", "icu"
-        ]
-
-        table_frame = ttk.Frame(self)
-        table_frame.pack(fill="both", expand=True, padx=10, pady=5)
-
-        self.table = ttk.Treeview(table_frame, columns=self.columns, show="headings", height=20)
-
-        y_scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.table.yview)
-        x_scrollbar = ttk.Scrollbar(table_frame, orient="horizontal", command=self.table.xview)
-
-        self.table.configure(yscrollcommand=y_scrollbar.set, xscrollcommand=x_scrollbar.set)
-
-        self.table.grid(row=0, column=0, sticky="nsew")
-        y_scrollbar.grid(row=0, column=1, sticky="ns")
-        x_scrollbar.grid(row=1, column=0, sticky="ew")
-
-        table_frame.grid_columnconfigure(0, weight=1)
-        table_frame.grid_rowconfigure(0, weight=1)
+        self.table = VirtualTable(self, self.columns, self.jobs, height=20)
+        self.table.pack(fill="both", expand=True, padx=10, pady=5)
 
         for col in self.columns:
             display_name = col.replace("_", " ").title()
-            self.table.heading(col, text=display_name,
-                               command=lambda c=col: self.sort_column(c))
+            if col in SORT_INDEXES:
+                self.table.heading(col, text=display_name, command=lambda c=col: self.sort_by(c))
+            else:
+                self.table.heading(col, text=display_name)
             width = 70 if col in ["patient_id", "age", "usmer"] else 100
             self.table.column(col, anchor="center", width=width, minwidth=50)
 
         pagination_frame = ttk.Frame(self)
         pagination_frame.pack(fill="x", padx=10, pady=5)
 
+        self.first_button = ttk.Button(pagination_frame, text="First", command=self.first_page)
+        self.first_button.pack(side="left", padx=5)
+
         self.previous_button = ttk.Button(pagination_frame, text="Previous", command=self.previous_page)
         self.previous_button.pack(side="left", padx=5)
 
@@ -88,98 +156,326 @@ class DataView(ttk.Frame):
         self.next_button = ttk.Button(pagination_frame, text="Next", command=self.next_page)
         self.next_button.pack(side="left", padx=5)
 
-        self.load_data()
+        self.last_button = ttk.Button(pagination_frame, text="Last", command=self.last_page)
+        self.last_button.pack(side="left", padx=5)
 
-    def load_data(self, filters=None):
-        try:
-            for item in self.table.get_children():
-                self.table.delete(item)
+        ttk.Label(pagination_frame, text="Go to page:").pack(side="left", padx=(20, 5))
+        self.page_entry = ttk.Entry(pagination_frame, width=8)
+        self.page_entry.pack(side="left", padx=5)
+        self.page_entry.bind("<Return>", lambda event: self.jump_to_page())
 
-            offset = (self.current_page - 1) * self.rows_per_page
-
-            query = """
-                SELECT patient_id, usmer, medical_unit, sex, patient_type, date_died, intubed, pneumonia,
-                       age, pregnant, diabetes, copd, asthma, inmsupr, hipertension, other_disease,
-                       cardiovascular, obesity, renal_chronic, tobacco, classification_final, icu
-                FROM Patients
-            """
+        ttk.Button(pagination_frame, text="Go", command=self.jump_to_page).pack(side="left", padx=5)
 
-            if filters:
-                query += f" WHERE {filters}"
-
-            query += f" LIMIT {self.rows_per_page} OFFSET {offset}"
-
-            self.db_connection.execute_query(query)
-            rows = self.db_connection.cursor.fetchall()
-
-            for row in rows:
-                self.table.insert("", "end", values=tuple(row.values()))
+        self.load_data()
 
-            self.update_total_rows(filters)
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self.jobs.shutdown()
+
+    def _on_table_changed(self, table_name):
+        if table_name.lower() == "patients":
+            self._generation += 1
+            self._page_keys = {}
+            self._anchors = {}
+            self.total_rows = None
+
+    def load_data(self):
+        """
+        Shows the current page. Its size and keys are located on a worker; its rows are then
+        fetched in blocks by the table as they scroll into view.
+        """
+        self._generation += 1
+        if not self.filters and self.patient_store is not None and self.patient_store.ready:
+            # The shared column store already holds every row in patient_id order.
+            store = self.patient_store
+            offset = (self.current_page - 1) * self.rows_per_page
+            order = None
+            if self.sort_key != "patient_id" or self.sort_descending:
+                order = store.sort_order(self.sort_key, self.sort_descending)
+            self.total_rows = store.row_count
+            self.has_next = offset + self.rows_per_page < self.total_rows
+            size = max(min(self.rows_per_page, self.total_rows - offset), 0)
+            self.table.set_source(size, lambda start, stop, anchor: store.rows(offset + start, offset + stop, order))
             self.update_pagination_controls()
-        except Exception as e:
-            print(f"Error loading data: {e}")
-
-    def update_total_rows(self, filters=None):
-        try:
-            query = "SELECT COUNT(*) AS total FROM Patients"
-            if filters:
-                query += f" WHERE {filters}"
-
-            self.db_connection.execute_query(query)
-            result = self.db_connection.cursor.fetchone()
-
-            if result:
-                self.total_rows = int(result["total"])
-            else:
-                self.total_rows = 0
-        except Exception as e:
-            print(f"Error updating total rows: {e}")
-            self.total_rows = 0
+            return
+
+        generation, order, page = self._generation, self._page_order(), self.current_page
+        self.page_label.config(text=f"Page {page} (loading...)")
+        for button in (self.first_button, self.previous_button, self.next_button, self.last_button):
+            button.config(state="disabled")
+        self.jobs.submit(
+            f"page {page}", self.locate_page, order, page,
+            self._page_keys.get(page), self._anchors.get(order[:3]),
+            on_success=lambda located: self._show_page(generation, order, page, located),
+            on_error=self._on_load_error,
+        )
+
+    def _show_page(self, generation, order, page, located):
+        if generation != self._generation:
+            return
+        conditions, params, size, key, next_key, anchors = located
+        if key is not None:
+            self._page_keys[page] = key
+        if next_key is not None:
+            self._page_keys[page + 1] = next_key
+        if anchors is not None:
+            self._anchors[order[:3]] = anchors
+        self.has_next = next_key is not None
+        self.table.set_source(
+            size, lambda start, stop, anchor: self.fetch_rows(
+                conditions, params, order.sort_key, order.descending, start, stop, anchor
+            )
+        )
+        self.total_rows = anchors[1] if anchors else None
+        self.update_pagination_controls()
+
+    def _on_load_error(self, error):
+        print(f"Error loading data: {error}")
+        self.update_pagination_controls()
+
+    def _page_order(self):
+        return PageOrder(self.filters, self.sort_key, self.sort_descending, self.rows_per_page)
+
+    def _where(self, conditions):
+        return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    def _select_keys(self, order, conditions, params, limit, offset):
+        query = (f"SELECT {order.sort_key} AS sort_value, patient_id FROM Patients{self._where(conditions)}"
+                 f" ORDER BY {sort_order(order.sort_key, order.descending)} LIMIT %s OFFSET %s")
+        with self.db_connection.session() as cursor:
+            cursor.execute(query, params + [limit, offset])
+            return [(row["sort_value"], row["patient_id"]) for row in cursor.fetchall()]
+
+    def locate_page(self, order, page, key=None, anchors=None):
+        """
+        Locates a page from its first row. Runs on a worker thread and only reads the view's
+        state through its arguments.
+
+        The page is found from its cached first key, or else from the nearest anchor, skipping at
+        most ANCHOR_STRIDE rows past it. Counting the page and finding the next key read at most
+        rows_per_page + 1 index entries, whatever the page number.
+
+        :param order: The PageOrder to locate the page in.
+        :param key: The cached first key of the page, if known.
+        :param anchors: The cached result of load_anchors for the order, if known; it is only
+                        computed when a page without a key needs it.
+        :return: A tuple of (conditions, params, size, key, next_key, anchors) where conditions and
+                 params select the page's rows from its first one, key is its first key and
+                 next_key the first key of the next page (None if there is none).
+        """
+        conditions, params = [], []
+        if order.filters:
+            sql, params = order.filters.compile()
+            conditions.append(f"({sql})")
+        if key is None and page > 1:
+            if anchors is None:
+                anchors = self.load_anchors(order)
+            position = (page - 1) * order.rows_per_page
+            if position // ANCHOR_STRIDE >= len(anchors[0]):
+                return conditions, params, 0, None, None, anchors
+            condition, key_params = seek_condition(order.sort_key, anchors[0][position // ANCHOR_STRIDE], order.descending)
+            first = self._select_keys(order, conditions + [condition], params + key_params, 1, position % ANCHOR_STRIDE)
+            if not first:
+                return conditions, params, 0, None, None, anchors
+            key = first[0]
+        if key is not None:
+            condition, key_params = seek_condition(order.sort_key, key, order.descending)
+            conditions.append(condition)
+            params = params + key_params
+
+        query = (f"SELECT COUNT(*) AS total FROM (SELECT 1 FROM Patients{self._where(conditions)}"
+                 f" ORDER BY {sort_order(order.sort_key, order.descending)} LIMIT %s) AS page_rows")
+        with self.db_connection.session() as cursor:
+            cursor.execute(query, params + [order.rows_per_page + 1])
+            count = int(cursor.fetchone()["total"])
+
+        next_key = None
+        if count > order.rows_per_page:
+            next_key = self._select_keys(order, conditions, params, 1, order.rows_per_page)[0]
+        return conditions, params, min(count, order.rows_per_page), key, next_key, anchors
+
+    def fetch_rows(self, conditions, params, sort_key, descending, start, stop, anchor=None):
+        """
+        Returns rows start to stop of a located page as tuples. Runs on a worker thread.
+
+        With an anchor, the (index, row) of a row already fetched before start, the rows are
+        read by seeking past that row's key and skipping only the rows between them, which is
+        none when the table scrolls block by block. Without one they are skipped from the start
+        of the page.
+        """
+        offset = start
+        if anchor is not None:
+            index, row = anchor
+            key = (row[self.columns.index(sort_key)], row[0])
+            condition, key_params = seek_condition(sort_key, key, descending, inclusive=False)
+            conditions, params = conditions + [condition], params + key_params
+            offset = start - index - 1
+
+        query = f"""
+            SELECT patient_id, usmer, medical_unit, sex, patient_type, date_died, intubed, pneumonia,
+                   age, pregnant, diabetes, copd, asthma, inmsupr, hipertension, other_disease,
+                   cardiovascular, obesity, renal_chronic, tobacco, classification_final, icu
+            FROM Patients{self._where(conditions)}
+            ORDER BY {sort_order(sort_key, descending)} LIMIT %s OFFSET %s
+        """
+        with self.db_connection.session(dictionary=False) as cursor:
+            cursor.execute(query, params + [stop - start, offset])
+            return cursor.fetchall()
+
+    def load_anchors(self, order):
+        """
+        Returns (anchor keys, total rows) of a PageOrder's filter and order, computing both in one
+        scan. Runs on a worker thread; the view caches the result per filter and order.
+        """
+        sql, params = order.filters.compile() if order.filters else ("", [])
+        query = f"""
+            SELECT sort_value, patient_id, total
+            FROM (
+                SELECT {order.sort_key} AS sort_value, patient_id,
+                       ROW_NUMBER() OVER (ORDER BY {sort_order(order.sort_key, order.descending)}) AS position,
+                       COUNT(*) OVER () AS total
+                FROM Patients
+                {f"WHERE {sql}" if sql else ""}
+            ) AS numbered
+            WHERE MOD(position - 1, %s) = 0
+            ORDER BY position
+        """
+        with self.db_connection.session() as cursor:
+            cursor.execute(query, params + [ANCHOR_STRIDE])
+            rows = cursor.fetchall()
+        return [(row["sort_value"], row["patient_id"]) for row in rows], int(rows[0]["total"]) if rows else 0
+
+    def with_total_rows(self, then):
+        """
+        Calls then() on the Tk thread once total_rows is known for the current filter and order,
+        counting on a worker when it is not cached.
+        """
+        if not self.filters and self.patient_store is not None and self.patient_store.ready:
+            self.total_rows = self.patient_store.row_count
+            then()
+            return
+        order = self._page_order()
+        anchors = self._anchors.get(order[:3])
+        if anchors is not None:
+            self.total_rows = anchors[1]
+            then()
+            return
+
+        generation = self._generation
+
+        def counted(anchors):
+            if generation != self._generation:
+                return
+            self._anchors[order[:3]] = anchors
+            self.total_rows = anchors[1]
+            then()
+
+        self.page_label.config(text=f"Page {self.current_page} (counting rows...)")
+        self.jobs.submit("count rows", self.load_anchors, order, on_success=counted, on_error=self._on_load_error)
+
+    @property
+    def total_pages(self):
+        if self.total_rows is None:
+            return None
+        return max((self.total_rows + self.rows_per_page - 1) // self.rows_per_page, 1)
 
     def update_pagination_controls(self):
-        self.page_label.config(text=f"Page {self.current_page}")
-        self.previous_button.config(state="normal" if self.current_page > 1 else "disabled")
-        total_pages = (self.total_rows + self.rows_per_page - 1) // self.rows_per_page
-        self.next_button.config(state="normal" if self.current_page < total_pages else "disabled")
+        if self.total_pages is None:
+            self.page_label.config(text=f"Page {self.current_page}")
+        else:
+            self.page_label.config(text=f"Page {self.current_page} of {self.total_pages}")
+        back = "normal" if self.current_page > 1 else "disabled"
+        forward = "normal" if self.has_next else "disabled"
+        self.first_button.config(state=back)
+        self.previous_button.config(state=back)
+        self.next_button.config(state=forward)
+        self.last_button.config(state=forward)
+
+    def go_to_page(self, page):
+        self.current_page = page
+        self.load_data()
+
+    def first_page(self):
+        self.go_to_page(1)
 
     def previous_page(self):
         if self.current_page > 1:
-            self.current_page -= 1
-            self.load_data()
+            self.go_to_page(self.current_page - 1)
 
     def next_page(self):
-        total_pages = (self.total_rows + self.rows_per_page - 1) // self.rows_per_page
-        if self.current_page < total_pages:
-            self.current_page += 1
-            self.load_data()
+        if self.has_next:
+            self.go_to_page(self.current_page + 1)
 
-    def perform_search(self):
-        search_field = self.search_field.get().lower()
-        search_term = self.search_entry.get()
-
-        if search_term.isdigit():
-            filters = f"{search_field} = {search_term}"
-        else:
-            filters = f"{search_field} LIKE '%{search_term}%'"
+    def last_page(self):
+        self.with_total_rows(lambda: self.go_to_page(self.total_pages))
 
+    def jump_to_page(self):
+        try:
+            page = int(self.page_entry.get())
+        except ValueError:
+            ttk.Messagebox.show_error(title="Error", message="Please enter a valid page number.")
+            return
+        self.with_total_rows(lambda: self.go_to_page(min(max(page, 1), self.total_pages)))
+
+    def perform_search(self, refine=False):
+        """
+        Filters by the entered predicate; with refine=True it is added to the current filter instead.
+        """
+        column = self.search_columns[self.search_field.get()]
+        try:
+            predicate = SEARCH_OPERATORS[self.search_operator.get()](column, self.search_entry.get())
+        except ValueError as e:
+            ttk.Messagebox.show_error(title="Error", message=f"Invalid search value: {e}")
+            return
+
+        filters = PatientFilter([predicate])
+        self.set_filters(self.filters + filters if refine else filters)
+
+    def reset_search(self):
+        self.search_entry.delete(0, "end")
+        self.set_filters(PatientFilter())
+
+    def set_filters(self, filters):
+        self.filters = filters
+        self.filter_label.config(text=f"Filter: {filters.describe()}" if filters else "No filter")
+        self._page_keys = {}
         self.current_page = 1
-        self.load_data(filters)
+        self.load_data()
 
     def update_rows_per_page(self):
         try:
-            self.rows_per_page = int(self.rows_per_page_entry.get())
+            rows_per_page = int(self.rows_per_page_entry.get())
+            if rows_per_page < 1:
+                raise ValueError
+            self.rows_per_page = rows_per_page
+            self._page_keys = {}
             self.current_page = 1
             self.load_data()
         except ValueError:
             ttk.Messagebox.show_error(title="Error", message="Please enter a valid number for rows per page.")
 
-    def sort_column(self, column):
-        rows = [(self.table.set(k, column), k) for k in self.table.get_children("")]
-        rows.sort(key=lambda x: x[0])
+    def sort_by(self, column):
+        """
+        Sorts every page by a column, in the query itself; clicking the same header again reverses it.
+        Only the SORT_INDEXES columns, whose order an index serves, can be sorted by.
+        """
+        if column not in SORT_INDEXES:
+            return
+        if column == self.sort_key:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_key = column
+            self.sort_descending = False
+
+        for col in self.columns:
+            display_name = col.replace("_", " ").title()
+            if col == self.sort_key:
+                display_name += " ▼" if self.sort_descending else " ▲"
+            self.table.heading(col, text=display_name)
 
-        for index, (_, k) in enumerate(rows):
-            self.table.move(k, "", index)
+        self._page_keys = {}
+        self.current_page = 1
+        self.load_data()
 
     def refresh_data(self):
         self.load_data()
\ No newline at end of file
@@ -1,10 +1,16 @@
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from privacy.differential_privacy import apply_differential_privacy
-import matplotlib.pyplot as plt
+from database.queries import DYNAMIC_QUERIES
+from privacy.differential_privacy import apply_differential_privacy, apply_differential_privacy_batch
+from utils.jobs import JobRunner
+from matplotlib import style
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from datetime import datetime
+from datetime import date, datetime
 from tkinter import simpledialog  # Import simpledialog from tkinter
+import threading
+
+style.use('ggplot')
 
 class DynamicAnalysisView(ttk.Frame):
     def __init__(self, parent, mainWindow, db_connection):
@@ -12,7 +18,12 @@ class DynamicAnalysisView(ttk.Frame):
         self.mainWindow = mainWindow
         self.db_connection = db_connection
         self.current_canvas = None
+        self._job_state = threading.local()
         self.epsilon = 1.0
+        self.range_index = mainWindow.range_index
+        self.jobs = JobRunner(self)
+        self.jobs.add_listener(self._on_jobs_changed)
+        self.bind("<Destroy>", self._on_destroy, add="+")
 
         self.grid_columnconfigure(0, weight=1)
         self.grid_columnconfigure(1, weight=1)
@@ -43,6 +54,38 @@ class DynamicAnalysisView(ttk.Frame):
         ]
         self.analysis_var = ttk.StringVar(value=self.analysis_options[0])
 
+        # The inputs each analysis prompts for, collected on the Tk thread before it is queued.
+        self.analysis_inputs = {
+            "Age and Patient Type Analysis": (
+                self.perform_age_patient_type_analysis,
+                [("Enter minimum age:", int),
+                 ("Enter maximum age:", int),
+                 ("Enter patient type (1 for home, 2 for hospitalization):", int)]
+            ),
+            "Disease and Classification Analysis": (
+                self.perform_disease_classification_analysis,
+                [("Enter diabetes status (1 for yes, 2 for no):", int),
+                 ("Enter obesity status (1 for yes, 2 for no):", int),
+                 ("Enter cardiovascular status (1 for yes, 2 for no):", int)]
+            ),
+            "Gender and Tobacco Analysis": (
+                self.perform_gender_tobacco_analysis,
+                [("Enter gender (1 for female, 2 for male):", int),
+                 ("Enter tobacco status (1 for yes, 2 for no):", int)]
+            ),
+            "Death Count Analysis": (
+                self.perform_death_count_analysis,
+                [("Enter start date (YYYY-MM-DD):", date.fromisoformat),
+                 ("Enter end date (YYYY-MM-DD):", date.fromisoformat)]
+            ),
+            "ICU and Comorbidity Analysis": (
+                self.perform_icu_comorbidity_analysis,
+                [("Enter pneumonia status (1 for yes, 2 for no):", int),
+                 ("Enter immunosuppressed status (1 for yes, 2 for no):", int),
+                 ("Enter chronic renal status (1 for yes, 2 for no):", int)]
+            ),
+        }
+
         control_frame = ttk.Frame(self)
         control_frame.grid(row=1, column=0, sticky="nsew", pady=(0, 20))
 
@@ -97,6 +140,23 @@ class DynamicAnalysisView(ttk.Frame):
         )
         run_button.pack(pady=(0, 10))
 
+        cancel_button = ttk.Button(
+            control_frame,
+            text="Cancel",
+            command=self.cancel_analyses,
+            bootstyle="danger-outline",
+            width=20
+        )
+        cancel_button.pack(pady=(0, 10))
+
+        self.progress = ttk.Progressbar(
+            control_frame,
+            mode='indeterminate',
+            bootstyle="primary",
+            length=200
+        )
+        self.progress.pack(pady=(0, 10))
+        self.progress.pack_forget()
 
         results_frame = ttk.LabelFrame(
             self,
@@ -145,59 +205,103 @@ class DynamicAnalysisView(ttk.Frame):
         """Callback to update the epsilon label whenever the slider moves."""
         self.epsilon_value_label.config(text=str(self.epsilon_var.get()))
 
+    @property
+    def epsilon(self):
+        """The ε of the analysis running on the calling worker thread, or of the last one started."""
+        return getattr(self._job_state, "epsilon", self._epsilon)
+
+    @epsilon.setter
+    def epsilon(self, value):
+        self._epsilon = value
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self.jobs.shutdown()
+
+    def _on_jobs_changed(self, active_count):
+        if active_count:
+            self.progress.pack()
+            self.progress.start()
+            self.status_label.configure(text=f"Running {active_count} analysis job(s)...", bootstyle="secondary")
+        else:
+            self.progress.stop()
+            self.progress.pack_forget()
+
+    def _clear_results(self):
+        self.result_text.delete(1.0, "end")
+        for widget in self.graph_frame.winfo_children():
+            widget.destroy()
+
+    def _analysis_job(self, perform, inputs, epsilon):
+        """Runs one analysis on a worker thread and returns its result with the figures it built."""
+        self._job_state.epsilon = epsilon
+        self._job_state.figures = []
+        try:
+            return perform(*inputs), self._job_state.figures
+        finally:
+            self._job_state.__dict__.clear()
+
     def run_analysis(self):
         self.epsilon = float(self.epsilon_var.get())
         selected_analysis = self.analysis_var.get()
 
-        self.result_text.delete(1.0, "end")
-        for widget in self.graph_frame.winfo_children():
-            widget.destroy()
+        if selected_analysis not in self.analysis_inputs:
+            self._clear_results()
+            self.result_text.insert("end", "Invalid Analysis Selected")
+            return
+
+        perform, prompts = self.analysis_inputs[selected_analysis]
         try:
-            if selected_analysis == "Age and Patient Type Analysis":
-                result = self.perform_age_patient_type_analysis()
-            elif selected_analysis == "Disease and Classification Analysis":
-                result = self.perform_disease_classification_analysis()
-            elif selected_analysis == "Gender and Tobacco Analysis":
-                result = self.perform_gender_tobacco_analysis()
-            elif selected_analysis == "Death Count Analysis":
-                result = self.perform_death_count_analysis()
-            elif selected_analysis == "ICU and Comorbidity Analysis":
-                result = self.perform_icu_comorbidity_analysis()
-            else:
-                result = "Invalid Analysis Selected"
+            inputs = [self.get_input(prompt, input_type) for prompt, input_type in prompts]
+        except Exception as e:
+            self._show_error(e)
+            return
+
+        if not self.mainWindow.update_privacy_budget(self.epsilon):
+            self._clear_results()
+            self.result_text.insert("end", "Privacy budget exceeded. Please reduce the epsilon value.")
+            return
+
+        epsilon = self.epsilon
 
+        def show(outcome):
+            result, figures = outcome
+            self._clear_results()
             self.result_text.insert("end", str(result))
+            for fig in figures:
+                self._render_figure(fig)
             self.status_label.configure(
-                text=f"Analysis completed successfully (ε={self.epsilon:.2f})",
+                text=f"Analysis completed successfully (ε={epsilon:.2f})",
                 bootstyle="success"
             )
 
-        except Exception as e:
-            self.result_text.insert("end", f"Error: {str(e)}")
-            self.status_label.configure(
-                text="Error occurred during analysis",
-                bootstyle="danger"
-            )
+        self.jobs.submit(
+            selected_analysis, self._analysis_job, perform, inputs, epsilon,
+            on_success=show, on_error=self._show_error
+        )
 
+    def cancel_analyses(self):
+        """Cancels every queued or running analysis; running ones finish in the background unseen."""
+        self.jobs.cancel_all()
+        self.status_label.configure(text="Analysis cancelled", bootstyle="warning")
+
+    def _show_error(self, error):
+        self._clear_results()
+        self.result_text.insert("end", f"Error: {str(error)}")
+        self.status_label.configure(
+            text="Error occurred during analysis",
+            bootstyle="danger"
+        )
 
-    def perform_age_patient_type_analysis(self):
+    def perform_age_patient_type_analysis(self, min_age, max_age, patient_type):
         """Query: Age and Patient Type Analysis"""
-        min_age = self.get_input("Enter minimum age:", int)
-        max_age = self.get_input("Enter maximum age:", int)
-        patient_type = self.get_input("Enter patient type (1 for home, 2 for hospitalization):", int)
-
-        if not self.mainWindow.update_privacy_budget(self.epsilon):
-            return "Privacy budget exceeded. Please reduce the epsilon value."
-
-        query = f"""
-        SELECT 
-            COUNT(*) AS Patient_Count
-        FROM Patients
-        WHERE AGE BETWEEN {min_age} AND {max_age}
-          AND PATIENT_TYPE = {patient_type};
-        """
-        self.db_connection.execute_query(query)
-        result = self.db_connection.cursor.fetchone()
+        query = DYNAMIC_QUERIES["age_patient_type"]
+        count = self.range_index.count_ages(min_age, max_age, patient_type)
+        if count is not None:
+            result = {"Patient_Count": count}
+        else:
+            rows = self.db_connection.execute_prepared(query, (min_age, max_age, patient_type))
+            result = rows[0] if rows else None
 
         if not result:
             return "No data available for the given criteria."
@@ -207,10 +311,12 @@ class DynamicAnalysisView(ttk.Frame):
             [result["Patient_Count"]],
             mechanism="Laplace",
             epsilon=self.epsilon,
-            query=query
+            query=query,
+            output="Patient_Count"
         )[0]
 
-        fig, ax = plt.subplots(figsize=(4, 4))
+        fig = Figure(figsize=(4, 4))
+        ax = fig.subplots()
         ax.bar(
             [f"Age {min_age}-{max_age}"],
             [dp_result],
@@ -226,44 +332,29 @@ class DynamicAnalysisView(ttk.Frame):
 
         return f"Patient Count (ε={self.epsilon:.2f}): {dp_result}"
 
-    def perform_disease_classification_analysis(self):
+    def perform_disease_classification_analysis(self, diabetes, obesity, cardio):
         """Query: Disease and Classification Analysis"""
-        diabetes = self.get_input("Enter diabetes status (1 for yes, 2 for no):", int)
-        obesity = self.get_input("Enter obesity status (1 for yes, 2 for no):", int)
-        cardio = self.get_input("Enter cardiovascular status (1 for yes, 2 for no):", int)
-        if not self.mainWindow.update_privacy_budget(self.epsilon):
-            return "Privacy budget exceeded. Please reduce the epsilon value."
-
-        query = f"""
-        SELECT 
-            CASE 
-                WHEN classification_final BETWEEN 1 AND 3 THEN classification_final
-                ELSE 4  -- Group all classifications >= 4 as "Non-COVID"
-            END AS classification_group,
-            COUNT(*) AS Patient_Count
-        FROM Patients
-        WHERE (DIABETES = {diabetes} OR OBESITY = {obesity} OR CARDIOVASCULAR = {cardio})
-        GROUP BY classification_group
-        ORDER BY classification_group;
-        """
-        self.db_connection.execute_query(query)
-        results = self.db_connection.cursor.fetchall()
+        query = DYNAMIC_QUERIES["disease_classification"]
+        results = self.db_connection.execute_prepared(query, (diabetes, obesity, cardio))
 
         if not results:
             return "No data available for the given criteria."
 
+        noisy_counts = apply_differential_privacy_batch(
+            self.db_connection,
+            [row["Patient_Count"] for row in results],
+            mechanism="Laplace",
+            epsilon=self.epsilon,
+            query=query,
+            output="Patient_Count"
+        )
         dp_results = {
-            row["classification_group"]: apply_differential_privacy(
-                self.db_connection,
-                [row["Patient_Count"]],
-                mechanism="Laplace",
-                epsilon=self.epsilon,
-                query=query
-            )[0]
-            for row in results
+            row["classification_group"]: noisy_count
+            for row, noisy_count in zip(results, noisy_counts)
         }
 
-        fig, ax = plt.subplots(figsize=(6, 4))
+        fig = Figure(figsize=(6, 4))
+        ax = fig.subplots()
 
         classification_labels = {
             1: "COVID Level 1",
@@ -302,27 +393,11 @@ class DynamicAnalysisView(ttk.Frame):
 
         return dp_results
 
-    def perform_gender_tobacco_analysis(self):
+    def perform_gender_tobacco_analysis(self, sex, tobacco):
         """Query: Gender and Tobacco Analysis"""
-        sex = self.get_input("Enter gender (1 for female, 2 for male):", int)
-        tobacco = self.get_input("Enter tobacco status (1 for yes, 2 for no):", int)
-
-        if not self.mainWindow.update_privacy_budget(self.epsilon):
-            return "Privacy budget exceeded. Please reduce the epsilon value."
-
-        query = f"""
-        SELECT 
-            SEX,
-            COUNT(*) AS Total_Patients,
-            SUM(CASE WHEN ICU = 1 THEN 1 ELSE 0 END) AS ICU_Admissions,
-            (SUM(CASE WHEN ICU = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*)) AS ICU_Rate
-        FROM Patients
-        WHERE SEX = {sex}
-          AND TOBACCO = {tobacco}
-        GROUP BY SEX;
-        """
-        self.db_connection.execute_query(query)
-        result = self.db_connection.cursor.fetchone()
+        query = DYNAMIC_QUERIES["gender_tobacco"]
+        rows = self.db_connection.execute_prepared(query, (sex, tobacco))
+        result = rows[0] if rows else None
 
         if not result:
             return "No data available for the given criteria."
@@ -331,22 +406,18 @@ class DynamicAnalysisView(ttk.Frame):
         icu_admissions = float(result["ICU_Admissions"])
         icu_rate = float(result["ICU_Rate"])
 
-        dp_total = apply_differential_privacy(
+        dp_values = apply_differential_privacy_batch(
             self.db_connection,
-            [total_patients],
+            {"Total_Patients": total_patients, "ICU_Admissions": icu_admissions},
             mechanism="Laplace",
             epsilon=self.epsilon,
             query=query
-        )[0]
-        dp_icu = apply_differential_privacy(
-            self.db_connection,
-            [icu_admissions],
-            mechanism="Laplace",
-            epsilon=self.epsilon,
-            query=query
-        )[0]
+        )
+        dp_total = dp_values["Total_Patients"]
+        dp_icu = dp_values["ICU_Admissions"]
 
-        fig, ax = plt.subplots(figsize=(4, 4))
+        fig = Figure(figsize=(4, 4))
+        ax = fig.subplots()
         categories = ["Total Patients", "ICU Admissions"]
         values = [dp_total, dp_icu]
 
@@ -369,22 +440,15 @@ class DynamicAnalysisView(ttk.Frame):
             "ICU Rate": icu_rate
         }
 
-    def perform_death_count_analysis(self):
+    def perform_death_count_analysis(self, start_date, end_date):
         """Query: Death Count Analysis"""
-        start_date = self.get_input("Enter start date (YYYY-MM-DD):", str)
-        end_date = self.get_input("Enter end date (YYYY-MM-DD):", str)
-
-        if not self.mainWindow.update_privacy_budget(self.epsilon):
-            return "Privacy budget exceeded. Please reduce the epsilon value."
-
-        query = f"""
-        SELECT 
-            COUNT(*) AS Deaths
-        FROM Patients
-        WHERE DATE_DIED BETWEEN '{start_date}' AND '{end_date}';
-        """
-        self.db_connection.execute_query(query)
-        result = self.db_connection.cursor.fetchone()
+        query = DYNAMIC_QUERIES["death_count"]
+        count = self.range_index.count_deaths(start_date, end_date)
+        if count is not None:
+            result = {"Deaths": count}
+        else:
+            rows = self.db_connection.execute_prepared(query, (start_date, end_date, start_date, end_date))
+            result = rows[0] if rows else None
 
         if not result:
             return "No data available for the given criteria."
@@ -394,11 +458,12 @@ class DynamicAnalysisView(ttk.Frame):
             [result["Deaths"]],
             mechanism="Laplace",
             epsilon=self.epsilon,
-            query=query
+            query=query,
+            output="Deaths"
         )[0]
 
-        import matplotlib.pyplot as plt
-        fig, ax = plt.subplots(figsize=(4, 4))
+        fig = Figure(figsize=(4, 4))
+        ax = fig.subplots()
 
         ax.bar(["Deaths"], [dp_result], color='#3498db', edgecolor='black')
 
@@ -414,45 +479,29 @@ class DynamicAnalysisView(ttk.Frame):
 
         return f"Death Count (ε={self.epsilon:.2f}) for Date Range: {start_date} to {end_date}: {dp_result}"
 
-    def perform_icu_comorbidity_analysis(self):
+    def perform_icu_comorbidity_analysis(self, pneumonia, immunosuppressed, renal_chronic):
         """Query: ICU and Comorbidity Analysis"""
-        pneumonia = self.get_input("Enter pneumonia status (1 for yes, 2 for no):", int)
-        immunosuppressed = self.get_input("Enter immunosuppressed status (1 for yes, 2 for no):", int)
-        renal_chronic = self.get_input("Enter chronic renal status (1 for yes, 2 for no):", int)
-
-        if not self.mainWindow.update_privacy_budget(self.epsilon):
-            return "Privacy budget exceeded. Please reduce the epsilon value."
-
-        query = f"""
-        SELECT 
-            ICU,
-            COUNT(*) AS Patient_Count
-        FROM Patients
-        WHERE PNEUMONIA = {pneumonia}
-          AND INMSUPR = {immunosuppressed}
-          AND RENAL_CHRONIC = {renal_chronic}
-          AND ICU NOT IN (97, 99)  
-        GROUP BY ICU;
-        """
-        self.db_connection.execute_query(query)
-        results = self.db_connection.cursor.fetchall()
+        query = DYNAMIC_QUERIES["icu_comorbidity"]
+        results = self.db_connection.execute_prepared(query, (pneumonia, immunosuppressed, renal_chronic))
 
         if not results:
             return "No data available for the given criteria."
 
+        noisy_counts = apply_differential_privacy_batch(
+            self.db_connection,
+            [row["Patient_Count"] for row in results],
+            mechanism="Laplace",
+            epsilon=self.epsilon,
+            query=query,
+            output="Patient_Count"
+        )
         dp_results = {
-            "ICU Admitted" if row["ICU"] == 1 else "Not Admitted to ICU": apply_differential_privacy(
-                self.db_connection,
-                [row["Patient_Count"]],
-                mechanism="Laplace",
-                epsilon=self.epsilon,
-                query=query
-            )[0]
-            for row in results
+            "ICU Admitted" if row["ICU"] == 1 else "Not Admitted to ICU": noisy_count
+            for row, noisy_count in zip(results, noisy_counts)
         }
 
-        import matplotlib.pyplot as plt
-        fig, ax = plt.subplots(figsize=(4, 4))
+        fig = Figure(figsize=(4, 4))
+        ax = fig.subplots()
 
         icu_categories = list(dp_results.keys())
         noisy_counts = list(dp_results.values())
@@ -477,10 +526,17 @@ class DynamicAnalysisView(ttk.Frame):
 
     def display_graph(self, fig):
         """Displays a matplotlib graph in the graph frame with modern styling."""
+        figures = getattr(self._job_state, "figures", None)
+        if figures is not None:
+            # Called from a worker thread; the figure is rendered once the job reports back.
+            figures.append(fig)
+            return
+        self._render_figure(fig)
+
+    def _render_figure(self, fig):
         for widget in self.graph_frame.winfo_children():
             widget.destroy()
 
-        plt.style.use('ggplot')
         fig.patch.set_facecolor('#2e2e2e')
 
         for ax in fig.axes:
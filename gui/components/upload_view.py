@@ -1,11 +1,31 @@
+import threading
 from tkinter import ttk, messagebox, filedialog
 import pandas as pd
 
+from database.initializer import (
+    CSV_CHUNK_SIZE, MISSING_DATE, PATIENT_CSV_COLUMNS, bulk_insert_patients, convert_patient_frame, scan_file
+)
+from utils.jobs import JobRunner
+
+# Header spellings accepted for a column in addition to its canonical name.
+COLUMN_ALIASES = {
+    'CLASIFFICATION_FINAL': 'CLASSIFICATION_FINAL',
+}
+# Milliseconds between refreshes of the progress bar while an upload runs
+PROGRESS_INTERVAL = 100
+
 
 class UploadView(ttk.Frame):
     def __init__(self, parent, db_connection):
         super().__init__(parent)
         self.db_connection = db_connection
+        self.total_rows = 0
+        # Written by the upload job, read by the progress poll on the Tk thread.
+        self._progress = None
+        self._progress_id = None
+        self._cancel = threading.Event()
+        self.jobs = JobRunner(self, max_workers=1)
+        self.bind("<Destroy>", self._on_destroy, add="+")
         self.setup_ui()
 
     def setup_ui(self):
@@ -16,8 +36,10 @@ class UploadView(ttk.Frame):
             "Ensure the uploaded CSV file has the following columns:\n"
             "USMER, MEDICAL_UNIT, SEX, PATIENT_TYPE, DATE_DIED, INTUBED, PNEUMONIA, AGE, PREGNANT, DIABETES, "
             "COPD, ASTHMA, INMSUPR, HIPERTENSION, OTHER_DISEASE, CARDIOVASCULAR, OBESITY, RENAL_CHRONIC, "
-            "TOBACCO, CLASIFFICATION_FINAL, ICU\n\n"
-            "Column names are case-insensitive but must match exactly. Missing or invalid data will cause errors."
+            "TOBACCO, CLASSIFICATION_FINAL, ICU\n\n"
+            "Column names are case-insensitive but must match exactly. Empty cells are stored as missing values "
+            f"and a DATE_DIED of {MISSING_DATE} marks a survivor. A file with any other invalid value, such as a "
+            "malformed date or a non-integer code, is rejected before any row is inserted."
         )
 
         disclaimer_label = ttk.Label(
@@ -28,9 +50,29 @@ class UploadView(ttk.Frame):
         upload_frame = ttk.LabelFrame(self, text="Upload CSV", padding=10)
         upload_frame.pack(fill="x", padx=10, pady=10)
 
-        ttk.Button(
+        self.select_button = ttk.Button(
             upload_frame, text="Select CSV File", command=self.upload_csv
-        ).pack(side="left", padx=10, pady=5)
+        )
+        self.select_button.pack(side="left", padx=10, pady=5)
+
+        self.cancel_button = ttk.Button(
+            upload_frame, text="Cancel", command=self.cancel_upload, state="disabled"
+        )
+        self.cancel_button.pack(side="left", padx=10, pady=5)
+
+        self.progress = ttk.Progressbar(upload_frame, orient="horizontal", mode="determinate", length=300)
+        self.progress.pack(side="left", padx=10, pady=5)
+
+        self.status_label = ttk.Label(upload_frame, text="")
+        self.status_label.pack(side="left", padx=10, pady=5)
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self._cancel.set()
+            if self._progress_id is not None:
+                self.after_cancel(self._progress_id)
+                self._progress_id = None
+            self.jobs.shutdown()
 
     def upload_csv(self):
         file_path = filedialog.askopenfilename(
@@ -40,59 +82,117 @@ class UploadView(ttk.Frame):
             return
 
         try:
-            data = pd.read_csv(file_path)
-            print(f"Dataset loaded successfully with {len(data)} rows.")
-
-            if self.validate_and_insert_data(data):
-                messagebox.showinfo("Success", f"Data uploaded successfully with {len(data)} rows.")
-                print(f"Data uploaded successfully with {len(data)} rows.")
-
-                if hasattr(self.master, 'data_view') and hasattr(self.master.data_view, 'refresh_data'):
-                    self.master.data_view.refresh_data()
+            header = pd.read_csv(file_path, nrows=0).columns
         except Exception as e:
             messagebox.showerror("Error", f"Failed to upload data: {str(e)}")
             print(f"Error: {str(e)}")
+            return
 
-    def validate_and_insert_data(self, data):
-        required_columns = [
-            'USMER', 'MEDICAL_UNIT', 'SEX', 'PATIENT_TYPE', 'DATE_DIED', 'INTUBED',
-            'PNEUMONIA', 'AGE', 'PREGNANT', 'DIABETES', 'COPD', 'ASTHMA', 'INMSUPR',
-            'HIPERTENSION', 'OTHER_DISEASE', 'CARDIOVASCULAR', 'OBESITY', 'RENAL_CHRONIC',
-            'TOBACCO', 'CLASIFFICATION_FINAL', 'ICU'
-        ]
-
-        data.columns = data.columns.str.upper()
-
-        missing_columns = set(required_columns) - set(data.columns)
+        renames = {column: COLUMN_ALIASES.get(column.upper(), column.upper()) for column in header}
+        missing_columns = set(PATIENT_CSV_COLUMNS) - set(renames.values())
         if missing_columns:
             messagebox.showerror("Validation Error", f"Missing columns: {', '.join(missing_columns)}")
             print(f"Validation Error: Missing columns: {', '.join(missing_columns)}")
-            return False
-
-        if 'DATE_DIED' in data.columns:
-            try:
-                data['DATE_DIED'] = pd.to_datetime(
-                    data['DATE_DIED'], format='%d/%m/%Y', errors='coerce'
-                ).dt.strftime('%Y-%m-%d')
-            except Exception as e:
-                messagebox.showerror("Date Conversion Error", f"Failed to convert dates: {str(e)}")
-                print(f"Date Conversion Error: {str(e)}")
-                return False
+            return
 
-        try:
-            query = """
-                INSERT INTO Patients (
-                    usmer, medical_unit, sex, patient_type, date_died, intubed,
-                    pneumonia, age, pregnant, diabetes, copd, asthma, inmsupr,
-                    hipertension, other_disease, cardiovascular, obesity, renal_chronic,
-                    tobacco, classification_final, icu
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            for _, row in data.iterrows():
-                self.db_connection.execute_query(query, tuple(row[col] for col in required_columns))
-
-            return True
-        except Exception as e:
-            messagebox.showerror("Database Error", f"Failed to insert data: {str(e)}")
-            print(f"Database Error: {str(e)}")
-            return False
+        self._cancel.clear()
+        self._progress = None
+        self.total_rows = 0
+        self.progress['value'] = 0
+        self.status_label.config(text="Validating...")
+        self.select_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+        self.jobs.submit(
+            "upload", self.validate_and_insert_data, file_path, renames,
+            on_success=self._on_upload_done, on_error=self._on_upload_error
+        )
+        self._poll_progress()
+
+    def cancel_upload(self):
+        """Stops the upload after the chunk being inserted; the chunks already inserted are kept."""
+        self._cancel.set()
+        self.status_label.config(text="Cancelling...")
+
+    def _poll_progress(self):
+        self._progress_id = None
+        if self._progress is not None:
+            self.update_progress(*self._progress)
+        if self.jobs.active_jobs:
+            self._progress_id = self.after(PROGRESS_INTERVAL, self._poll_progress)
+
+    def _finish_upload(self):
+        if self._progress_id is not None:
+            self.after_cancel(self._progress_id)
+            self._progress_id = None
+        self.select_button.config(state="normal")
+        self.cancel_button.config(state="disabled")
+
+    def _on_upload_done(self, inserted):
+        self._finish_upload()
+        self.update_progress(inserted, self._progress[1] if self._progress else 0)
+        if self._cancel.is_set():
+            messagebox.showinfo("Upload Cancelled", f"Upload cancelled after {inserted} rows.")
+            print(f"Upload cancelled after {inserted} rows.")
+        else:
+            messagebox.showinfo("Success", f"Data uploaded successfully with {inserted} rows.")
+            print(f"Data uploaded successfully with {inserted} rows.")
+        if inserted:
+            self._refresh_data_view()
+
+    def _refresh_data_view(self):
+        if hasattr(self.master, 'data_view') and hasattr(self.master.data_view, 'refresh_data'):
+            self.master.data_view.refresh_data()
+
+    def _on_upload_error(self, error):
+        self._finish_upload()
+        if isinstance(error, ValueError):
+            self.status_label.config(text="Rejected")
+            messagebox.showerror("Validation Error", f"The file was not uploaded. {error}")
+            print(f"Validation Error: {error}")
+        else:
+            self.status_label.config(text="Failed")
+            messagebox.showerror("Database Error", f"Failed to insert data: {str(error)}")
+            print(f"Database Error: {str(error)}")
+            # Chunks committed before the failure stay in Patients.
+            self._refresh_data_view()
+
+    def update_progress(self, inserted, rows_per_second):
+        if self.total_rows:
+            self.progress['value'] = min(100.0, 100.0 * inserted / self.total_rows)
+        self.status_label.config(text=f"{inserted:,} / {self.total_rows:,} rows ({rows_per_second:,.0f} rows/s)")
+
+    def validate_and_insert_data(self, file_path, renames):
+        """
+        Validates the CSV values, then streams the file into Patients one chunk at a time.
+
+        Runs on the upload job's worker thread, so it only records progress for the Tk thread to
+        show. Only one chunk of CSV_CHUNK_SIZE rows is held in memory. A first pass converts every
+        chunk without inserting it, so a file with invalid values is rejected as a whole; the
+        second pass inserts each converted chunk in a single executemany transaction and stops
+        early once the upload is cancelled.
+
+        :param file_path: Path to the CSV file.
+        :param renames: Mapping of the file's headers to PATIENT_CSV_COLUMNS names.
+        :return: The number of rows inserted.
+        :raises ValueError: If the file holds invalid values; nothing is inserted then.
+        """
+        date_columns = {column: str for column, renamed in renames.items() if renamed == 'DATE_DIED'}
+
+        def read_chunks():
+            for chunk in pd.read_csv(file_path, chunksize=CSV_CHUNK_SIZE, dtype=date_columns):
+                if self._cancel.is_set():
+                    return
+                yield chunk.rename(columns=renames)
+
+        for chunk in read_chunks():
+            convert_patient_frame(chunk)
+        if self._cancel.is_set():
+            return 0
+
+        self.total_rows = scan_file(file_path)[1]
+        self._progress = (0, 0)
+
+        def record_progress(inserted, rows_per_second):
+            self._progress = (inserted, rows_per_second)
+
+        return bulk_insert_patients(self.db_connection, read_chunks(), progress_callback=record_progress)
@@ -0,0 +1,194 @@
+from collections import OrderedDict
+
+import ttkbootstrap as ttk
+
+# Rows fetched per background request
+BLOCK_SIZE = 200
+# Blocks kept in memory; the least recently used ones beyond this are dropped
+CACHED_BLOCKS = 20
+# Blocks fetched ahead on each side of the visible window
+PREFETCH_BLOCKS = 1
+# Milliseconds to wait for scrolling to settle before requesting blocks
+FETCH_DELAY = 30
+
+
+class VirtualTable(ttk.Frame):
+    """
+    A Treeview that shows a row source of any size through a fixed set of items.
+
+    Only ``height`` items exist; scrolling rewrites their values from cached blocks of rows. The
+    blocks under the visible window and PREFETCH_BLOCKS on each side are fetched on a JobRunner,
+    so a slow source never blocks Tk, and at most CACHED_BLOCKS blocks are held in memory. Rows
+    whose block has not arrived yet show a placeholder. The last row of every block fetched is
+    kept after the block is dropped, so a source can continue from it instead of skipping rows.
+    """
+
+    def __init__(self, parent, columns, job_runner, height=20):
+        """
+        :param columns: The column identifiers, in the order of the fetched row values.
+        :param job_runner: The JobRunner that fetches blocks.
+        :param height: Number of rows shown at once.
+        """
+        super().__init__(parent)
+        self.columns = columns
+        self.job_runner = job_runner
+        self.height = height
+        self.row_count = 0
+        self.top = 0
+        self._fetch_rows = None
+        self._blocks = OrderedDict()
+        # Block -> its last row, kept for every block fetched from the current source
+        self._last_rows = {}
+        self._pending = set()
+        self._generation = 0
+        self._fetch_id = None
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height, selectmode="browse")
+        self.y_scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.x_scrollbar = ttk.Scrollbar(self, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.x_scrollbar.set)
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.y_scrollbar.grid(row=0, column=1, sticky="ns")
+        self.x_scrollbar.grid(row=1, column=0, sticky="ew")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        self._items = [self.tree.insert("", "end") for _ in range(height)]
+        self._placeholder = ("…",) + ("",) * (len(columns) - 1)
+
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self._on_mousewheel)
+        self.tree.bind("<Prior>", lambda event: self.scroll(-self.height))
+        self.tree.bind("<Next>", lambda event: self.scroll(self.height))
+
+        self.set_source(0, None)
+
+    def heading(self, column, **options):
+        self.tree.heading(column, **options)
+
+    def column(self, column, **options):
+        self.tree.column(column, **options)
+
+    def set_source(self, row_count, fetch_rows):
+        """
+        Shows a new row source from its first row, dropping every cached and in-flight block.
+
+        :param row_count: Number of rows in the source.
+        :param fetch_rows: Callable (start, stop, anchor) -> list of row value sequences, where
+                           anchor is None or the (index, row) of the nearest fetched row before
+                           start. It runs on a worker thread, so it must not touch Tk widgets.
+        """
+        self._generation += 1
+        self.row_count = row_count
+        self._fetch_rows = fetch_rows
+        self._blocks.clear()
+        self._last_rows.clear()
+        self._pending.clear()
+        self.top = 0
+        self.render()
+
+    def scroll(self, rows):
+        self.scroll_to(self.top + rows)
+
+    def scroll_to(self, top):
+        self.top = max(0, min(int(top), self.row_count - self.height))
+        self.render()
+
+    def render(self):
+        for index, item in enumerate(self._items):
+            row_index = self.top + index
+            if row_index >= self.row_count:
+                self.tree.detach(item)
+                continue
+            block = self._blocks.get(row_index // BLOCK_SIZE)
+            values = block[row_index % BLOCK_SIZE] if block is not None else self._placeholder
+            self.tree.move(item, "", index)
+            self.tree.item(item, values=values)
+
+        if self.row_count:
+            self.y_scrollbar.set(self.top / self.row_count, min(self.top + self.height, self.row_count) / self.row_count)
+        else:
+            self.y_scrollbar.set(0, 1)
+
+        if self._fetch_id is not None:
+            self.after_cancel(self._fetch_id)
+        self._fetch_id = self.after(FETCH_DELAY, self._fetch_visible)
+
+    def _visible_blocks(self):
+        first = self.top // BLOCK_SIZE
+        last = max(self.top + self.height - 1, 0) // BLOCK_SIZE
+        return range(first, last + 1)
+
+    def _fetch_visible(self):
+        self._fetch_id = None
+        visible = self._visible_blocks()
+        wanted = list(visible)
+        for distance in range(1, PREFETCH_BLOCKS + 1):
+            wanted += [visible[0] - distance, visible[-1] + distance]
+        for block in wanted:
+            self._request_block(block)
+
+    def _request_block(self, block):
+        start = block * BLOCK_SIZE
+        if self._fetch_rows is None or block < 0 or start >= self.row_count:
+            return
+        if block in self._blocks:
+            self._blocks.move_to_end(block)
+            return
+        if block in self._pending:
+            return
+
+        self._pending.add(block)
+        generation = self._generation
+        stop = min(start + BLOCK_SIZE, self.row_count)
+        # Blocks before this one are full, so the last row of block n is row (n + 1) * BLOCK_SIZE - 1.
+        earlier = [fetched for fetched in self._last_rows if fetched < block]
+        anchor = None
+        if earlier:
+            nearest = max(earlier)
+            anchor = ((nearest + 1) * BLOCK_SIZE - 1, self._last_rows[nearest])
+        self.job_runner.submit(
+            f"rows {start}-{stop}", self._fetch_rows, start, stop, anchor,
+            on_success=lambda rows: self._on_block(generation, block, rows),
+            on_error=lambda error: self._on_block_error(generation, block, error),
+        )
+
+    def _on_block(self, generation, block, rows):
+        if generation != self._generation:
+            return
+        self._pending.discard(block)
+        self._blocks[block] = rows
+        if rows:
+            self._last_rows[block] = rows[-1]
+
+        visible = self._visible_blocks()
+        for cached in list(self._blocks):
+            if len(self._blocks) <= CACHED_BLOCKS:
+                break
+            if cached not in visible:
+                del self._blocks[cached]
+
+        if block in visible:
+            self.render()
+
+    def _on_block_error(self, generation, block, error):
+        if generation == self._generation:
+            self._pending.discard(block)
+            print(f"Error loading rows: {error}")
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.scroll_to(float(args[0]) * self.row_count)
+        elif action == "scroll":
+            amount, unit = int(args[0]), args[1]
+            self.scroll(amount * self.height if unit == "pages" else amount)
+
+    def _on_mousewheel(self, event):
+        if event.num == 4:
+            self.scroll(-3)
+        elif event.num == 5:
+            self.scroll(3)
+        elif event.delta:
+            self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
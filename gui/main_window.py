@@ -8,6 +8,9 @@ from gui.components.data_view import DataView
 from gui.components.dynamicAnalysis import DynamicAnalysisView
 from gui.components.upload_view import UploadView
 from gui.components.welcome import WelcomeTab
+from database.patient_store import PatientStore
+from database.range_index import RangeCountIndex
+from utils.jobs import JobRunner
 
 class MainWindow(ttk.Frame):
     """
@@ -25,8 +28,20 @@ class MainWindow(ttk.Frame):
         super().__init__(parent)
         self.db_connection = db_connection
         self.user_info = user_info
+        # Shared in-memory copy of Patients used by the analysis and data viewer tabs
+        self.patient_store = PatientStore(db_connection)
+        # Prefix-sum counts answering the dynamic age and death date range analyses. Built once
+        # here, off the Tk thread; uploads then add their rows to it chunk by chunk.
+        self.range_index = RangeCountIndex(db_connection)
+        self.jobs = JobRunner(self, max_workers=1)
+        self.jobs.submit("range index", self.range_index.ensure_built)
+        self.bind("<Destroy>", self._on_destroy, add="+")
         self.setup_ui()
 
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self.jobs.shutdown()
+
     def setup_ui(self):
         """
         Sets up the UI components of the main window.
@@ -96,7 +111,7 @@ class MainWindow(ttk.Frame):
             notebook.add(upload_tab, text="Upload Data")
 
             # Add data viewer tab
-            data_view_tab = DataView(notebook, self.db_connection)
+            data_view_tab = DataView(notebook, self.db_connection, self.patient_store)
             notebook.add(data_view_tab, text="Data Viewer")
 
     def _add_logout_button(self):
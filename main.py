@@ -71,6 +71,7 @@ class Application(tk.Tk):
     def on_close(self):
         """Handles application cleanup on close."""
         if self.db:
+            print(f"Connection pool usage: {self.db.pool_health()}")
             self.db.close()
         self.destroy()
 
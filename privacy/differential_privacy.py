@@ -1,74 +1,161 @@
 import numpy as np
 
-def calculate_sensitivity(db_connection, query):
-    query = query.lower().strip()
-
-    if "count" in query:
-        return 1
-    elif "sum" in query:
-        column = query.split("sum(")[1].split(")")[0]
-        max_query = f"SELECT MAX({column}) FROM Patients;"
-        db_connection.execute_query(max_query)
-        result = db_connection.cursor.fetchone()
-        return result[f"MAX({column})"] if result else 1
-    elif "avg" in query:
-        column = query.split("avg(")[1].split(")")[0]
-        max_query = f"SELECT MAX({column}) FROM Patients;"
-        db_connection.execute_query(max_query)
-        result = db_connection.cursor.fetchone()
-        return result[f"MAX({column})"] if result else 1
-    elif "group by" in query:
-        return 1
-    elif "min" in query or "max" in query:
-        column = query.split("min(")[1].split(")")[0] if "min" in query else query.split("max(")[1].split(")")[0]
-        max_query = f"SELECT MAX({column}) FROM Patients;"
-        db_connection.execute_query(max_query)
-        result = db_connection.cursor.fetchone()
-        return result[f"MAX({column})"] if result else 1
-    elif "case" in query:
-        return 1
-    elif "where" in query:
-        return 1
-    else:
-        return 1
+from privacy.query_plan import get_query_plan
+from privacy.rng import get_noise_engine
+
+
+def calculate_sensitivity(db_connection, query, output=None):
+    return get_query_plan(query).sensitivity(db_connection, output)
 
-def apply_differential_privacy(db_connection, data, mechanism="Gaussian", epsilon=2.0, utility=None, sensitivity=None, query=None):
-    if sensitivity is None and query is not None:
-        sensitivity = calculate_sensitivity(db_connection, query)
+def apply_differential_privacy(db_connection, data, mechanism="Gaussian", epsilon=2.0, utility=None, sensitivity=None,
+                               query=None, output=None, rng=None, counts=None, k=1, return_scores=False):
+    if sensitivity is None:
+        sensitivity = calculate_sensitivity(db_connection, query, output) if query is not None else 1
 
     if mechanism == "Gaussian":
-        return gaussian_mechanism(data, epsilon, sensitivity)
+        return gaussian_mechanism(data, epsilon, sensitivity, rng)
     elif mechanism == "Laplace":
-        return laplace_mechanism(data, epsilon, sensitivity)
+        return laplace_mechanism(data, epsilon, sensitivity, rng)
     elif mechanism == "ReportNoisyMax":
-        return report_noisy_max(data, epsilon, sensitivity)
+        return report_noisy_max(data, epsilon, sensitivity, rng, k, return_scores)
     elif mechanism == "Exponential":
         if utility is None:
             raise ValueError("Utility is required for Exponential mechanism.")
-        return exponential_mechanism(data, utility, epsilon, sensitivity)
+        return exponential_mechanism(data, utility, epsilon, sensitivity, rng, counts)
     else:
         raise ValueError(f"Invalid Mechanism: {mechanism}")
 
-def gaussian_mechanism(data, epsilon, sensitivity=1):
+def apply_differential_privacy_batch(db_connection, data, mechanism="Gaussian", epsilon=2.0, sensitivity=None,
+                                     query=None, output=None, rng=None):
+    """
+    Applies an additive noise mechanism to a whole batch of true answers with a single vectorized draw.
+
+    :param db_connection: The database connection instance, used to resolve the sensitivity of ``query``.
+    :param data: A sequence or NumPy array of true answers, or a dict mapping output names to such sequences.
+    :param mechanism: "Gaussian" or "Laplace".
+    :param epsilon: The privacy budget spent on every answer in the batch.
+    :param sensitivity: The sensitivity of the answers, or a dict of per-column sensitivities;
+                        resolved once from the plan of ``query`` when omitted.
+    :param query: The SQL query that produced the answers.
+    :param output: The query output the answers belong to. Dict keys naming query outputs
+                   are resolved per column.
+    :param rng: The NoiseEngine to draw from; defaults to the process-wide engine.
+    :return: A NumPy array of noisy answers, or a dict of them keyed like ``data``.
+    """
+    if sensitivity is None:
+        if query is None:
+            sensitivity = 1
+        elif isinstance(data, dict) and output is None:
+            plan = get_query_plan(query)
+            sensitivity = {
+                name: plan.sensitivity(db_connection, name if plan.has_output(name) else None)
+                for name in data
+            }
+        else:
+            sensitivity = calculate_sensitivity(db_connection, query, output)
+
+    if mechanism == "Gaussian":
+        noise_mechanism = gaussian_mechanism
+    elif mechanism == "Laplace":
+        noise_mechanism = laplace_mechanism
+    else:
+        raise ValueError(f"Batch noise is only supported for additive mechanisms, got: {mechanism}")
+
+    if not isinstance(data, dict):
+        return noise_mechanism(data, epsilon, sensitivity, rng)
+
+    columns = {name: np.asarray(values, dtype=float) for name, values in data.items()}
+    if not columns:
+        return {}
+    flat = np.concatenate([values.ravel() for values in columns.values()])
+    if isinstance(sensitivity, dict):
+        sensitivity = np.repeat(
+            [float(sensitivity[name]) for name in columns],
+            [values.size for values in columns.values()]
+        )
+    noisy = noise_mechanism(flat, epsilon, sensitivity, rng)
+
+    results = {}
+    offset = 0
+    for name, values in columns.items():
+        results[name] = noisy[offset:offset + values.size].reshape(values.shape)[()]
+        offset += values.size
+    return results
+
+def gaussian_mechanism(data, epsilon, sensitivity=1, rng=None):
+    engine = rng or get_noise_engine()
+    values = np.asarray(data, dtype=float)
     sigma = np.sqrt(2 * np.log(1.25 / 1e-5)) * sensitivity / epsilon
-    noise = np.random.normal(0, sigma, len(data))
-    return [x + n for x, n in zip(data, noise)]
+    return values + engine.normal(sigma, values.shape)
 
-def laplace_mechanism(data, epsilon, sensitivity=1):
+def laplace_mechanism(data, epsilon, sensitivity=1, rng=None):
+    engine = rng or get_noise_engine()
+    values = np.asarray(data, dtype=float)
     scale = sensitivity / epsilon
-    noise = np.random.laplace(0, scale, len(data))
-    return [x + n for x, n in zip(data, noise)]
+    return values + engine.laplace(scale, values.shape)
+
+def report_noisy_max(data, epsilon, sensitivity=1, rng=None, k=1, return_scores=False):
+    """
+    Reports the index of the largest score, or the indices of the k largest, after adding Gumbel noise.
+
+    The noise scale is 2 * k * sensitivity / epsilon, so a one-shot top-k pick costs the same
+    epsilon as k exponential-mechanism rounds at epsilon / k each. Only the reported indices are
+    epsilon-DP: a noisy score is conditioned on being among the largest and Gumbel noise has a
+    doubly-exponential tail, so the scores are not a private release. Release a chosen
+    candidate's value with a separately budgeted mechanism such as laplace_mechanism.
+
+    :param data: The true scores.
+    :param k: The number of top candidates to report.
+    :param return_scores: Also return the noisy scores of the reported candidates, for
+                          diagnostics only; they must not be shown as private answers.
+    :return: The index of the noisy maximum when k is 1 and return_scores is False, otherwise
+             a tuple of (indices, noisy_scores) ordered from highest to lowest noisy score.
+    """
+    engine = rng or get_noise_engine()
+    scores = np.asarray(data, dtype=float)
+    if scores.size == 0:
+        raise ValueError("Report Noisy Max requires at least one score.")
+
+    k = min(k, scores.size)
+    scale = 2 * k * sensitivity / epsilon
+    noisy_scores = scores + engine.gumbel(scale, scores.size) - scale * np.euler_gamma
 
-def report_noisy_max(data, epsilon, sensitivity=1):
-    noise = np.random.laplace(0, sensitivity / epsilon, len(data))
-    noisy_scores = [x + n for x, n in zip(data, noise)]
-    return noisy_scores.index(max(noisy_scores))
+    if k == 1:
+        top = np.array([np.argmax(noisy_scores)])
+    else:
+        top = np.argpartition(-noisy_scores, k - 1)[:k]
+        top = top[np.argsort(-noisy_scores[top])]
+
+    if k == 1 and not return_scores:
+        return int(top[0])
+    return top, noisy_scores[top]
+
+def exponential_mechanism(data, utility, epsilon, sensitivity=1, rng=None, counts=None):
+    """
+    Selects a candidate with probability proportional to count * exp(epsilon * utility / (2 * sensitivity)).
 
-def exponential_mechanism(data, utility, epsilon, sensitivity=1):
-    if len(data) != len(utility):
+    Sampling uses the Gumbel-max trick in log space, so no weight is ever exponentiated and
+    millions of candidates are handled by a single vectorized pass.
+
+    :param data: The candidates to choose from.
+    :param utility: The utility of each candidate.
+    :param counts: Optional multiplicity of each candidate, so duplicate candidates can be passed once.
+    :return: The selected candidate.
+    """
+    engine = rng or get_noise_engine()
+    utility = np.asarray(utility, dtype=float)
+    if len(data) != utility.size:
         raise ValueError("Data and Utility must have the same length.")
+    if utility.size == 0:
+        raise ValueError("Exponential mechanism requires at least one candidate.")
+
+    log_weights = epsilon * utility / (2 * sensitivity)
+    if counts is not None:
+        counts = np.asarray(counts, dtype=float)
+        if counts.size != utility.size:
+            raise ValueError("Counts and Utility must have the same length.")
+        with np.errstate(divide="ignore"):
+            log_weights = log_weights + np.log(counts)
 
-    scaled_utilities = [u / sensitivity for u in utility]
-    probabilities = np.exp((epsilon * np.array(scaled_utilities)) / 2)
-    probabilities /= probabilities.sum()  # Normalize
-    return np.random.choice(data, p=probabilities)
\ No newline at end of file
+    index = int(np.argmax(log_weights + engine.gumbel(1.0, utility.size)))
+    return data[index]
\ No newline at end of file
@@ -0,0 +1,210 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from database.metadata import add_table_change_listener, get_column_bounds
+
+# A single output column of an analysis query. kind is one of "count", "sum", "avg", "min", "max",
+# "derived" (an expression over several aggregates, e.g. a rate) or "group" (a grouping key or
+# plain column that is not noised).
+PlanOutput = namedtuple("PlanOutput", ["name", "kind", "column", "components", "constant_sensitivity"])
+
+_AGGREGATE_CALL = re.compile(r"\b(count|sum|avg|min|max)\s*\(", re.IGNORECASE)
+_CASE_CONSTANTS = re.compile(r"\b(?:then|else)\s+(-?\d+(?:\.\d+)?)\b", re.IGNORECASE)
+_CASE_BRANCHES = re.compile(r"\b(?:then|else)\b", re.IGNORECASE)
+_ALIAS = re.compile(r"^(?P<expression>.*?)\s+as\s+(?P<alias>\w+)$", re.IGNORECASE | re.DOTALL)
+
+_sensitivity_cache = {}
+
+
+def invalidate_sensitivity_cache(table_name=None):
+    """
+    Drops cached sensitivities so they are re-read after the underlying table changes.
+
+    :param table_name: Only drop entries for this table; drops everything when omitted.
+    """
+    if table_name is None:
+        _sensitivity_cache.clear()
+        return
+    for key in [key for key in _sensitivity_cache if key[0] == table_name.lower()]:
+        del _sensitivity_cache[key]
+
+
+add_table_change_listener(invalidate_sensitivity_cache)
+
+
+def column_sensitivity(db_connection, table_name, column, aggregate):
+    """
+    Returns the sensitivity of an aggregate over a column, cached by (table, column, aggregate).
+
+    Errors reading the bounds propagate, so the analysis fails rather than being noised with a
+    default. A column with no values yet gets a sensitivity of 1, which is not cached.
+    """
+    key = (table_name.lower(), column.strip().lower(), aggregate)
+    if key not in _sensitivity_cache:
+        bounds = get_column_bounds(db_connection, table_name, column.strip())
+        if not bounds:
+            return 1
+        _sensitivity_cache[key] = max(abs(bounds[0]), abs(bounds[1]))
+    return _sensitivity_cache[key]
+
+
+def _mask_nested(sql):
+    """Blanks out string literals and parenthesised text so top-level keywords can be searched."""
+    masked = []
+    depth = 0
+    quote = None
+    for char in sql:
+        if quote:
+            masked.append(" ")
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+            masked.append(" ")
+        elif char == "(":
+            depth += 1
+            masked.append(char if depth == 1 else " ")
+        elif char == ")":
+            masked.append(char if depth == 1 else " ")
+            depth -= 1
+        else:
+            masked.append(char if depth == 0 else " ")
+    return "".join(masked)
+
+
+def _split_top_level(text):
+    masked = _mask_nested(text)
+    parts = []
+    start = 0
+    for index, char in enumerate(masked):
+        if char == ",":
+            parts.append(text[start:index].strip())
+            start = index + 1
+    parts.append(text[start:].strip())
+    return [part for part in parts if part]
+
+
+def _call_argument(expression, open_paren):
+    depth = 0
+    for index in range(open_paren, len(expression)):
+        if expression[index] == "(":
+            depth += 1
+        elif expression[index] == ")":
+            depth -= 1
+            if depth == 0:
+                return expression[open_paren + 1:index].strip()
+    return expression[open_paren + 1:].strip()
+
+
+def _parse_output(item):
+    alias_match = _ALIAS.match(item)
+    if alias_match:
+        expression, name = alias_match.group("expression").strip(), alias_match.group("alias")
+    else:
+        expression, name = item, item
+
+    calls = [
+        (match.group(1).lower(), _call_argument(expression, match.end() - 1))
+        for match in _AGGREGATE_CALL.finditer(expression)
+    ]
+    if not calls:
+        return PlanOutput(name, "group", None, (), None)
+
+    components = []
+    for kind, argument in calls:
+        constant = None
+        if kind == "count":
+            constant = 1
+        elif kind == "sum" and argument.lower().startswith("case"):
+            constants = _CASE_CONSTANTS.findall(argument)
+            if constants and len(constants) == len(_CASE_BRANCHES.findall(argument)):
+                # A SUM over a CASE with constant branches is a (weighted) count.
+                constant = max(abs(float(value)) for value in constants)
+        components.append((kind, argument, constant))
+
+    if len(components) == 1:
+        kind, argument, constant = components[0]
+        if kind == "sum" and constant == 1:
+            kind, constant = "count", 1
+        return PlanOutput(name, kind, None if kind == "count" else argument, (), constant)
+    return PlanOutput(name, "derived", None, tuple(components), None)
+
+
+class QueryPlan:
+    """
+    The parsed shape of an analysis query: its source table, output aggregates and grouping keys.
+
+    Plans are built once per query text by get_query_plan and resolve per-output sensitivities
+    through the shared (table, column, aggregate) cache.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        sql = re.sub(r"--[^\n]*", " ", query).strip().rstrip(";")
+        masked = _mask_nested(sql)
+
+        select_match = re.search(r"\bselect\b", masked, re.IGNORECASE)
+        from_match = re.search(r"\bfrom\s+(\w+)", masked, re.IGNORECASE)
+        select_end = from_match.start() if from_match else len(sql)
+        select_start = select_match.end() if select_match else 0
+
+        self.table = from_match.group(1) if from_match else "Patients"
+        self.outputs = [_parse_output(item) for item in _split_top_level(sql[select_start:select_end])]
+        self._outputs_by_name = {output.name.lower(): output for output in self.outputs}
+
+        group_match = re.search(r"\bgroup\s+by\b", masked, re.IGNORECASE)
+        if group_match:
+            end_match = re.search(r"\b(?:having|order\s+by|limit)\b", masked[group_match.end():], re.IGNORECASE)
+            group_end = group_match.end() + end_match.start() if end_match else len(sql)
+            self.group_by = _split_top_level(sql[group_match.end():group_end])
+        else:
+            self.group_by = []
+
+    @property
+    def aggregate_kinds(self):
+        return {output.kind for output in self.outputs if output.kind != "group"}
+
+    @property
+    def noisy_outputs(self):
+        return [output for output in self.outputs if output.kind != "group"]
+
+    def has_output(self, name):
+        return name.lower() in self._outputs_by_name
+
+    def output_sensitivity(self, db_connection, output):
+        if output.kind == "group":
+            return None
+        if output.constant_sensitivity is not None:
+            return output.constant_sensitivity
+        if output.kind == "derived":
+            return max(
+                constant if constant is not None else column_sensitivity(db_connection, self.table, argument, kind)
+                for kind, argument, constant in output.components
+            )
+        return column_sensitivity(db_connection, self.table, output.column, output.kind)
+
+    def sensitivity(self, db_connection, output=None):
+        """
+        Returns the sensitivity of one output, or the largest sensitivity of all noised outputs.
+
+        :param db_connection: The database connection instance, used to look up column bounds.
+        :param output: The name (alias) of the output column being noised.
+        :return: The L1 sensitivity of the requested output.
+        """
+        if output is not None:
+            if not self.has_output(output):
+                raise ValueError(f"Query has no output named '{output}'.")
+            sensitivity = self.output_sensitivity(db_connection, self._outputs_by_name[output.lower()])
+            return 1 if sensitivity is None else sensitivity
+
+        sensitivities = [self.output_sensitivity(db_connection, output) for output in self.noisy_outputs]
+        return max(sensitivities) if sensitivities else 1
+
+
+@lru_cache(maxsize=256)
+def get_query_plan(query):
+    """
+    Parses an analysis query once and caches the resulting plan by query text.
+    """
+    return QueryPlan(query)
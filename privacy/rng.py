@@ -0,0 +1,107 @@
+import threading
+
+import numpy as np
+
+from appconfig.settings import DP_NOISE_SEED
+
+
+class NoiseEngine:
+    """
+    Source of noise for the privacy mechanisms, built on numpy.random.Generator.
+
+    Every thread draws from its own generator spawned from a single SeedSequence, so parallel
+    analyses never share state and a seeded engine is reproducible for a fixed thread layout.
+    Standard variates are pre-generated in blocks and scaled per request, which keeps small
+    draws (one value per noised cell) off the generator's per-call overhead.
+    """
+
+    _STANDARD_DRAWS = {
+        "normal": lambda generator, n: generator.standard_normal(n),
+        "laplace": lambda generator, n: generator.laplace(0.0, 1.0, n),
+        "gumbel": lambda generator, n: generator.gumbel(0.0, 1.0, n),
+    }
+
+    def __init__(self, seed=None, block_size=4096):
+        """
+        :param seed: An int seed, a numpy SeedSequence, or None for fresh OS entropy.
+        :param block_size: Number of standard variates pre-generated per block and kind.
+        """
+        self._seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def entropy(self):
+        """The root entropy, which can be passed back as a seed to reproduce a run."""
+        return self._seed_sequence.entropy
+
+    def spawn(self, count):
+        """
+        Creates independent child engines, e.g. one per worker process.
+
+        :param count: The number of engines to create.
+        :return: A list of NoiseEngine instances with non-overlapping streams.
+        """
+        with self._lock:
+            children = self._seed_sequence.spawn(count)
+        return [NoiseEngine(child, self.block_size) for child in children]
+
+    @property
+    def generator(self):
+        """The calling thread's generator, spawned on first use."""
+        generator = getattr(self._local, "generator", None)
+        if generator is None:
+            with self._lock:
+                child, = self._seed_sequence.spawn(1)
+            generator = np.random.Generator(np.random.PCG64(child))
+            self._local.generator = generator
+            self._local.blocks = {}
+        return generator
+
+    def _standard(self, kind, size):
+        generator = self.generator
+        shape = (size,) if np.isscalar(size) else tuple(size)
+        count = int(np.prod(shape))
+        draw = self._STANDARD_DRAWS[kind]
+
+        if count > self.block_size:
+            return draw(generator, count).reshape(shape)
+
+        block, position = self._local.blocks.get(kind, (None, 0))
+        if block is None or position + count > block.size:
+            block, position = draw(generator, self.block_size), 0
+        self._local.blocks[kind] = (block, position + count)
+        return block[position:position + count].reshape(shape)
+
+    def normal(self, scale, size):
+        return self._standard("normal", size) * scale
+
+    def laplace(self, scale, size):
+        return self._standard("laplace", size) * scale
+
+    def gumbel(self, scale, size):
+        return self._standard("gumbel", size) * scale
+
+    def choice(self, candidates, p=None):
+        return self.generator.choice(candidates, p=p)
+
+
+_default_engine = NoiseEngine(DP_NOISE_SEED)
+
+
+def get_noise_engine():
+    """Returns the process-wide engine used when a mechanism is not given one explicitly."""
+    return _default_engine
+
+
+def seed_noise(seed):
+    """
+    Replaces the process-wide engine with one seeded for reproducible runs.
+
+    :param seed: An int seed or numpy SeedSequence.
+    :return: The new engine.
+    """
+    global _default_engine
+    _default_engine = NoiseEngine(seed)
+    return _default_engine
@@ -0,0 +1,141 @@
+import itertools
+import logging
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """
+    A unit of work submitted to a JobRunner.
+
+    Cancelling a queued job keeps it from starting; cancelling a running job lets it finish
+    in the background but discards its result, so its callbacks never run.
+    """
+
+    def __init__(self, job_id, name, future, on_success, on_error):
+        self.job_id = job_id
+        self.name = name
+        self.future = future
+        self.on_success = on_success
+        self.on_error = on_error
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        return self.future.cancel()
+
+    @property
+    def running(self):
+        return self.future.running()
+
+    def done(self):
+        return self.future.done()
+
+
+class JobRunner:
+    """
+    Runs blocking work on a thread pool and hands results back to the Tk thread.
+
+    Workers never touch widgets: completed futures are collected by a poll scheduled with
+    ``after()`` on the owning widget, and the success or error callback runs on the Tk thread.
+    """
+
+    def __init__(self, widget, max_workers=4, poll_interval=50):
+        """
+        :param widget: The Tk widget whose event loop receives the results.
+        :param max_workers: Number of worker threads, i.e. how many jobs run concurrently.
+        :param poll_interval: Milliseconds between checks for finished jobs.
+        """
+        self.widget = widget
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._ids = itertools.count(1)
+        self._jobs = []
+        self._poll_id = None
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """
+        Registers a callback invoked on the Tk thread with the number of active jobs whenever it changes.
+        """
+        self._listeners.append(listener)
+
+    @property
+    def active_jobs(self):
+        return [job for job in self._jobs if not job.cancelled]
+
+    def submit(self, name, function, *args, on_success=None, on_error=None, **kwargs):
+        """
+        Schedules a function on the pool.
+
+        :param name: A label for the job, used in logs and status messages.
+        :param function: The callable to run on a worker thread; it must not touch Tk widgets.
+        :param on_success: Called on the Tk thread with the function's return value.
+        :param on_error: Called on the Tk thread with the raised exception.
+        :return: The submitted Job.
+        """
+        future = self._executor.submit(function, *args, **kwargs)
+        job = Job(next(self._ids), name, future, on_success, on_error)
+        self._jobs.append(job)
+        self._notify()
+        self._schedule_poll()
+        return job
+
+    def cancel(self, job):
+        job.cancel()
+        self._notify()
+
+    def cancel_all(self):
+        for job in self.active_jobs:
+            job.cancel()
+        self._notify()
+
+    def shutdown(self):
+        self.cancel_all()
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule_poll(self):
+        if self._poll_id is None:
+            self._poll_id = self.widget.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        finished = [job for job in self._jobs if job.done()]
+        for job in finished:
+            self._jobs.remove(job)
+            if job.cancelled:
+                continue
+            try:
+                result = job.future.result()
+            except CancelledError:
+                continue
+            except Exception as e:
+                logger.error(f"Job {job.name} failed: {e}")
+                self._callback(job, job.on_error, e)
+                continue
+            self._callback(job, job.on_success, result)
+
+        if finished:
+            self._notify()
+        if self._jobs:
+            self._schedule_poll()
+
+    def _callback(self, job, callback, value):
+        if callback is None:
+            return
+        try:
+            callback(value)
+        except Exception as e:
+            logger.error(f"Callback of job {job.name} failed: {e}")
+
+    def _notify(self):
+        count = len(self.active_jobs)
+        for listener in list(self._listeners):
+            listener(count)